@@ -0,0 +1,259 @@
+"""
+Stand-ins for the Raspberry Pi hardware (GPIO pins, SPI bus, ST7789 panel) and
+for the subprocess layer used by Command, so the interface can run headless.
+"""
+import os
+import subprocess
+import sys
+import types
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class Stats:
+    """
+    Counters updated by the stand-ins.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.spi_bytes = 0
+        self.spi_transfers = 0
+        self.subprocess_calls = []
+
+
+STATS = Stats()
+
+
+# --- board / digitalio / busio ------------------------------------------------
+
+class Pin:
+    def __init__(self, pin_id):
+        self.id = pin_id
+
+    def __repr__(self):
+        return f"Pin({self.id})"
+
+
+class DigitalInOut:
+    def __init__(self, pin):
+        self.pin = pin
+        self.direction = None
+        self.pull = None
+        # Buttons are pulled up: True means released
+        self.value = True
+
+
+class SPI:
+    def __init__(self, clock=None, MOSI=None, MISO=None):
+        pass
+
+    def write(self, data):
+        STATS.spi_bytes += len(data)
+        STATS.spi_transfers += 1
+
+
+class GPIO:
+    """
+    RPi.GPIO stand-in with edge callbacks; press() simulates a falling edge.
+    """
+    BCM = "BCM"
+    IN = "in"
+    PUD_UP = "pud_up"
+    FALLING = "falling"
+    LOW = 0
+    HIGH = 1
+
+    _mode = None
+    _levels = {}
+    _callbacks = {}
+
+    @classmethod
+    def getmode(cls):
+        return cls._mode
+
+    @classmethod
+    def setmode(cls, mode):
+        cls._mode = mode
+
+    @classmethod
+    def setup(cls, pin, direction, pull_up_down=None):
+        cls._levels[pin] = cls.HIGH
+
+    @classmethod
+    def add_event_detect(cls, pin, edge, callback=None, bouncetime=None):
+        cls._callbacks[pin] = callback
+
+    @classmethod
+    def remove_event_detect(cls, pin):
+        cls._callbacks.pop(pin, None)
+
+    @classmethod
+    def input(cls, pin):
+        return cls._levels.get(pin, cls.HIGH)
+
+    @classmethod
+    def press(cls, pin):
+        cls._levels[pin] = cls.LOW
+        try:
+            cls._callbacks[pin](pin)
+        finally:
+            cls._levels[pin] = cls.HIGH
+
+
+# --- adafruit_rgb_display -----------------------------------------------------
+
+def color565(r, g=0, b=0):
+    if isinstance(r, (tuple, list)):
+        r, g, b = r[:3]
+    return (r & 0xF8) << 8 | (g & 0xFC) << 3 | b >> 3
+
+
+def image_to_data(image):
+    """
+    Same conversion as adafruit_rgb_display.rgb.image_to_data.
+    """
+    data = numpy.array(image.convert("RGB")).astype("uint16")
+    color = ((data[:, :, 0] & 0xF8) << 8) | ((data[:, :, 1] & 0xFC) << 3) | (data[:, :, 2] >> 3)
+    return numpy.dstack(((color >> 8) & 0xFF, color & 0xFF)).flatten().tolist()
+
+
+class ST7789:
+    """
+    Panel stand-in: converts frames like the real driver and counts the bytes
+    that would go over SPI.
+    """
+
+    def __init__(self, spi, cs=None, dc=None, rst=None, baudrate=None, width=240, height=320,
+                 x_offset=0, y_offset=0, rotation=0):
+        self.spi = spi
+        self.width = width
+        self.height = height
+        self.rotation = rotation
+        self._X_START = x_offset
+        self._Y_START = y_offset
+
+    def image(self, img, rotation=None, x=0, y=0):
+        rotation = self.rotation if rotation is None else rotation
+        if rotation != 0:
+            img = img.rotate(rotation, expand=True)
+        width, height = img.size
+        if numpy is not None:
+            pixels = bytes(image_to_data(img))
+        else:
+            pixels = bytearray(width * height * 2)
+            for j in range(height):
+                for i in range(width):
+                    pix = color565(img.getpixel((i, j)))
+                    pixels[2 * (j * width + i)] = pix >> 8
+                    pixels[2 * (j * width + i) + 1] = pix & 0xFF
+        self._block(x, y, x + width - 1, y + height - 1, pixels)
+
+    def _block(self, x0, y0, x1, y1, data=None):
+        # Column/row address commands (2 x 5 bytes) followed by the pixel data
+        self.spi.write(b"\0" * 10)
+        if data is not None:
+            self.spi.write(data)
+
+
+# --- subprocess ---------------------------------------------------------------
+
+DEVICES = [
+    ("sda1", "14.9G", "vfat", "", "1A2B-3C4D"),
+    ("sdb1", "465.8G", "exfat", "/mnt/usb1", "5E6F-7A8B"),
+    ("sdc1", "28.7G", "vfat", "", "9C0D-1E2F"),
+]
+
+
+def _fake_output(args) -> str:
+    """
+    Canned output of the commands run by Command.
+    """
+    command = args if isinstance(args, str) else " ".join(args)
+    if command.startswith("ip "):
+        return "3: wlan0    inet 192.168.1.1/24 brd 192.168.1.255 scope global wlan0\n"
+    if "NAME,DEVICE" in command:
+        return "jellyfin_ap\n"
+    if "802-11-wireless.ssid" in command:
+        return "JellyBox\n"
+    if "grep psk=" in command:
+        return "psk=password\n"
+    if command.startswith("lsblk"):
+        return "".join(
+            f'NAME="{n}" SIZE="{s}" FSTYPE="{f}" MOUNTPOINT="{m}" UUID="{u}"\n'
+            for n, s, f, m, u in DEVICES
+        )
+    return ""
+
+
+def fake_run(args, *popenargs, **kwargs):
+    STATS.subprocess_calls.append(args)
+    output = _fake_output(args)
+    if not kwargs.get("text"):
+        output = output.encode()
+    return subprocess.CompletedProcess(args, 0, stdout=output, stderr="" if kwargs.get("text") else b"")
+
+
+def fake_check_output(args, *popenargs, **kwargs):
+    return fake_run(args, *popenargs, **kwargs).stdout
+
+
+# --- installation -------------------------------------------------------------
+
+def install():
+    """
+    Registers the hardware stand-ins as the board, busio, digitalio, RPi.GPIO
+    and adafruit_rgb_display modules, and routes subprocess calls to canned outputs.
+    Must run before the interface modules are imported.
+    The subprocess command backend is selected and the root helper is disabled,
+    so the host's /sys, /proc, network interfaces and helper daemon are never used
+    and the results do not depend on the machine.
+    """
+    os.environ["JELLYBOX_COMMAND_BACKEND"] = "subprocess"
+    os.environ["JELLYBOX_HELPER_SOCKET"] = os.devnull + ".jellybox-helper"
+    board = types.ModuleType("board")
+    for name, pin_id in [("D5", 5), ("D6", 6), ("D13", 13), ("D18", 18), ("D24", 24),
+                         ("D25", 25), ("CE0", 8), ("SCK", 11), ("MOSI", 10), ("MISO", 9)]:
+        setattr(board, name, Pin(pin_id))
+
+    digitalio = types.ModuleType("digitalio")
+    digitalio.DigitalInOut = DigitalInOut
+    digitalio.Direction = types.SimpleNamespace(INPUT="input", OUTPUT="output")
+    digitalio.Pull = types.SimpleNamespace(UP="up", DOWN="down")
+
+    busio = types.ModuleType("busio")
+    busio.SPI = SPI
+
+    package = types.ModuleType("adafruit_rgb_display")
+    package.__path__ = []
+    rgb = types.ModuleType("adafruit_rgb_display.rgb")
+    rgb.numpy = numpy
+    rgb.color565 = color565
+    rgb.image_to_data = image_to_data
+    st7789 = types.ModuleType("adafruit_rgb_display.st7789")
+    st7789.ST7789 = ST7789
+    package.rgb = rgb
+    package.st7789 = st7789
+
+    rpi = types.ModuleType("RPi")
+    rpi.__path__ = []
+    rpi.GPIO = GPIO
+
+    sys.modules.update({
+        "board": board,
+        "RPi": rpi,
+        "RPi.GPIO": GPIO,
+        "digitalio": digitalio,
+        "busio": busio,
+        "adafruit_rgb_display": package,
+        "adafruit_rgb_display.rgb": rgb,
+        "adafruit_rgb_display.st7789": st7789,
+    })
+
+    subprocess.run = fake_run
+    subprocess.check_output = fake_check_output
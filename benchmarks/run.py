@@ -0,0 +1,245 @@
+"""
+Headless benchmarks of the render and input paths.
+
+Replays scripted button sequences through the main loop dispatch against stand-in
+hardware (see fakes.py) and prints the metrics as JSON:
+
+    python -m benchmarks.run > before.json
+    python -m benchmarks.run --compare before.json
+"""
+import argparse
+import json
+import logging
+import platform
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+from . import fakes
+
+# Deterministic metrics: any increase is a regression
+EXACT_METRICS = ("bytes_per_frame.mean", "bytes_per_frame.max", "subprocess_calls.total")
+# Timing metrics: an increase beyond the tolerance is a regression
+TIMED_METRICS = ("input_ms.p95", "render_ms.p50", "render_ms.p95", "cpu_percent")
+
+UP, DOWN, SELECT, REFRESH = "up", "down", "select", "refresh"
+
+# Each scenario starts on the main menu with the first option selected
+SCENARIOS = {
+    "main_navigation": [DOWN] * 4 + [UP] * 4,
+    "main_refresh": [REFRESH] * 5,
+    "device_menu": [SELECT] + [DOWN] * 3 + [UP] * 3 + [DOWN] * 3 + [SELECT],
+    "web_menu": [DOWN, SELECT, DOWN, UP, DOWN, DOWN, SELECT],
+    "network_information": [DOWN, DOWN, SELECT, SELECT],
+}
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _percentile(values, percent):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(percent / 100 * (len(ordered) - 1))))]
+
+
+class Bench:
+    """
+    Interface, ButtonAction and main loop dispatch running on the stand-ins.
+    """
+
+    def __init__(self):
+        import main
+        from input.button_action import ButtonAction
+        from interface.interface import Interface
+
+        self.interface = Interface()
+        self.action = ButtonAction(self.interface)
+        self.handlers = main.event_handlers(self.interface.menu)
+        self.interface.renderer.start()
+        # Fill the snapshot the draw paths read, as the background services would
+        self.interface.state.refresh()
+        self.interface.devices.rescan()
+
+    def dispatch(self, event):
+        """
+        Same event dispatch as the main loop of main.py.
+        """
+        self.handlers[event]()
+
+    def reset(self):
+        """
+        Back to the main menu with cold caches.
+        """
+        self.interface.frames.invalidate()
+        self.interface._shown = None
+        self.interface.menu.open("main")
+        self.interface.renderer.flush()
+
+    def run_scenario(self, events, repeat):
+        input_ms, render_ms, frame_bytes, calls = [], [], [], []
+        for _ in range(repeat):
+            self.reset()
+            for event in events:
+                fakes.STATS.reset()
+                start = time.perf_counter()
+                self.dispatch(event)
+                input_ms.append((time.perf_counter() - start) * 1000)
+                # Frames are drawn by the render thread: wait until they reach the panel
+                self.interface.renderer.flush()
+                render_ms.append((time.perf_counter() - start) * 1000)
+                frame_bytes.append(fakes.STATS.spi_bytes)
+                calls.append(len(fakes.STATS.subprocess_calls))
+        return {
+            "frames": len(render_ms),
+            "input_ms": {
+                "mean": round(statistics.fmean(input_ms), 3),
+                "p95": round(_percentile(input_ms, 95), 3),
+            },
+            "render_ms": {
+                "mean": round(statistics.fmean(render_ms), 3),
+                "p50": round(_percentile(render_ms, 50), 3),
+                "p95": round(_percentile(render_ms, 95), 3),
+                "max": round(max(render_ms), 3),
+            },
+            "bytes_per_frame": {
+                "mean": round(statistics.fmean(frame_bytes), 1),
+                "max": max(frame_bytes),
+            },
+            "subprocess_calls": {
+                "total": sum(calls) // repeat,
+                "per_action": round(sum(calls) / len(calls), 3),
+            },
+        }
+
+    def measure_idle(self, seconds):
+        """
+        CPU used by the process while the main loop waits for a button press
+        with the background services running, with GPIO edge detection and
+        with the polling fallback.
+        """
+        from input import button_events
+
+        self.interface.state.start()
+        self.interface.devices.start()
+        results = {}
+        for name, gpio in (("idle", button_events.GPIO), ("idle_polling", None)):
+            saved_gpio, button_events.GPIO = button_events.GPIO, gpio
+            buttons = button_events.ButtonEvents()
+            stop = threading.Event()
+
+            def loop():
+                while not stop.is_set():
+                    buttons.wait(0.5)
+
+            buttons.start()
+            edge_triggered = buttons.edge_triggered
+            waiter = threading.Thread(target=loop, daemon=True)
+            waiter.start()
+            fakes.STATS.reset()
+            cpu_start, wall_start = time.process_time(), time.perf_counter()
+            time.sleep(seconds)
+            cpu, wall = time.process_time() - cpu_start, time.perf_counter() - wall_start
+            calls = len(fakes.STATS.subprocess_calls)
+
+            stop.set()
+            buttons.stop()
+            waiter.join()
+            button_events.GPIO = saved_gpio
+            results[name] = {
+                "seconds": round(wall, 2),
+                "cpu_percent": round(100 * cpu / wall, 3),
+                "subprocess_calls": calls,
+                "edge_triggered": edge_triggered,
+            }
+        self.interface.state.stop()
+        self.interface.devices.stop()
+        return results
+
+
+def _flatten(results: dict, prefix="") -> dict:
+    flat = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def compare(baseline: dict, current: dict, tolerance: float) -> list:
+    """
+    Lists the metrics of current that regressed with respect to baseline.
+    """
+    old, new = _flatten(baseline["results"]), _flatten(current["results"])
+    regressions = []
+    for name, value in sorted(new.items()):
+        before = old.get(name)
+        if before is None:
+            continue
+        if name.endswith(EXACT_METRICS) and value > before:
+            regressions.append((name, before, value))
+        elif name.endswith(TIMED_METRICS) and value > before * (1 + tolerance) and value - before > 0.05:
+            regressions.append((name, before, value))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless JellyBox render and input benchmarks.")
+    parser.add_argument("--repeat", type=int, default=20, help="runs of each scenario")
+    parser.add_argument("--idle-seconds", type=float, default=5.0, help="duration of each idle measurement")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS),
+                        help="only run this scenario (can be repeated)")
+    parser.add_argument("--output", help="write the JSON results to this file instead of stdout")
+    parser.add_argument("--compare", metavar="BASELINE", help="JSON results of a previous run to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="relative slowdown of the timing metrics tolerated by --compare")
+    args = parser.parse_args()
+
+    # Keeps the log of the benchmarked code out of jellybox.log
+    logging.basicConfig(level=logging.WARNING, format="%(levelname)s %(message)s")
+    commit = _git_commit()
+    fakes.install()
+
+    bench = Bench()
+    results = {}
+    for name in args.scenario or SCENARIOS:
+        results[name] = bench.run_scenario(SCENARIOS[name], args.repeat)
+    results["frame_cache"] = bench.interface.frames.stats()
+    if args.idle_seconds > 0:
+        results.update(bench.measure_idle(args.idle_seconds))
+
+    report = {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": fakes.numpy is not None,
+        "repeat": args.repeat,
+        "results": results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, report, args.tolerance)
+        for name, before, after in regressions:
+            print(f"REGRESSION {name}: {before} -> {after}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions against {baseline.get('commit', args.compare)}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
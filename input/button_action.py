@@ -1,103 +1,125 @@
-from interface.command import Command
+import logging
+from interface.menu import MenuNode
+
 
 class ButtonAction:
     """
     Class responsible for handling button actions in the user interface.
-    This class defines methods to execute specific actions based on the index of the pressed button.
+    This class declares the screens of the menu tree and the actions run when their options are selected.
     """
 
+    # Seconds a mount or unmount can take (a dirty exFAT journal can be slow)
+    DEVICE_JOB_TIMEOUT = 120
+
     def __init__(self, interface, command=None):
         """
-        Initializes the class with the user interface and the Command object.
-        
+        Initializes the class with the user interface and the Command object, and registers the menu screens.
+
         :param interface: Instance of the user interface that handles display and navigation.
         :type interface: Interface
-        :param command: Instance of the Command class that handles system actions (optional).
+        :param command: Instance of the Command class that handles system actions (optional, defaults to the interface one).
         :type command: Command
         """
         self.interface = interface
-        self.command = command or Command()
+        self.command = command or interface.command
+        self.menu = interface.menu
+
+        self.menu.add(MenuNode("main", entries=[
+            ("Mount/Unmount USB", lambda: self.menu.open("device")),
+            ("Web Templates", lambda: self.menu.open("web")),
+            ("Network Information", lambda: self.menu.open("red")),
+            ("Media Library", lambda: self.menu.open("media")),
+            ("Restart Server", self.command.reboot_system),
+            ("Shutdown Server", self.command.shut_down_system),
+        ], invalidate_on=()))
 
-        # Dictionary that maps indices to action functions for the main menu
-        self.main_actions = {
-            0: lambda: self.interface.draw_device_menu(0),
-            1: lambda: self.interface.draw_web_menu(0),
-            2: lambda: self.interface.draw_network_information(),
-            3: self.command.reboot_system,
-            4: self.command.shut_down_system,
-        }
+        self.menu.add(MenuNode("web", entries=[
+            ("Terminal", lambda: self._web_action_update_and_draw("index_retro")),
+            ("CyberPunk", lambda: self._web_action_update_and_draw("index_cyberpunk")),
+        ], back="main", invalidate_on=()))
 
-        # Dictionary for web menu actions
-        self.web_actions = {
-            0: lambda: self._web_action_update_and_draw("index_retro", 0),
-            1: lambda: self._web_action_update_and_draw("index_cyberpunk", 1),
-            2: lambda: self.interface.draw_main_menu(0),
-        }
+        # Device labels come from the state snapshot, so they change on refresh
+        self.menu.add(MenuNode(
+            "device",
+            provider=interface.device_options,
+            on_select=self.execute_action_device,
+            back="main",
+        ))
 
-        # Dictionary for device menu actions
-        self.device_actions = {
-            0: lambda: self.interface.show_device_status(),
-            1: lambda: self.interface.restart_device(),
-        }
+        self.menu.add(MenuNode(
+            "job",
+            provider=interface.job_options,
+            on_select=self.execute_action_job,
+            back="device",
+            on_back=interface.jobs.clear_finished,
+            draw=interface.draw_job_menu,
+            on_idle=interface.draw_spinner,
+            idle_interval=lambda: interface.SPINNER_INTERVAL if interface.jobs.running() else None,
+            invalidate_on=("job",),
+        ))
 
-    def execute_action_main(self, index):
+        # Counts are updated from the index while a drive is being scanned
+        self.menu.add(MenuNode(
+            "media",
+            provider=interface.media_options,
+            on_select=lambda index: None,
+            back="main",
+        ))
+
+        self.menu.add(MenuNode(
+            "red",
+            back="main",
+            draw=lambda selected_index, items: interface.draw_network_information(),
+        ))
+
+    def execute_action_device(self, index):
         """
-        Executes the action corresponding to the received index in the main menu.
+        Starts mounting or unmounting the device shown at the received index of
+        the device screen in the background and shows the progress screen.
         Args:
-            index (int): Index of the action to execute.
+            index (int): Index of the device.
         """
-        try:
-            action = self.main_actions.get(index)
-            if action:
-                action()
-            else:
-                print(f"[ButtonAction] Action not defined for index: {index} (main)")
-        except Exception as e:
-            print(f"[ButtonAction] Error executing action {index} (main): {e}")
+        # The device whose label was on screen, even if the list has changed since
+        device = self.interface.device_at(index)
+        if device is None:
+            return
+        action = "Unmount" if device['MOUNTPOINT'] else "Mount"
+        self.interface.jobs.submit(
+            f"{action} {device['NAME']}",
+            key=device['NAME'],
+            func=lambda job: self._custom_device_job(device, job),
+            timeout=self.DEVICE_JOB_TIMEOUT
+        )
+        self.menu.open("job")
 
-    def execute_action_web(self, index):
+    def execute_action_job(self, index):
         """
-        Executes the action corresponding to the received index in the web menu.
+        Cancels the job at the received index of the progress screen, if it is still running.
         Args:
-            index (int): Index of the action to execute.
+            index (int): Index of the job.
         """
-        try:
-            action = self.web_actions.get(index)
-            if action:
-                action()
-            else:
-                print(f"[ButtonAction] Action not defined for index: {index} (web)")
-        except Exception as e:
-            print(f"[ButtonAction] Error executing action {index} (web): {e}")
+        jobs = self.interface.jobs.jobs()
+        if index < len(jobs) and jobs[index].running:
+            jobs[index].cancel()
 
-
-    def execute_action_device(self, index):
+    def _custom_device_job(self, device, job):
         """
-        Executes the action corresponding to the received index in the device menu.
-        If the index is equal to the number of devices, it returns to the main menu.
-        Otherwise, it executes the custom device action and returns to the main menu.
-        Args:
-            index (int): Index of the action to execute.
+        Job body: mounts or unmounts the device shown on the menu (not the one that
+        happens to be at the same index by then) and reads the device list again.
         """
-        if self.command.get_devices_len() == index:
-            self.interface.draw_main_menu(0)
-        else:
-            self.command.custom_device(index)
-            self.interface.draw_main_menu(0)
-    
-    def execute_action_back(self):
-        self.interface.draw_main_menu(0)
+        result = self.command.toggle_device(device, job)
+        self.interface.devices.rescan()
+        return result
 
-    def _web_action_update_and_draw(self, website, index):
+    def _web_action_update_and_draw(self, website):
         """
         Updates the website and draws the selection on the interface.
         Args:
             website (str): Name of the website.
-            index (int): Selected index.
         """
         try:
-            self.command.update_website(website)
-            self.interface.draw_web_selected(index)
+            self.command.update_website(website, ip=self.interface.state.snapshot.ip)
+            self.interface.draw_web_selected()
+            self.menu.redraw()
         except Exception as e:
-            print(f"[ButtonAction] Error en _web_action_update_and_draw: {e}")       
-        
\ No newline at end of file
+            logging.error(f"Error updating website {website}: {e}", exc_info=True)
@@ -1,27 +1,35 @@
 import board
 import digitalio
+import logging
 import time
+from interface.tracing import TRACER
 
 class ButtonController:
     """
     Class to manage the hardware of physical buttons.
     Provides methods to check the state of each button.
     """
+
+    # GPIO pins of each button (BCM numbering)
+    PIN_UP = board.D5
+    PIN_DOWN = board.D6
+    PIN_SELECT = board.D13
+
     def __init__(self):
         """
         Initializes the button controller by setting up the GPIO pins for the buttons.
         """
         try:
             # Inicializa cada boton como entrada con resistencia pull-up
-            self.button_up = digitalio.DigitalInOut(board.D5)
-            self.button_down = digitalio.DigitalInOut(board.D6)
-            self.button_select = digitalio.DigitalInOut(board.D13)
+            self.button_up = digitalio.DigitalInOut(self.PIN_UP)
+            self.button_down = digitalio.DigitalInOut(self.PIN_DOWN)
+            self.button_select = digitalio.DigitalInOut(self.PIN_SELECT)
             for btn in [self.button_up, self.button_down, self.button_select]:
                 btn.direction = digitalio.Direction.INPUT
                 btn.pull = digitalio.Pull.UP
         except Exception as e:
-            # Si ocurre un error durante la inicialización, lo imprime y relanza la excepción
-            print(f"[ButtonController] Error al inicializar los botones: {e}")
+            # Si ocurre un error durante la inicialización, lo registra y relanza la excepción
+            logging.error(f"Error initializing buttons: {e}", exc_info=True)
             raise
 
     def is_pressed(self, button):
@@ -38,7 +46,7 @@ class ButtonController:
             # El valor es False cuando el boton esta presionado debido a la resistencia pull-up
             return not button.value
         except Exception as e:
-            print(f"[ButtonController] Error al leer el estado del botón: {e}")
+            logging.error(f"Error reading button state: {e}", exc_info=True)
             return False
 
     def is_up_pressed(self):
@@ -81,12 +89,20 @@ class ButtonController:
         Returns:
             int: El nuevo índice seleccionado después de la navegación.
         """
-        if self.is_up_pressed():
+        with TRACER.span("gpio"):
+            up = self.is_up_pressed()
+            down = not up and self.is_down_pressed()
+        if up or down:
+            TRACER.edge("up" if up else "down")
+            TRACER.begin_press("up" if up else "down")
+        if up:
             current_index = (current_index - 1) % total_items
             draw_function(current_index)
+            TRACER.end_press()
             time.sleep(0.2)# Evita rebotes y múltiples lecturas rápidas
-        elif self.is_down_pressed():
+        elif down:
             current_index = (current_index + 1) % total_items
             draw_function(current_index)
+            TRACER.end_press()
             time.sleep(0.2)
         return current_index
\ No newline at end of file
@@ -0,0 +1,172 @@
+import logging
+import queue
+import threading
+import time
+from interface.tracing import TRACER
+from .button_controller import ButtonController
+
+try:
+    import RPi.GPIO as GPIO
+except ImportError:
+    # Boards without RPi.GPIO fall back to a low-rate polling thread
+    GPIO = None
+
+
+class ButtonEvent:
+    """
+    Names of the events posted to the input queue.
+    """
+    UP = "up"
+    DOWN = "down"
+    SELECT = "select"
+    # Not a button: posted when the data shown on screen has changed
+    REFRESH = "refresh"
+    # Not a button: posted when a background job ends
+    JOB = "job"
+
+
+class ButtonEvents:
+    """
+    Event-based counterpart of ButtonController.
+    Falling edges on the button pins are turned into events and queued, so the
+    main loop can block on wait() instead of busy-polling the GPIO pins.
+    """
+
+    BOUNCE_TIME_MS = 200  # Ignores edges closer than this (same as the old 0.2 s sleep)
+    POLL_INTERVAL = 0.02  # Only used when edge detection is not available
+
+    def __init__(self, controller=None):
+        """
+        Initializes the event queue. Edge detection starts with start().
+
+        Args:
+            controller (ButtonController): Controller used by the polling fallback (optional).
+        """
+        self.events = queue.Queue()
+        self.controller = controller
+        self.edge_triggered = False
+        self._pins = {
+            ButtonController.PIN_UP.id: ButtonEvent.UP,
+            ButtonController.PIN_DOWN.id: ButtonEvent.DOWN,
+            ButtonController.PIN_SELECT.id: ButtonEvent.SELECT,
+        }
+        self._stop = threading.Event()
+        self._poll_thread = None
+
+    def start(self):
+        """
+        Starts delivering button events, using GPIO falling-edge callbacks when
+        possible and a polling thread otherwise.
+        """
+        if GPIO is not None:
+            try:
+                if GPIO.getmode() is None:
+                    GPIO.setmode(GPIO.BCM)
+                for pin in self._pins:
+                    GPIO.setup(pin, GPIO.IN, pull_up_down=GPIO.PUD_UP)
+                    GPIO.add_event_detect(pin, GPIO.FALLING, callback=self._on_edge,
+                                          bouncetime=self.BOUNCE_TIME_MS)
+                self.edge_triggered = True
+                return
+            except Exception as e:
+                logging.warning(f"GPIO edge detection not available, polling buttons instead: {e}")
+                self._remove_edge_detection()
+
+        self.controller = self.controller or ButtonController()
+        self._poll_thread = threading.Thread(target=self._poll, name="button-poll", daemon=True)
+        self._poll_thread.start()
+
+    def stop(self):
+        """
+        Stops delivering button events.
+        """
+        self._stop.set()
+        if self.edge_triggered:
+            self._remove_edge_detection()
+            self.edge_triggered = False
+
+    def post(self, event):
+        """
+        Queues an event, so other threads can wake up the main loop.
+
+        Args:
+            event (str): Event name.
+        """
+        self.events.put(event)
+
+    def wait(self, timeout=None):
+        """
+        Blocks until the next event is available.
+
+        Args:
+            timeout (float): Maximum seconds to wait, or None to wait forever.
+
+        Returns:
+            str: The event name, or None if the timeout expired.
+        """
+        try:
+            return self.events.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    @staticmethod
+    def navigate(event, total_items, current_index):
+        """
+        Computes the new menu index for an 'up' or 'down' event.
+
+        Args:
+            event (str): Button event.
+            total_items (int): Total number of items in the menu.
+            current_index (int): Currently selected index.
+
+        Returns:
+            int: The new selected index.
+        """
+        if total_items <= 0:
+            return 0
+        if event == ButtonEvent.UP:
+            return (current_index - 1) % total_items
+        if event == ButtonEvent.DOWN:
+            return (current_index + 1) % total_items
+        return current_index
+
+    def _on_edge(self, pin):
+        """
+        GPIO callback, runs on the RPi.GPIO event thread.
+        """
+        # Filters glitches: the pin must still be low (pressed) after the edge
+        with TRACER.span("gpio"):
+            pressed = GPIO.input(pin) == GPIO.LOW
+        if pressed:
+            TRACER.edge(self._pins[pin])
+            self.events.put(self._pins[pin])
+
+    def _remove_edge_detection(self):
+        for pin in self._pins:
+            try:
+                GPIO.remove_event_detect(pin)
+            except Exception:
+                pass
+
+    def _poll(self):
+        """
+        Fallback loop: samples the buttons at a low rate and queues press edges.
+        """
+        buttons = {
+            ButtonEvent.UP: self.controller.is_up_pressed,
+            ButtonEvent.DOWN: self.controller.is_down_pressed,
+            ButtonEvent.SELECT: self.controller.is_select_pressed,
+        }
+        pressed = {event: False for event in buttons}
+        last_press = {event: 0.0 for event in buttons}
+        bounce = self.BOUNCE_TIME_MS / 1000
+        while not self._stop.wait(self.POLL_INTERVAL):
+            for event, is_pressed in buttons.items():
+                state = is_pressed()
+                if state and not pressed[event]:
+                    now = time.monotonic()
+                    if now - last_press[event] >= bounce:
+                        last_press[event] = now
+                        TRACER.edge(event)
+                        self.events.put(event)
+                pressed[event] = state
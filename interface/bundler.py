@@ -0,0 +1,289 @@
+import argparse
+import base64
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import re
+import urllib.parse
+import urllib.request
+from typing import NamedTuple
+
+ASSETS_DIR = "assets"
+MANIFEST = "manifest.json"
+# Assets up to this size are inlined as data URIs, bigger ones are published as files
+INLINE_LIMIT = 32 * 1024
+# Google Fonts serves woff2 only to browsers it recognizes
+FETCH_USER_AGENT = "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36"
+
+MIME_TYPES = {
+    ".woff2": "font/woff2",
+    ".woff": "font/woff",
+    ".ttf": "font/ttf",
+    ".otf": "font/otf",
+    ".css": "text/css",
+    ".svg": "image/svg+xml",
+}
+
+URL = r"https?://[^\s\"'()<>]+"
+LINK_TAG = re.compile(r"<link\b[^>]*>", re.I)
+SCRIPT_TAG = re.compile(rf"<script\b[^>]*\bsrc=[\"']({URL})[\"'][^>]*>\s*</script>", re.I)
+IMG_TAG = re.compile(rf"<img\b[^>]*\bsrc=[\"']({URL})[\"'][^>]*>", re.I)
+CSS_IMPORT = re.compile(rf"@import\s+(?:url\(\s*)?[\"']?({URL})[\"']?\s*\)?[^;]*;", re.I)
+CSS_URL = re.compile(r"url\(\s*([\"']?)([^)\"']+)\1\s*\)", re.I)
+ATTRIBUTE = r"\b{}=[\"']([^\"']*)[\"']"
+NETWORK_REFERENCE = re.compile(URL)
+
+
+class Bundle(NamedTuple):
+    """
+    Result of bundling a page: the self-contained HTML, the asset files it
+    references (relative path -> bytes) and a report of what was done.
+    """
+    html: str
+    files: dict
+    inlined: list
+    localized: list
+    stripped: list
+    remaining: list
+
+    def summary(self) -> str:
+        return (f"{len(self.inlined)} inlined, {len(self.localized)} published as files, "
+                f"{len(self.stripped)} stripped, {len(self.remaining)} network references left")
+
+
+def _attribute(tag: str, name: str):
+    match = re.search(ATTRIBUTE.format(name), tag, re.I)
+    return match.group(1) if match else None
+
+
+def _mime_type(filename: str) -> str:
+    ext = os.path.splitext(filename)[1].lower()
+    return MIME_TYPES.get(ext) or mimetypes.guess_type(filename)[0] or "application/octet-stream"
+
+
+def _is_local_reference(url: str) -> bool:
+    """
+    Links to the box itself (e.g. http://{{IP_LOCAL}}:8096) are not network references.
+    """
+    return "{{" in url
+
+
+class Bundler:
+    """
+    Makes the web templates self-contained, so pages load on the hotspot without
+    any uplink. External stylesheets, scripts, fonts and images are replaced with
+    the local copies listed in web_templates/assets/manifest.json (small ones
+    inlined as data URIs) or stripped when no copy exists.
+    """
+
+    def __init__(self, templates_dir: str):
+        """
+        Args:
+            templates_dir (str): Directory of the templates; assets live in its assets/ folder.
+        """
+        self.assets_dir = os.path.join(templates_dir, ASSETS_DIR)
+        self.manifest = self._load_manifest()
+
+    def _load_manifest(self) -> dict:
+        try:
+            with open(os.path.join(self.assets_dir, MANIFEST), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _local_copy(self, url: str):
+        """
+        Returns (filename, content) of the local copy of a URL, or None.
+        """
+        filename = self.manifest.get(url)
+        if filename is None:
+            return None
+        try:
+            with open(os.path.join(self.assets_dir, filename), "rb") as f:
+                return filename, f.read()
+        except FileNotFoundError:
+            return None
+
+    def bundle(self, html: str) -> Bundle:
+        """
+        Bundles a page. See the class description.
+        """
+        result = Bundle(html, {}, [], [], [], [])
+
+        def asset_url(url):
+            """
+            Returns the offline replacement of an asset URL (data URI or relative path), or None.
+            """
+            local = self._local_copy(url)
+            if local is None:
+                result.stripped.append(url)
+                return None
+            filename, content = local
+            if filename.endswith(".css"):
+                content = self._bundle_css(content.decode("utf-8"), url, result).encode("utf-8")
+            if len(content) <= INLINE_LIMIT:
+                result.inlined.append(url)
+                encoded = base64.b64encode(content).decode("ascii")
+                return f"data:{_mime_type(filename)};base64,{encoded}"
+            result.localized.append(url)
+            result.files[f"{ASSETS_DIR}/{filename}"] = content
+            return f"{ASSETS_DIR}/{filename}"
+
+        def replace_link(match):
+            tag = match.group(0)
+            href = _attribute(tag, "href")
+            if not href or not NETWORK_REFERENCE.match(href) or _is_local_reference(href):
+                return tag
+            rel = (_attribute(tag, "rel") or "").lower()
+            if rel == "stylesheet":
+                local = self._local_copy(href)
+                if local is not None:
+                    result.inlined.append(href)
+                    return "<style>\n" + self._bundle_css(local[1].decode("utf-8"), href, result) + "\n</style>"
+                result.stripped.append(href)
+                return ""
+            if rel in ("preconnect", "dns-prefetch", "preload", "prefetch"):
+                # Connection hints are useless (and slow) without an uplink
+                result.stripped.append(href)
+                return ""
+            replacement = asset_url(href)
+            return tag.replace(href, replacement) if replacement else ""
+
+        def replace_script(match):
+            local = self._local_copy(match.group(1))
+            if local is None:
+                result.stripped.append(match.group(1))
+                return ""
+            result.inlined.append(match.group(1))
+            return "<script>\n" + local[1].decode("utf-8") + "\n</script>"
+
+        def replace_img(match):
+            replacement = asset_url(match.group(1))
+            return match.group(0).replace(match.group(1), replacement) if replacement else ""
+
+        html = LINK_TAG.sub(replace_link, html)
+        html = SCRIPT_TAG.sub(replace_script, html)
+        html = IMG_TAG.sub(replace_img, html)
+        html = self._bundle_css(html, None, result)
+
+        remaining = [url for url in NETWORK_REFERENCE.findall(html) if not _is_local_reference(url)]
+        return result._replace(html=html, remaining=remaining)
+
+    def _bundle_css(self, css: str, base_url, result: Bundle) -> str:
+        """
+        Replaces the url() and @import references of a stylesheet (or of the
+        inline styles of a page), resolving relative ones against base_url.
+        """
+        def replace_import(match):
+            local = self._local_copy(match.group(1))
+            if local is None:
+                result.stripped.append(match.group(1))
+                return ""
+            result.inlined.append(match.group(1))
+            return self._bundle_css(local[1].decode("utf-8"), match.group(1), result)
+
+        def replace_url(match):
+            url = match.group(2).strip()
+            if url.startswith("data:") or _is_local_reference(url):
+                return match.group(0)
+            if base_url and not NETWORK_REFERENCE.match(url):
+                url = urllib.parse.urljoin(base_url, url)
+            if not NETWORK_REFERENCE.match(url):
+                return match.group(0)
+            local = self._local_copy(url)
+            if local is None:
+                result.stripped.append(url)
+                return "none"
+            filename, content = local
+            if len(content) <= INLINE_LIMIT:
+                result.inlined.append(url)
+                return f"url(data:{_mime_type(filename)};base64,{base64.b64encode(content).decode('ascii')})"
+            result.localized.append(url)
+            result.files[f"{ASSETS_DIR}/{filename}"] = content
+            return f"url({ASSETS_DIR}/{filename})"
+
+        css = CSS_IMPORT.sub(replace_import, css)
+        return CSS_URL.sub(replace_url, css)
+
+    def fetch(self, url: str) -> None:
+        """
+        Downloads an asset (and, for stylesheets, the assets it references) into
+        the assets folder and records it in the manifest. Meant to be run once,
+        while the box still has internet access (e.g. during the initial setup).
+        """
+        if url in self.manifest:
+            return
+        request = urllib.request.Request(url, headers={"User-Agent": FETCH_USER_AGENT})
+        with urllib.request.urlopen(request, timeout=30) as response:
+            content = response.read()
+            content_type = response.headers.get_content_type()
+        path = urllib.parse.urlparse(url).path
+        ext = os.path.splitext(path)[1] or mimetypes.guess_extension(content_type) or ""
+        if content_type == "text/css":
+            ext = ".css"
+        filename = hashlib.sha1(url.encode("utf-8")).hexdigest()[:16] + ext
+
+        os.makedirs(self.assets_dir, exist_ok=True)
+        with open(os.path.join(self.assets_dir, filename), "wb") as f:
+            f.write(content)
+        self.manifest[url] = filename
+        with open(os.path.join(self.assets_dir, MANIFEST), "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, indent=2, sort_keys=True)
+
+        if ext == ".css":
+            css = content.decode("utf-8")
+            for match in CSS_IMPORT.finditer(css):
+                self.fetch(match.group(1))
+            for match in CSS_URL.finditer(css):
+                reference = urllib.parse.urljoin(url, match.group(2).strip())
+                if NETWORK_REFERENCE.match(reference):
+                    self.fetch(reference)
+
+    def external_references(self, html: str) -> list:
+        """
+        Lists the external asset URLs referenced by a page.
+        """
+        urls = []
+        for tag in LINK_TAG.findall(html):
+            href = _attribute(tag, "href")
+            if href and NETWORK_REFERENCE.match(href) and not _is_local_reference(href):
+                urls.append(href)
+        urls += SCRIPT_TAG.findall(html) + IMG_TAG.findall(html) + CSS_IMPORT.findall(html)
+        urls += [m.group(2) for m in CSS_URL.finditer(html) if NETWORK_REFERENCE.match(m.group(2))]
+        return urls
+
+
+def main():
+    from .website import WEB_TEMPLATES
+
+    parser = argparse.ArgumentParser(description="Bundle the web templates for offline use.")
+    parser.add_argument("--fetch", action="store_true",
+                        help="download the external assets into web_templates/assets (needs internet)")
+    parser.add_argument("--templates", default=WEB_TEMPLATES, help="templates directory")
+    args = parser.parse_args()
+
+    bundler = Bundler(args.templates)
+    for filename in sorted(os.listdir(args.templates)):
+        if not filename.endswith(".html"):
+            continue
+        with open(os.path.join(args.templates, filename), "r", encoding="utf-8") as f:
+            html = f.read()
+        if args.fetch:
+            for url in bundler.external_references(html):
+                try:
+                    bundler.fetch(url)
+                except Exception as e:
+                    logging.error(f"Error fetching {url}: {e}")
+                    print(f"{filename}: could not fetch {url}: {e}")
+        bundle = bundler.bundle(html)
+        print(f"{filename}: {bundle.summary()}")
+        for url in bundle.stripped:
+            print(f"  stripped: {url}")
+        for url in bundle.remaining:
+            print(f"  network reference left: {url}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,46 +1,82 @@
 import subprocess
 import os
-import qrcode
 import logging
+import re
+import time
+from .fstab import Fstab
+from .jobs import JobCancelled
+from .mount_profiles import MountProfiles
+from .mount_registry import MountRegistry
+from .privileged import run_privileged
+from .qr import wifi_qr
+from .tracing import TRACER
+from .website import WebsitePublisher
+
+# Filesystems of the USB drives JellyBox can mount
+USB_FSTYPES = re.compile(r"fat32|exfat|vfat")
+LSBLK_PAIR = re.compile(r'(\w+)="([^"]*)"')
+
+
+def is_eligible_device(size: str, fstype: str) -> bool:
+    """
+    Tells whether a block device can be offered for mounting: a FAT/exFAT
+    filesystem larger than 1G, with the size formatted by lsblk (e.g. "14.9G").
+    """
+    if not size or size[-1] not in "GT" or not fstype:
+        return False
+    try:
+        return float(size[:-1]) > 1 and bool(USB_FSTYPES.search(fstype))
+    except ValueError:
+        return False
+
 
 class Command:
     """
     Encapsulates system commands: network, USB, website, power.
     """
 
+    def __init__(self):
+        # Web templates are compiled once, on first use
+        self.website = WebsitePublisher()
+        # Stable mount point of each known drive, by filesystem UUID
+        self.mounts = MountRegistry()
+        # Mount options and readahead of each filesystem type
+        self.profiles = MountProfiles()
+
     def get_name_access_point(self) -> str:
         """
         Gets the name of the wireless connection on wlan0.
         """
         try:
             cmd = "nmcli -t -f NAME,DEVICE connection show | grep wlan0 | cut -d':' -f1"
-            return subprocess.check_output(cmd, shell=True, text=True).strip()
+            return self._check_output(cmd, shell=True).strip()
         except Exception as e:
             logging.error(f"Error getting access point name: {e}", exc_info=True)
             return "No disponible"
     
-    def get_SSID(self) -> str:
+    def get_SSID(self, ap: str = None) -> str:
         """
         Reads the SSID of the access point.
+        Args:
+            ap (str): Connection name, looked up when not given.
         """
         try:
-            arg1 = "'{print $2}'"
-            ap = self.get_name_access_point()
-            cmd = f"nmcli connection show {ap} | grep 802-11-wireless.ssid | awk {arg1}"
-            return subprocess.check_output(cmd, shell=True, text=True).strip()
+            ap = ap or self.get_name_access_point()
+            cmd = ["nmcli", "-e", "no", "-g", "802-11-wireless.ssid", "connection", "show", ap]
+            return self._check_output(cmd).strip()
         except Exception as e:
             logging.error(f"Error getting SSID: {e}", exc_info=True)
             return "Not available"
        
-    def get_password_access_point(self) -> str:
+    def get_password_access_point(self, ap: str = None) -> str:
         """
-        Extracts the PSK password from the NetworkManager configuration file.
+        Extracts the PSK password from the NetworkManager configuration file (readable by root only).
+        Args:
+            ap (str): Connection name, looked up when not given.
         """
         try:
-            ap = self.get_name_access_point()
-            path = f"/etc/NetworkManager/system-connections/{ap}.nmconnection"
-            content = subprocess.check_output(f"sudo grep psk= {path}", shell=True, text=True)
-            return content.split('=', 1)[1].strip()
+            ap = ap or self.get_name_access_point()
+            return self._privileged([{"op": "read_psk", "connection": ap}])[0]
         except Exception as e:
             logging.error(f"Error getting access point password: {e}", exc_info=True)
             return "Not available"
@@ -50,44 +86,51 @@ class Command:
         Returns the IP assigned to wlan0 or an error message.
         """
         try:
-            res = subprocess.run(["ip", "-o", "-4", "addr", "show", "wlan0"], 
-                                    capture_output=True, text=True)
+            res = self._run(["ip", "-o", "-4", "addr", "show", "wlan0"],
+                            capture_output=True, text=True)
             return res.stdout.split()[3].split('/')[0]
         except Exception as e:
             logging.error(f"Error getting access point IP: {e}", exc_info=True)
             return "Not available"
     
-    def get_qr_access_point(self) -> None:
+    def get_qr_access_point(self, ssid: str = None, password: str = None):
         """
-        Generates a QR code to share the Wi-Fi network and saves it as wifi_qr.png.
+        Generates the QR code to share the Wi-Fi network, in memory (nothing is written to disk).
+        Args:
+            ssid (str): SSID of the network, read when not given.
+            password (str): Password of the network, read when not given.
+        Returns:
+            PIL.Image: 150x150 1-bit QR code, or None on error.
         """
         try:
-            ssid = self.get_SSID()
-            password = self.get_password_access_point()
-            encryption = "WPA"
-            wifi_qr_data = f"WIFI:S:{ssid};T:{encryption};P:{password};;"
-            qr = qrcode.make(wifi_qr_data)
-            qr.save("wifi_qr.png")
+            ssid = ssid or self.get_SSID()
+            password = password or self.get_password_access_point()
+            return wifi_qr(ssid, password, "WPA")
         except Exception as e:
             logging.error(f"Error generating Wi-Fi QR: {e}", exc_info=True)
-        
+            return None
+
     def get_device_usb(self) -> list[dict]:
         """
         Lists FAT/ExFAT formatted USB devices larger than 1GB.
         """
         try:
-            cmd = ("lsblk -o NAME,SIZE,FSTYPE,MOUNTPOINT | awk '$2 ~ /(G|T)$/ "
-                    "&& $2+0 > 1 && $3 ~ /fat32|exfat|vfat/'")
-            out = subprocess.check_output(cmd, shell=True, text=True)
+            cmd = ["lsblk", "-P", "-o", "NAME,SIZE,FSTYPE,MOUNTPOINT,UUID,LABEL"]
+            out = self._check_output(cmd)
             devices = []
             for line in out.splitlines():
-                parts = line.split()
-                if len(parts) >= 3:
+                fields = {
+                    key: re.sub(r"\\x([0-9a-fA-F]{2})", lambda m: chr(int(m.group(1), 16)), value)
+                    for key, value in LSBLK_PAIR.findall(line)
+                }
+                if is_eligible_device(fields["SIZE"], fields["FSTYPE"]):
                     devices.append({
-                        "NAME": parts[0].lstrip("└─"),
-                        "SIZE": parts[1],
-                        "FSTYPE": parts[2],
-                        "MOUNTPOINT": parts[3] if len(parts) > 3 else None
+                        "NAME": fields["NAME"],
+                        "SIZE": fields["SIZE"],
+                        "FSTYPE": fields["FSTYPE"],
+                        "MOUNTPOINT": fields["MOUNTPOINT"] or None,
+                        "UUID": fields["UUID"] or None,
+                        "LABEL": fields.get("LABEL") or None
                     })
             return devices
         except Exception as e:
@@ -100,78 +143,240 @@ class Command:
         """
         return len(self.get_device_usb())
     
-    def mount_device(self, index: int) -> None:
+    def _run(self, args: list, job=None, **kwargs) -> subprocess.CompletedProcess:
+        """
+        Runs a command. When it is part of a job, the job is checked for
+        cancellation first and the command is bounded by the job's remaining time.
+        Every subprocess of Command goes through here, so it is traced when enabled.
+        """
+        if job is not None:
+            job.check()
+            kwargs.setdefault("timeout", job.remaining())
+        if not TRACER.enabled:
+            return subprocess.run(args, **kwargs)
+        start = time.perf_counter()
+        returncode = None
+        try:
+            result = subprocess.run(args, **kwargs)
+            returncode = result.returncode
+            return result
+        except subprocess.CalledProcessError as e:
+            returncode = e.returncode
+            raise
+        finally:
+            TRACER.command(args, (time.perf_counter() - start) * 1000, returncode)
+
+    def _check_output(self, args, job=None, **kwargs) -> str:
+        """
+        Runs a command and returns its standard output as text.
+        Raises:
+            subprocess.CalledProcessError: If the command fails.
+        """
+        return self._run(args, job, stdout=subprocess.PIPE, text=True, check=True, **kwargs).stdout
+
+    def _privileged(self, ops: list, job=None) -> list:
+        """
+        Runs privileged operations in a single round trip to the root helper, or
+        as sudo commands (through _run) when the helper is not running.
+        When they are part of a job, it is checked for cancellation first and
+        the operations are bounded by the job's remaining time.
+        """
+        if job is not None:
+            job.check()
+        return run_privileged(ops, **self._privileged_runner(job))
+
+    def _privileged_runner(self, job=None) -> dict:
+        """
+        Returns the runner and timeout of a privileged step: sudo fallbacks go
+        through _run (traced, bounded by the job) and the helper waits for the
+        job's remaining time.
+        """
+        return {
+            "runner": lambda args, **kwargs: self._run(args, job, **kwargs),
+            "timeout": job.remaining() if job is not None else None,
+        }
+
+    def mount_device(self, index: int, job=None) -> bool:
         """
         Mounts the USB device at the specified index.
+        Args:
+            index (int): Index of the device in get_device_usb().
+            job (Job): Job running the mount (optional).
+        Returns:
+            bool: True if the device was mounted.
         """
         try:
-            devices = self.get_device_usb()
-            device = devices[index]
-            subprocess.run(["sudo", "mkdir", "-p", f"/mnt/usb{index}"])
-            subprocess.run(["sudo", "mount", f"/dev/{device['NAME']}", f"/mnt/usb{index}"])
-            subprocess.run([
-                "sudo", "bash", "-c",
-                f"echo '/dev/{device['NAME']}\t/mnt/usb{index}\t{device['FSTYPE']}\tnofail\t0\t2' >> /etc/fstab"
-            ])
+            device = self.get_device_usb()[index]
         except Exception as e:
             logging.error(f"Error mounting USB device: {e}", exc_info=True)
+            return False
+        return self.mount(device, job)
+
+    def mount(self, device: dict, job=None, update_fstab: bool = True) -> bool:
+        """
+        Mounts a USB device at its stable mount point (see MountRegistry) with the
+        options of its filesystem profile (see MountProfiles), sets the readahead
+        of its block device, and remembers it, so it is mounted again
+        automatically when present.
+        Args:
+            device (dict): Device as listed by get_device_usb().
+            job (Job): Job running the mount, checked before starting (optional).
+            update_fstab (bool): Also add its fstab entry, in the same privileged round trip
+                                 (fstab is only locked while that entry is written).
+        Returns:
+            bool: True if the device was mounted.
+        """
+        try:
+            fstab = Fstab.load() if update_fstab else None
+            current = fstab.find(device.get('UUID')) if fstab is not None and device.get('UUID') else None
+            mountpoint = self.mounts.mountpoint(device, current.file if current else None)
+            options = self.profiles.options(device['FSTYPE'])
+            mount = {"op": "mount", "device": device['NAME'], "target": mountpoint}
+            if options:
+                mount["options"] = options
+            ops = [{"op": "mkdir", "path": mountpoint}, mount]
+            if fstab is not None:
+                # Adds (or replaces) a single entry keyed by UUID instead of appending duplicates
+                entry = {"op": "fstab_add", "device": device['NAME'], "target": mountpoint,
+                         "fstype": device['FSTYPE']}
+                if device.get('UUID'):
+                    entry["uuid"] = device['UUID']
+                if options:
+                    entry["options"] = options
+                ops.append(entry)
+            ops.append(self._readahead_op(device))
+            self._privileged(ops, job)
+            self.mounts.remember(device, mountpoint)
+            return True
+        except JobCancelled:
+            # Reported as a cancellation by the job executor
+            self.mounts.release(device)
+            raise
+        except Exception as e:
+            logging.error(f"Error mounting USB device {device.get('NAME')}: {e}", exc_info=True)
+            self.mounts.release(device)
+            return False
 
-    def umount_device(self, index: int) -> None:
+    def umount_device(self, index: int, job=None) -> bool:
         """
         Unmounts the USB device at the specified index and removes its entry from fstab.
+        Args:
+            index (int): Index of the device in get_device_usb().
+            job (Job): Job running the unmount (optional).
+        Returns:
+            bool: True if the device was unmounted.
         """
         try:
             device = self.get_device_usb()[index]
-            subprocess.run(["sudo", "umount", f"{device['MOUNTPOINT']}"])
-            subprocess.run(["sudo", "rm", "-r", f"{device['MOUNTPOINT']}"])
-            f = f"/\\/dev\\/{device['NAME']}[[:space:]]*\\/mnt\\/usb{index}[[:space:]]*{device['FSTYPE']}[[:space:]]*nofail[[:space:]]*0[[:space:]]*2/d"
-            sed_command = [
-                "sudo", "sed", "-i",
-                f,
-                "/etc/fstab"
-            ]
-            subprocess.run(sed_command, check=True)
         except Exception as e:
             logging.error(f"Error unmounting USB device: {e}", exc_info=True)
+            return False
+        return self.umount(device, job)
+
+    def umount(self, device: dict, job=None) -> bool:
+        """
+        Unmounts a USB device and removes its entry from fstab. It is no longer
+        mounted automatically, but keeps its mount point for the next time.
+        Args:
+            device (dict): Device as listed by get_device_usb().
+            job (Job): Job running the unmount, checked before starting (optional).
+        Returns:
+            bool: True if the device was unmounted.
+        """
+        # Before unmounting, so the automounter does not mount it back
+        known = self.mounts.known(device.get('UUID'))
+        self.mounts.forget(device.get('UUID'))
+        try:
+            ops = [
+                {"op": "umount", "target": device['MOUNTPOINT']},
+                {"op": "rmdir", "path": device['MOUNTPOINT']},
+            ]
+            remove = {"op": "fstab_remove", "target": device['MOUNTPOINT']}
+            if device.get('UUID'):
+                remove["uuid"] = device['UUID']
+            ops.append(remove)
+            self._privileged(ops, job)
+            self.mounts.release(device)
+            return True
+        except JobCancelled:
+            # Reported as a cancellation by the job executor
+            if known:
+                self.mounts.remember(device, device['MOUNTPOINT'])
+            raise
+        except Exception as e:
+            logging.error(f"Error unmounting USB device {device.get('NAME')}: {e}", exc_info=True)
+            if known:
+                self.mounts.remember(device, device['MOUNTPOINT'])
+            return False
+
+    def _readahead_op(self, device: dict) -> dict:
+        return {"op": "readahead", "device": device['NAME'], "kb": self.profiles.readahead_kb(device['FSTYPE'])}
+
+    def set_readahead(self, device: dict) -> bool:
+        """
+        Sets the readahead of the block device of a drive mounted by someone else
+        (e.g. from fstab at boot), which fstab options cannot set.
+        Returns:
+            bool: True if it was set.
+        """
+        try:
+            return bool(self._privileged([self._readahead_op(device)])[0])
+        except Exception as e:
+            logging.error(f"Error setting readahead of {device.get('NAME')}: {e}", exc_info=True)
+            return False
 
-    def custom_device(self, index: int) -> None:
+    def custom_device(self, index: int, job=None) -> bool:
         """
         Mounts or unmounts the USB device at the given index depending on its current state.
+        Returns:
+            bool: True if the operation succeeded.
         """
         try:
-            device = self.get_device_usb()[index]
-            if device['MOUNTPOINT']:
-                self.umount_device(index)
-            else:
-                self.mount_device(index)
+            return self.toggle_device(self.get_device_usb()[index], job)
+        except JobCancelled:
+            raise
         except Exception as e:
             logging.error(f"Error in custom_device: {e}", exc_info=True)
+            return False
 
-    def update_website(self, template_name: str) -> None:
+    def toggle_device(self, device: dict, job=None) -> bool:
         """
-        Copies the selected HTML template to index.html in Apache, inserting the local IP.
+        Mounts or unmounts a USB device depending on its current state.
+        Returns:
+            bool: True if the operation succeeded.
         """
-        try:
-            base = os.path.dirname(__file__)
-            src = os.path.join(base, "../web_templates", f"{template_name}.html")
-            dst = "/var/www/html/index.html"
-            ip_local = self.get_ip_access_point()
+        if device['MOUNTPOINT']:
+            return self.umount(device, job)
+        return self.mount(device, job)
 
-            with open(src, "r", encoding="utf-8") as f:
-                content = f.read()
-            content = content.replace("{{IP_LOCAL}}", ip_local)
-            with open("/tmp/index.html", "w", encoding="utf-8") as f:
-                f.write(content)
-            subprocess.run(["sudo", "cp", "/tmp/index.html", dst])
+    def update_website(self, template_name: str, ip: str = None, job=None) -> bool:
+        """
+        Publishes the selected HTML template as index.html of the web server, inserting the local IP.
+        Nothing is written when the live page is already identical.
+        Args:
+            template_name (str): Name of the template in web_templates.
+            ip (str): Local IP inserted in the page, read when not given.
+            job (Job): Job running the publish, checked before starting (optional).
+        Returns:
+            bool: True if the page was published.
+        """
+        try:
+            if job is not None:
+                job.check()
+            ip_local = ip or self.get_ip_access_point()
+            return self.website.publish(template_name, {"IP_LOCAL": ip_local}, **self._privileged_runner(job))
+        except JobCancelled:
+            raise
         except Exception as e:
             logging.error(f"Error updating website: {e}", exc_info=True)
+            return False
 
     def shut_down_system(self) -> None:
         """
         Safely shuts down the system.
         """
         try:
-            subprocess.run(["sudo", "shutdown", "now"])
+            self._privileged([{"op": "shutdown"}])
         except Exception as e:
             logging.error(f"Error shutting down the system: {e}", exc_info=True)
 
@@ -180,6 +385,22 @@ class Command:
         Safely reboots the system.
         """
         try:
-            subprocess.run(["sudo", "reboot"])
+            self._privileged([{"op": "reboot"}])
         except Exception as e:
-            logging.error(f"Error rebooting the system: {e}", exc_info=True)
\ No newline at end of file
+            logging.error(f"Error rebooting the system: {e}", exc_info=True)
+
+def create_command(backend: str = None) -> Command:
+    """
+    Creates the Command object for the selected backend.
+    Args:
+        backend (str): "native" (reads /sys, /proc and keyfiles directly, falling back to
+                       the shell commands when they are not readable) or "subprocess".
+                       Defaults to the JELLYBOX_COMMAND_BACKEND environment variable or "native".
+    """
+    backend = backend or os.environ.get("JELLYBOX_COMMAND_BACKEND", "native")
+    if backend == "subprocess":
+        return Command()
+    if backend != "native":
+        raise ValueError(f"Unknown command backend: {backend}")
+    from .native_command import NativeCommand
+    return NativeCommand()
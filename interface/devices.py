@@ -0,0 +1,155 @@
+import logging
+import select
+import socket
+import sys
+import threading
+import time
+from types import MappingProxyType
+
+NETLINK_KOBJECT_UEVENT = 15
+# Multicast groups: 1 = kernel events, 2 = udev events (sent once udev has probed the device)
+UEVENT_GROUPS = 1 | 2
+MOUNTINFO = "/proc/self/mountinfo"
+
+
+def parse_uevent(data: bytes) -> dict:
+    """
+    Parses a kernel or udev uevent message into a dict of its properties.
+    """
+    if data.startswith(b"libudev\0"):
+        # udev messages carry a binary header with the offset of the properties
+        offset = int.from_bytes(data[16:20], sys.byteorder)
+        length = int.from_bytes(data[20:24], sys.byteorder)
+        data = data[offset:offset + length]
+    properties = {}
+    for field in data.split(b"\0"):
+        key, sep, value = field.partition(b"=")
+        if sep:
+            properties[key.decode(errors="replace")] = value.decode(errors="replace")
+    return properties
+
+
+class DeviceRegistry:
+    """
+    In-memory list of the USB partitions eligible for mounting.
+    It is kept current by a netlink uevent listener (block add/remove/change) and
+    by watching the mount table, so reading it never runs a command.
+    """
+
+    SETTLE_TIME = 0.25  # Coalesces the burst of events sent when a drive is plugged in
+    POLL_INTERVAL = 5   # Only used when netlink is not available
+
+    def __init__(self, command):
+        """
+        Args:
+            command (Command): Command object used to list the devices.
+        """
+        self.command = command
+        self._devices = ()
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self._thread = None
+        self._running = False
+
+    @property
+    def devices(self) -> tuple:
+        """
+        Returns the eligible devices as an immutable tuple.
+        """
+        return self._devices
+
+    @property
+    def count(self) -> int:
+        """
+        Returns the number of eligible devices in constant time.
+        """
+        return len(self._devices)
+
+    def subscribe(self, callback):
+        """
+        Registers a callback called as callback(devices) whenever the list changes.
+        """
+        self._subscribers.append(callback)
+
+    def start(self):
+        """
+        Lists the devices once and starts listening for hotplug and mount events.
+        """
+        self.rescan()
+        self._running = True
+        self._thread = threading.Thread(target=self._listen, name="device-registry", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stops the listener thread.
+        """
+        self._running = False
+
+    def rescan(self) -> bool:
+        """
+        Lists the devices again and notifies the subscribers if the list changed.
+        Returns:
+            bool: True if the list changed.
+        """
+        with self._lock:
+            devices = tuple(MappingProxyType(dict(d)) for d in self.command.get_device_usb())
+            if devices == self._devices:
+                return False
+            self._devices = devices
+        logging.info(f"USB devices changed: {[d['NAME'] for d in devices]}")
+        for callback in self._subscribers:
+            try:
+                callback(devices)
+            except Exception as e:
+                logging.error(f"Error in device subscriber: {e}", exc_info=True)
+        return True
+
+    def _open_uevent_socket(self):
+        sock = socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM, NETLINK_KOBJECT_UEVENT)
+        sock.bind((0, UEVENT_GROUPS))
+        return sock
+
+    def _listen(self):
+        """
+        Waits for block uevents and mount table changes, then rescans once the
+        burst of events has settled.
+        """
+        try:
+            sock = self._open_uevent_socket()
+        except OSError as e:
+            logging.warning(f"Uevent listener not available, polling USB devices: {e}")
+            while self._running:
+                time.sleep(self.POLL_INTERVAL)
+                self._safe_rescan()
+            return
+
+        mountinfo = open(MOUNTINFO, "r")
+        poller = select.poll()
+        poller.register(sock.fileno(), select.POLLIN)
+        # The kernel flags the mount table with POLLPRI whenever something is (un)mounted
+        poller.register(mountinfo.fileno(), select.POLLPRI | select.POLLERR)
+        pending = None
+        try:
+            while self._running:
+                timeout = None if pending is None else max(0, pending - time.monotonic()) * 1000
+                for fd, _ in poller.poll(timeout):
+                    if fd == sock.fileno():
+                        event = parse_uevent(sock.recv(65536))
+                        if event.get("SUBSYSTEM") == "block" and event.get("ACTION") in ("add", "remove", "change"):
+                            pending = time.monotonic() + self.SETTLE_TIME
+                    else:
+                        # Polling the mount table already acknowledges the change
+                        pending = time.monotonic() + self.SETTLE_TIME
+                if pending is not None and time.monotonic() >= pending:
+                    pending = None
+                    self._safe_rescan()
+        finally:
+            sock.close()
+            mountinfo.close()
+
+    def _safe_rescan(self):
+        try:
+            self.rescan()
+        except Exception as e:
+            logging.error(f"Error rescanning USB devices: {e}", exc_info=True)
@@ -1,48 +1,31 @@
-import board
-import busio
-import digitalio
 from PIL import Image, ImageDraw
-import adafruit_rgb_display.st7789 as st7789
+from adafruit_rgb_display import rgb
 import logging
+import threading
+from .panel import Panel
+from .tracing import TRACER
 
 class Display:
     """
     Class responsible for initializing and managing the display hardware.
     """
 
-    def __init__(self):
+    def __init__(self, panel=None):
+        """
+        Args:
+            panel (Panel): Panel already opened (e.g. to show the splash frame), opened here if None.
+        """
         try:
-            # Pin configuration
-            self.cs_pin = digitalio.DigitalInOut(board.CE0)
-            self.dc_pin = digitalio.DigitalInOut(board.D24)
-            self.reset_pin = digitalio.DigitalInOut(board.D25)
-
-            # Display properties
-            self.baudrate = 32000000
-            self.width = 170
-            self.height = 320
-
-            # SPI interface initialization
-            self.spi = busio.SPI(clock=board.SCK, MOSI=board.MOSI, MISO=board.MISO)
-
-            # Create display object
-            self.disp = st7789.ST7789(
-                self.spi,
-                cs=self.cs_pin,
-                dc=self.dc_pin,
-                rst=self.reset_pin,
-                baudrate=self.baudrate,
-                width=self.width,
-                height=self.height,
-                x_offset=35,
-                y_offset=0,
-                rotation=180
-            )
-
-            # Backlight (BLK) configuration
-            self.backlight = digitalio.DigitalInOut(board.D18)
-            self.backlight.direction = digitalio.Direction.OUTPUT
-            self.backlight.value = True  # Turn on backlight
+            self.panel = panel or Panel()
+            self.cs_pin = self.panel.cs_pin
+            self.dc_pin = self.panel.dc_pin
+            self.reset_pin = self.panel.reset_pin
+            self.baudrate = self.panel.baudrate
+            self.width = self.panel.width
+            self.height = self.panel.height
+            self.spi = self.panel.spi
+            self.disp = self.panel.disp
+            self.backlight = self.panel.backlight
 
             # Create image object
             if self.disp.rotation in (90, 270):
@@ -53,6 +36,210 @@ class Display:
             # Create drawing object
             self.draw = ImageDraw.Draw(self.image)
 
+            # RGB565 copy of the panel contents, allocated on first use (NumPy only)
+            self._panel = None
+            self._buffers_lock = threading.Lock()
+            # Conversion scratch buffers of each thread: the render thread (to_panel),
+            # the push thread (show) and the warm-up thread convert at the same time
+            self._local = threading.local()
+
         except Exception as e:
             logging.error(f"Error initializing display: {e}", exc_info=True)
-            raise
\ No newline at end of file
+            raise
+
+    def panel_box(self, box):
+        """
+        Maps a box in image coordinates to panel (framebuffer) coordinates,
+        taking the display rotation into account.
+        Args:
+            box (tuple): (x0, y0, x1, y1) with exclusive right/bottom edges.
+        Returns:
+            tuple: The same area in panel coordinates.
+        """
+        x0, y0, x1, y1 = box
+        w, h = self.image.size
+        rotation = self.disp.rotation
+        if rotation == 90:
+            return (y0, w - x1, y1, w - x0)
+        if rotation == 180:
+            return (w - x1, h - y1, w - x0, h - y0)
+        if rotation == 270:
+            return (h - y1, x0, h - y0, x1)
+        return box
+
+    def _row_bands(self, regions):
+        """
+        Turns boxes in image coordinates into merged bands of full panel rows.
+        A full-width band is a contiguous slice of a panel buffer, so it can be
+        sent without copying; the few extra columns cost less than a copy.
+        Returns:
+            list: (y0, y1) row ranges in panel coordinates, exclusive end.
+        """
+        bands = []
+        for box in sorted(self.panel_box(box)[1::2] for box in regions):
+            if bands and box[0] <= bands[-1][1]:
+                bands[-1] = (bands[-1][0], max(bands[-1][1], box[1]))
+            else:
+                bands.append(tuple(box))
+        return bands
+
+    def _rgb565(self, pixels, out):
+        """
+        Writes the RGB565 (big endian) conversion of an RGB array into out,
+        with the same bit operations as rgb.image_to_data. The intermediate
+        values live in the calling thread's preallocated scratch buffers.
+        Args:
+            pixels (numpy.ndarray): (height, width, 3) uint8 array.
+            out (numpy.ndarray): (height, width) '>u2' array.
+        """
+        numpy = rgb.numpy
+        size = pixels.shape[0] * pixels.shape[1]
+        scratch = self._scratch()
+        high = scratch[0][:size].reshape(pixels.shape[:2])
+        low = scratch[1][:size].reshape(pixels.shape[:2])
+        numpy.bitwise_and(pixels[..., 0], 0xF8, out=high)
+        high <<= 8
+        numpy.bitwise_and(pixels[..., 1], 0xFC, out=low)
+        low <<= 3
+        high |= low
+        numpy.right_shift(pixels[..., 2], 3, out=low)
+        high |= low
+        out[...] = high
+
+    def _convert(self, image, box, out):
+        """
+        Converts a box of the image (image coordinates) into a panel buffer,
+        rotating it into panel orientation.
+        """
+        numpy = rgb.numpy
+        x0, y0, x1, y1 = self.panel_box(box)
+        crop = image.crop(box)
+        if crop.mode != "RGB":
+            crop = crop.convert("RGB")
+        pixels = numpy.asarray(crop)
+        pixels = numpy.rot90(pixels, self.disp.rotation // 90)
+        self._rgb565(pixels, out[y0:y1, x0:x1])
+
+    def _new_panel_buffer(self):
+        return rgb.numpy.zeros((self.disp.height, self.disp.width), dtype=">u2")
+
+    def _scratch(self):
+        """
+        Returns the conversion scratch buffers of the calling thread, allocated once per thread.
+        """
+        scratch = getattr(self._local, "scratch", None)
+        if scratch is None:
+            numpy = rgb.numpy
+            size = self.disp.width * self.disp.height
+            scratch = (numpy.empty(size, dtype=numpy.uint16), numpy.empty(size, dtype=numpy.uint16))
+            self._local.scratch = scratch
+        return scratch
+
+    def _ensure_buffers(self):
+        """
+        Allocates the RGB565 copy of the panel contents, once. The copy is kept
+        in sync with every push, so a partial update can send full-width rows from it.
+        """
+        if self._panel is not None:
+            return
+        with self._buffers_lock:
+            if self._panel is None:
+                panel = self._new_panel_buffer()
+                self._panel_bytes = panel.view(rgb.numpy.uint8).reshape(-1)
+                # Published last: other threads only check _panel
+                self._panel = panel
+
+    def show(self, image, regions=None):
+        """
+        Pushes the image to the panel.
+        When regions are given only those areas are converted and sent, using
+        the ST7789 column/row address window; otherwise the full frame is sent.
+        With NumPy, the conversion writes into a preallocated RGB565 buffer that
+        is handed to SPI without copies.
+        Args:
+            image (PIL.Image): Frame to show, in image coordinates.
+            regions (list): Boxes (x0, y0, x1, y1) that changed since the last push (optional).
+        """
+        if rgb.numpy is None:
+            with TRACER.span("spi"):
+                if regions is None:
+                    self.disp.image(image)
+                    return
+                for box in regions:
+                    x, y, _, _ = self.panel_box(box)
+                    self.disp.image(image.crop(box), x=x, y=y)
+            return
+
+        self._ensure_buffers()
+        with TRACER.span("convert"):
+            for box in regions if regions is not None else [(0, 0) + image.size]:
+                self._convert(image, box, self._panel)
+        self._send(self._panel_bytes, regions)
+
+    def to_panel(self, image):
+        """
+        Converts a frame to the panel's RGB565 format (big endian), in panel
+        orientation, ready to be sent with push_frame().
+        Args:
+            image (PIL.Image): Frame in image coordinates.
+        Returns:
+            memoryview: Panel buffer of width * height * 2 bytes (bytes without NumPy).
+        """
+        with TRACER.span("convert"):
+            if rgb.numpy is not None:
+                frame = self._new_panel_buffer()
+                self._convert(image, (0, 0) + image.size, frame)
+                return memoryview(frame.view(rgb.numpy.uint8).reshape(-1))
+            # Slower but doesn't require numpy
+            if self.disp.rotation != 0:
+                image = image.rotate(self.disp.rotation, expand=True)
+            width, height = image.size
+            pixels = bytearray(width * height * 2)
+            for j in range(height):
+                for i in range(width):
+                    pix = rgb.color565(image.getpixel((i, j)))
+                    pixels[2 * (j * width + i)] = pix >> 8
+                    pixels[2 * (j * width + i) + 1] = pix & 0xFF
+            return bytes(pixels)
+
+    def push_frame(self, frame, regions=None):
+        """
+        Sends a panel buffer created by to_panel().
+        Args:
+            frame (bytes): Full panel buffer.
+            regions (list): Boxes in image coordinates to send; the full frame if None.
+        """
+        if rgb.numpy is not None:
+            # Keeps the copy of the panel contents in sync for show()
+            self._ensure_buffers()
+            source = rgb.numpy.frombuffer(frame, dtype=rgb.numpy.uint8)
+            row = self.disp.width * 2
+            for y0, y1 in self._row_bands(regions) if regions is not None else [(0, self.disp.height)]:
+                self._panel_bytes[y0 * row:y1 * row] = source[y0 * row:y1 * row]
+        self._send(frame, regions)
+
+    def restore(self) -> bool:
+        """
+        Pushes the copy of the panel contents again (e.g. after the panel slept),
+        without rendering or converting anything.
+        Returns:
+            bool: False without NumPy, where no copy is kept.
+        """
+        if self._panel is None:
+            return False
+        self._send(self._panel_bytes, None)
+        return True
+
+    def _send(self, frame, regions):
+        """
+        Sends full-width bands of rows of a panel buffer, as memoryview slices.
+        """
+        width, height = self.disp.width, self.disp.height
+        view = memoryview(frame)
+        with TRACER.span("spi"):
+            if regions is None:
+                self.disp._block(0, 0, width - 1, height - 1, view)
+                return
+            for y0, y1 in self._row_bands(regions):
+                # Sets the row address window and writes only those rows
+                self.disp._block(0, y0, width - 1, y1 - 1, view[y0 * width * 2:y1 * width * 2])
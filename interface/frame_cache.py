@@ -0,0 +1,68 @@
+import logging
+from collections import OrderedDict
+
+class FrameCache:
+    """
+    Bounded LRU cache of rendered frames, stored as ready-to-send panel buffers.
+    Keys are tuples describing the menu state, e.g. (menu, selected_index, ip, items).
+    """
+
+    LOG_EVERY = 100  # Logs the hit/miss counters every N lookups
+
+    def __init__(self, max_frames=24):
+        """
+        Args:
+            max_frames (int): Maximum number of frames kept (about 106 KB each).
+        """
+        self.max_frames = max_frames
+        self.hits = 0
+        self.misses = 0
+        self._frames = OrderedDict()
+
+    def get(self, key):
+        """
+        Returns the cached frame for the state, or None.
+        """
+        frame = self._frames.get(key)
+        if frame is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._frames.move_to_end(key)
+        if (self.hits + self.misses) % self.LOG_EVERY == 0:
+            logging.info(f"Frame cache: {self.stats()}")
+        return frame
+
+    def put(self, key, frame):
+        """
+        Stores a frame, evicting the least recently used one if the cache is full.
+        """
+        self._frames[key] = frame
+        self._frames.move_to_end(key)
+        while len(self._frames) > self.max_frames:
+            self._frames.popitem(last=False)
+
+    def invalidate(self, predicate=None):
+        """
+        Drops cached frames.
+        Args:
+            predicate (callable): Receives a key and returns True to drop it.
+                                  Without predicate the whole cache is dropped.
+        """
+        if predicate is None:
+            self._frames.clear()
+            return
+        for key in [k for k in self._frames if predicate(k)]:
+            del self._frames[key]
+
+    def stats(self) -> dict:
+        """
+        Returns the hit/miss counters.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "frames": len(self._frames),
+        }
@@ -0,0 +1,281 @@
+import argparse
+import logging
+import os
+import re
+from typing import NamedTuple
+from .mount_profiles import SAFE_OPTIONS
+from .privileged import install_file
+
+FSTAB = "/etc/fstab"
+BY_UUID = "/dev/disk/by-uuid"
+# Userspace option (ignored by mount) that marks the entries written by JellyBox
+MANAGED_OPTION = "x-jellybox"
+# Entries appended by older JellyBox versions: "/dev/sdX1 /mnt/usbN vfat nofail 0 2"
+LEGACY_ENTRY = re.compile(r"^/dev/[^/]+$")
+
+
+def _unescape(field: str) -> str:
+    return re.sub(r"\\([0-7]{3})", lambda m: chr(int(m.group(1), 8)), field)
+
+
+def _escape(field: str) -> str:
+    return field.replace("\\", "\\134").replace(" ", "\\040").replace("\t", "\\011")
+
+
+class FstabEntry(NamedTuple):
+    """
+    One mount entry of /etc/fstab.
+    """
+    spec: str
+    file: str
+    vfstype: str
+    mntops: str = "defaults"
+    freq: int = 0
+    passno: int = 0
+
+    @property
+    def uuid(self):
+        """
+        Filesystem UUID of the entry, or None when it is not referenced by UUID.
+        """
+        return self.spec[5:] if self.spec.startswith("UUID=") else None
+
+    @property
+    def managed(self) -> bool:
+        """
+        True for the entries written by JellyBox.
+        """
+        return MANAGED_OPTION in self.mntops.split(",")
+
+    @property
+    def legacy(self) -> bool:
+        """
+        True for the device-path entries appended by older JellyBox versions.
+        """
+        return (bool(LEGACY_ENTRY.match(self.spec)) and self.file.startswith("/mnt/usb")
+                and self.mntops == "nofail")
+
+    @classmethod
+    def parse(cls, line: str):
+        """
+        Parses an fstab line. Returns None for comments, blank and malformed lines.
+        """
+        fields = line.split("#", 1)[0].split()
+        if len(fields) < 3:
+            return None
+        try:
+            return cls(
+                _unescape(fields[0]), _unescape(fields[1]), fields[2],
+                fields[3] if len(fields) > 3 else "defaults",
+                int(fields[4]) if len(fields) > 4 else 0,
+                int(fields[5]) if len(fields) > 5 else 0,
+            )
+        except ValueError:
+            return None
+
+    def render(self) -> str:
+        return "\t".join([
+            _escape(self.spec), _escape(self.file), self.vfstype,
+            self.mntops, str(self.freq), str(self.passno)
+        ])
+
+
+class Fstab:
+    """
+    In-memory model of /etc/fstab.
+    Comments and foreign entries are kept untouched; entries are matched by UUID
+    and mount point, and the file is written back atomically.
+    """
+
+    def __init__(self, lines=None, path=FSTAB):
+        """
+        Args:
+            lines (list): Lines of the file, without line breaks.
+            path (str): File the model is saved to.
+        """
+        self.path = path
+        # (entry, text) pairs; entry is None for comments and blank lines. Lines read
+        # from the file keep their original text so foreign entries are not reformatted.
+        self._lines = [(FstabEntry.parse(line), line) for line in (lines or [])]
+        self._original = self.render()
+
+    @classmethod
+    def load(cls, path=FSTAB):
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(f.read().splitlines(), path)
+
+    @property
+    def entries(self) -> list:
+        return [entry for entry, _ in self._lines if entry is not None]
+
+    @property
+    def changed(self) -> bool:
+        """
+        True if the model differs from the file it was loaded from.
+        """
+        return self.render() != self._original
+
+    def find(self, uuid):
+        """
+        Returns the entry of a filesystem UUID, or None.
+        """
+        for entry in self.entries:
+            if entry.uuid == uuid:
+                return entry
+        return None
+
+    def add(self, entry: FstabEntry) -> None:
+        """
+        Adds or replaces an entry. Any other entry for the same UUID, and any
+        JellyBox entry for the same mount point, is removed.
+        """
+        def replaced(line):
+            return line is not None and (
+                (entry.uuid and line.uuid == entry.uuid)
+                or line.spec == entry.spec
+                or ((line.managed or line.legacy) and line.file == entry.file)
+            )
+        lines, position = [], None
+        for line, text in self._lines:
+            if replaced(line):
+                # The new entry takes the place of the first one it replaces
+                position = len(lines) if position is None else position
+            else:
+                lines.append((line, text))
+        lines.insert(len(lines) if position is None else position, (entry, entry.render()))
+        self._lines = lines
+
+    def remove(self, uuid=None, file=None) -> None:
+        """
+        Removes the JellyBox entries of a UUID and/or mount point (including legacy ones).
+        """
+        def matches(line):
+            return line is not None and (line.managed or line.legacy) and (
+                (uuid is not None and line.uuid == uuid) or (file is not None and line.file == file)
+            )
+        self._lines = [(line, text) for line, text in self._lines if not matches(line)]
+
+    def dedupe(self) -> None:
+        """
+        Removes exact duplicate entries, and JellyBox entries whose mount point or
+        source is already used by an earlier entry. Other entries are never dropped.
+        """
+        seen, seen_files, seen_specs, lines = set(), set(), set(), []
+        for line, text in self._lines:
+            if line is not None:
+                duplicate = line in seen or ((line.managed or line.legacy) and (
+                    line.file in seen_files or line.spec in seen_specs))
+                if duplicate:
+                    continue
+                seen.add(line)
+                seen_files.add(line.file)
+                seen_specs.add(line.spec)
+            lines.append((line, text))
+        self._lines = lines
+
+    def compact(self, keep_uuids) -> list:
+        """
+        Removes stale JellyBox entries: duplicates, device-path entries written by
+        older versions, and entries of filesystems not in keep_uuids.
+        Args:
+            keep_uuids (set): UUIDs whose entries must be kept (e.g. the drives present).
+        Returns:
+            list: The removed entries.
+        """
+        before = self.entries
+        self.dedupe()
+        self._lines = [
+            (line, text) for line, text in self._lines
+            if line is None or not (line.legacy or (line.managed and line.uuid not in keep_uuids))
+        ]
+        remaining = list(self.entries)
+        removed = []
+        for entry in before:
+            if entry in remaining:
+                remaining.remove(entry)
+            else:
+                removed.append(entry)
+        return removed
+
+    def render(self) -> str:
+        return "".join(text + "\n" for _, text in self._lines)
+
+    def save(self) -> bool:
+        """
+        Writes the file atomically, in a single privileged operation, if it changed.
+        Returns:
+            bool: True if the file was written.
+        """
+        if not self.changed:
+            return False
+        content = self.render()
+        # Whole-file rewrites (compact) are not allowed through the root helper
+        install_file(self.path, content.encode("utf-8"), helper=False)
+        self._original = content
+        return True
+
+
+def managed_entry(device: str, uuid: str, target: str, fstype: str, options: str = "") -> FstabEntry:
+    """
+    Builds the JellyBox fstab entry of a drive, referenced by UUID when known,
+    with the options it is mounted with (so boot-time mounts match) plus SAFE_OPTIONS.
+    Args:
+        device (str): Block device name (e.g. "sda1").
+        uuid (str): Filesystem UUID, or None.
+        target (str): Mount point.
+        fstype (str): Filesystem type.
+        options (str): Comma-separated mount options.
+    """
+    spec = f"UUID={uuid}" if uuid else f"/dev/{device}"
+    mntops = ["nofail", MANAGED_OPTION] + [option for option in options.split(",") if option]
+    mntops += [option for option in SAFE_OPTIONS if option not in mntops]
+    return FstabEntry(spec, target, fstype, ",".join(mntops), 0, 2)
+
+
+def apply_op(fstab: Fstab, op: dict) -> None:
+    """
+    Applies an fstab_add or fstab_remove operation (see root_helper.SCHEMA) to the model.
+    """
+    if op["op"] == "fstab_add":
+        fstab.add(managed_entry(op["device"], op.get("uuid"), op["target"], op["fstype"], op.get("options", "")))
+    elif op["op"] == "fstab_remove":
+        fstab.remove(uuid=op.get("uuid"), file=op["target"])
+    else:
+        raise ValueError(f"Not an fstab operation: {op['op']}")
+
+
+def present_uuids() -> set:
+    """
+    Returns the UUIDs of the filesystems currently present.
+    """
+    try:
+        return set(os.listdir(BY_UUID))
+    except FileNotFoundError:
+        return set()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the JellyBox entries of /etc/fstab.")
+    parser.add_argument("command", choices=["compact", "show"])
+    parser.add_argument("--fstab", default=FSTAB, help="fstab file (default: %(default)s)")
+    parser.add_argument("--dry-run", action="store_true", help="only print what would be removed")
+    args = parser.parse_args()
+
+    fstab = Fstab.load(args.fstab)
+    if args.command == "show":
+        for entry in fstab.entries:
+            print(("* " if entry.managed else "  ") + entry.render())
+        return
+
+    removed = fstab.compact(present_uuids())
+    for entry in removed:
+        print(f"remove: {entry.render()}")
+    if not removed:
+        print("Nothing to compact.")
+    elif not args.dry_run:
+        fstab.save()
+        logging.info(f"Compacted fstab, removed {len(removed)} entries")
+
+
+if __name__ == "__main__":
+    main()
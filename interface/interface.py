@@ -1,9 +1,17 @@
 import logging
-import time
-from PIL import Image, ImageDraw, ImageFont
+from PIL import ImageFont
 from .display import Display
 from .menu import Menu
-from .command import Command
+from .command import create_command
+from .frame_cache import FrameCache
+from .jobs import Job, JobExecutor
+from .list_view import ListView
+from .media_index import MediaIndexer, format_duration
+from .mount_registry import Automounter
+from .devices import DeviceRegistry
+from .renderer import Renderer
+from .state import StateService
+from .tracing import TRACER
 
 class Interface:
     """
@@ -18,16 +26,69 @@ class Interface:
     COLOR_SELECTED_BG = (50, 50, 50)
     FONT = ImageFont.load_default()
 
-    def __init__(self):
+    SPINNER = "|/-\\"
+    SPINNER_BOX = (75, 290, 95, 310)
+    # Seconds between spinner frames on the progress screen
+    SPINNER_INTERVAL = 0.15
+
+    # Layout of the menu screens
+    HEADER_HEIGHT = 40
+    MENU_TOP = 50
+    ROW_HEIGHT = 30
+    # Rows end above the frame, and above the spinner on the progress screen
+    MENU_BOTTOM = 316
+    JOB_MENU_BOTTOM = 286
+
+    def __init__(self, panel=None):
         """
         Initializes the interface components: display, menus, and commands.
+        Args:
+            panel (Panel): Panel already opened to show the splash frame (optional).
         """
-        self.display = Display()
-        self.menu = Menu()
-        self.command = Command()
+        self.display = Display(panel)
+        # Menu tree; its screens are registered by ButtonAction
+        self.menu = Menu(self._draw_menu)
+        self.command = create_command()
+        # Background snapshot of IP, SSID, PSK and devices read by the draw paths.
+        # Devices are pushed by the hotplug-driven registry instead of being polled.
+        self.devices = DeviceRegistry(self.command)
+        self.state = StateService(self.command, ttl={"devices": None})
+        self.devices.subscribe(lambda devices: self.state.update(devices=devices))
+        # Known drives are mounted at startup and when plugged in (started by main)
+        self.automount = Automounter(self.command, self.command.mounts)
+        self.devices.subscribe(self.automount.on_devices)
+        # Media of the mounted drives, indexed in the background when they appear
+        self.media = MediaIndexer()
+        self.devices.subscribe(self.media.on_devices)
+        self.media.subscribe(lambda summaries: self.state.update(media=summaries))
         self.disp = self.display.disp
-        self.image = self.display.image
-        self.draw = self.display.draw
+        # Screens are drawn and pushed by the render thread (started by main)
+        self.renderer = Renderer(self.display)
+        # Mount/unmount jobs running in the background
+        self.jobs = JobExecutor()
+        self._spinner_step = 0
+        # Ready-to-send frames of the menu screens
+        self.frames = FrameCache()
+        self._frames_ip = None
+        # Items of each menu and a version number that changes with them
+        self._items = {}
+        # Scrolling list of each menu
+        self._lists = {}
+        # State of the menu currently on the panel, used to compute damaged regions
+        self._shown = None
+        # Devices listed by the last device screen built, in the order of its labels
+        self._device_items = ()
+
+    @property
+    def image(self):
+        """
+        Image being drawn: the renderer's back buffer.
+        """
+        return self.renderer.image
+
+    @property
+    def draw(self):
+        return self.renderer.draw
 
     def _clear_screen(self):
         """
@@ -41,130 +102,250 @@ class Interface:
         """
         self.draw.rectangle((2, 2, self.disp.width - 2, self.disp.height - 2), outline=self.COLOR_GREEN)
 
-    def _draw_header(self):
+    def _draw_header(self, ip):
         """
         Draws the header with the title and server IP.
+        Args:
+            ip (str): IP shown in the header.
         """
         try:
             self.draw.text((50, 10), "JellyBox", fill=self.COLOR_WHITE, font=self.FONT)
-            ip = self.command.get_ip_access_point()
             self.draw.text((40, 20), f"Server IP: {ip}", fill=self.COLOR_WHITE, font=self.FONT)
         except Exception as e:
             logging.error(f"Error drawing header: {e}", exc_info=True)
 
-    def draw_main_menu(self, selected_index):
+    def _list(self, menu_name):
         """
-        Draws the main menu, highlighting the selected option.
-        Args:
-            selected_index (int): Index of the selected option.
+        Returns the scrolling list of a menu, created on first use.
         """
-        self.menu.select_menu = "main"
-        self._clear_screen()
-        self._draw_frame()
-        self._draw_header()
+        view = self._lists.get(menu_name)
+        if view is None:
+            bottom = self.JOB_MENU_BOTTOM if menu_name == "job" else self.MENU_BOTTOM
+            view = ListView(self.disp.width, self.MENU_TOP, bottom, self.ROW_HEIGHT, self.FONT, {
+                "text": self.COLOR_WHITE,
+                "selected_text": self.COLOR_GREEN,
+                "selected_bg": self.COLOR_SELECTED_BG,
+                "background": self.COLOR_BLACK,
+                "indicator": self.COLOR_GREEN,
+            })
+            self._lists[menu_name] = view
+        return view
 
-        for idx, label in enumerate(self.menu.main_menu_items):
-            y = 50 + idx * 30
-            is_selected = (idx == selected_index)
-            bg_color = self.COLOR_SELECTED_BG if is_selected else self.COLOR_BLACK
-            text_color = self.COLOR_GREEN if is_selected else self.COLOR_WHITE
+    def _screen_frame(self):
+        """
+        Returns the push of a full frame for a non-menu screen (screen transition).
+        """
+        self._shown = None
+        return (self.image, None)
 
-            self.draw.rectangle((10, y, self.disp.width - 10, y + 25), fill=bg_color)
-            self.draw.text((15, y + 3), label, fill=text_color, font=self.FONT)
+    def _invalidate_frames(self, menu_name, ip, items):
+        """
+        Drops cached frames that can no longer be shown: all of them when the
+        IP changes, and those of a menu when its items change.
+        Returns:
+            int: Version of the items of the menu, used in the frame keys.
+        """
+        if ip != self._frames_ip:
+            self.frames.invalidate()
+            self._frames_ip = ip
+        known, version = self._items.get(menu_name, (None, 0))
+        # Identity first: unchanged menus pass the same tuple and skip the comparison
+        if items is not known and items != known:
+            self.frames.invalidate(lambda key: key[0] == menu_name)
+            version += 1
+        self._items[menu_name] = (items, version)
+        return version
 
-        self.disp.image(self.image)
+    def _render_menu(self, menu_name, items, selected_index, ip):
+        """
+        Rasterizes a menu screen into the image. Only the visible rows are drawn.
+        """
+        self._clear_screen()
+        self._draw_frame()
+        self._draw_header(ip)
+        self._list(menu_name).render(self.draw, items, selected_index)
 
-    def draw_web_menu(self, selected_index):
+    def _draw_menu(self, menu_name, items, selected_index):
         """
-        Draws the web templates submenu, highlighting the selected option.
+        Shows a menu with its header, highlighting the selected option.
+        The frame is drawn by the renderer.
         Args:
+            menu_name (str): Name of the menu.
+            items (list): Labels of the options.
             selected_index (int): Index of the selected option.
         """
-        self.menu.select_menu = "web"
-        self._clear_screen()
-        self._draw_frame()
-        self._draw_header()
+        items = tuple(items)
+        self.renderer.submit(lambda: [self._menu_frame(menu_name, items, selected_index)])
+
+    def _menu_frame(self, menu_name, items, selected_index):
+        """
+        Returns the push of a menu screen (render thread).
+        Frames are taken from the frame cache when possible, so a cache hit only
+        costs the SPI transfer. Only the rows whose highlight changed (and the
+        header, if its IP changed) are sent to the panel when the same menu is
+        already shown; screen transitions send the full frame.
+        """
+        ip = self.state.snapshot.ip
+        version = self._invalidate_frames(menu_name, ip, items)
+        view = self._list(menu_name)
+        offset = view.scroll_to(selected_index, len(items))
 
-        for idx, label in enumerate(self.menu.web_menu_items):
-            y = 50 + idx * 30
-            is_selected = (idx == selected_index)
-            bg_color = self.COLOR_SELECTED_BG if is_selected else self.COLOR_BLACK
-            text_color = self.COLOR_GREEN if is_selected else self.COLOR_WHITE
+        key = (menu_name, selected_index, offset, ip, version)
+        frame = self.frames.get(key)
+        if frame is None:
+            with TRACER.span("render"):
+                self._render_menu(menu_name, items, selected_index, ip)
+            frame = self.display.to_panel(self.image)
+            self.frames.put(key, frame)
 
-            self.draw.rectangle((10, y, self.disp.width - 10, y + 25), fill=bg_color)
-            self.draw.text((15, y + 3), label, fill=text_color, font=self.FONT)
+        regions = None
+        previous = self._shown
+        if previous is not None and previous[0] == menu_name and previous[4] == version:
+            regions = []
+            if previous[3] != ip:
+                regions.append((0, 0, self.image.width, self.HEADER_HEIGHT))
+            if previous[2] != offset:
+                # Scrolled: every visible row moved
+                regions.append(view.box)
+            elif previous[1] != selected_index:
+                regions.append(view.row_box(previous[1]))
+                regions.append(view.row_box(selected_index))
+        self._shown = key
+        return (frame, regions)
 
-        self.disp.image(self.image)
+    def device_options(self):
+        """
+        Returns the labels of the connected USB devices, with the read speed of
+        the probed ones, from the state snapshot. The devices are kept with the
+        labels, so a selection resolves to the device that was on screen.
+        """
+        state = self.state.snapshot
+        media = {summary.uuid: summary for summary in state.media}
+        self._device_items = state.devices
+        labels = []
+        for d in state.devices:
+            label = f"USB-{d['NAME']} {d['SIZE']}" + (" Mounted" if d['MOUNTPOINT'] else "")
+            summary = media.get(d.get('UUID')) if d['MOUNTPOINT'] else None
+            if summary is not None and summary.read_mbps is not None:
+                # Read speed measured after mounting; "!" marks drives too slow for their videos
+                label += f" {summary.read_mbps:.0f}MB/s" + ("!" if summary.slow else "")
+            labels.append(label)
+        return tuple(labels)
 
-    def draw_device_menu(self, selected_index):
+    def device_at(self, index):
         """
-        Draws the menu of connected USB devices and the 'back' option.
+        Returns the device behind a label of the device screen, or None (e.g. "Back").
+        """
+        if 0 <= index < len(self._device_items):
+            return self._device_items[index]
+        return None
+
+    def media_options(self):
+        """
+        Returns the file count and total duration of each media category of the
+        mounted drives, from the state snapshot.
+        """
+        state = self.state.snapshot
+        names = {d['UUID']: d['NAME'] for d in state.devices if d.get('UUID')}
+        labels = []
+        for summary in state.media:
+            name = names.get(summary.uuid, summary.uuid[:8])
+            labels.append(f"USB-{name}" + (" Indexing..." if summary.scanning else ""))
+            if summary.read_mbps is not None:
+                labels.append(f"  Read {summary.read_mbps:.0f}MB/s 4K {summary.random_ms:.1f}ms")
+                if summary.slow:
+                    labels.append("  Too slow for its videos")
+            for category, count, seconds in summary.categories:
+                duration = f" {format_duration(seconds)}" if seconds else ""
+                labels.append(f"  {category.title()}: {count}{duration}")
+        return tuple(labels) or ("No drives mounted",)
+
+    def job_options(self):
+        """
+        Returns the labels of the background jobs with their status.
+        """
+        labels = {
+            Job.RUNNING: "...",
+            Job.DONE: "OK",
+            Job.FAILED: "FAILED",
+            Job.CANCELLED: "Cancelled",
+            Job.TIMEOUT: "Timed out",
+        }
+        return tuple(f"{job.name} {labels[job.status]}" for job in self.jobs.jobs())
+
+    def draw_job_menu(self, selected_index, items):
+        """
+        Draws the progress screen of the background jobs, with its spinner.
         Args:
             selected_index (int): Index of the selected option.
+            items (tuple): Labels of the options.
         """
-        self.menu.select_menu = "device"
-        self._clear_screen()
-        self._draw_frame()
-        self._draw_header()
+        self.renderer.submit(lambda: [
+            self._menu_frame("job", items, selected_index),
+            self._spinner_frame(),
+        ])
 
-        try:
-            devices = self.command.get_device_usb()
-            options = [
-                f"USB-{d['NAME']} {d['SIZE']}" + (" Mounted" if d['MOUNTPOINT'] else "")
-                for d in devices
-            ]
-            options.append("Back")
-
-            for idx, label in enumerate(options):
-                y = 50 + idx * 30
-                is_selected = (idx == selected_index)
-                bg_color = self.COLOR_SELECTED_BG if is_selected else self.COLOR_BLACK
-                text_color = self.COLOR_GREEN if is_selected else self.COLOR_WHITE
-
-                self.draw.rectangle((10, y, self.disp.width - 10, y + 25), fill=bg_color)
-                self.draw.text((15, y + 3), label, fill=text_color, font=self.FONT)
-
-            self.disp.image(self.image)
-        except Exception as e:
-            logging.error(f"Error dibujando menú de dispositivos: {e}", exc_info=True)
+    def draw_spinner(self):
+        """
+        Advances the spinner of the progress screen, sending only its area to the panel.
+        It is blank when no job is running.
+        """
+        self.renderer.overlay(lambda: [self._spinner_frame()] if self.menu.select_menu == "job" else [])
+
+    def _spinner_frame(self):
+        running = bool(self.jobs.running())
+        self._spinner_step = (self._spinner_step + 1) % len(self.SPINNER)
+        x0, y0, x1, y1 = self.SPINNER_BOX
+        with TRACER.span("render"):
+            self.draw.rectangle((x0, y0, x1 - 1, y1 - 1), fill=self.COLOR_BLACK)
+            if running:
+                self.draw.text((x0 + 7, y0 + 4), self.SPINNER[self._spinner_step],
+                               fill=self.COLOR_GREEN, font=self.FONT)
+        return (self.image, [self.SPINNER_BOX])
 
-    def draw_web_selected(self, index):
+    def draw_web_selected(self):
         """
-        Shows a confirmation screen when selecting a web template.
-        Args:
-            index (int): Index of the selected template.
+        Shows a confirmation screen when selecting a web template for 2 seconds.
+        Input is not blocked meanwhile; the next screen drawn is shown after it.
         """
-        self._clear_screen()
-        self._draw_frame()
-        self.draw.text((40, 20), "Web Selected", fill=self.COLOR_WHITE, font=self.FONT)
-        self.disp.image(self.image)
-        time.sleep(2)
-        self.draw_web_menu(index)
+        self.renderer.submit(self._web_selected_frames, hold=2)
+
+    def _web_selected_frames(self):
+        with TRACER.span("render"):
+            self._clear_screen()
+            self._draw_frame()
+            self.draw.text((40, 20), "Web Selected", fill=self.COLOR_WHITE, font=self.FONT)
+        return [self._screen_frame()]
 
     def draw_network_information(self):
         """
         Shows network information and the Wi-Fi access QR code.
         """
-        self.menu.select_menu = "red"
-        self._clear_screen()
-        self._draw_frame()
+        self.renderer.submit(self._network_information_frames)
+
+    def _network_information_frames(self):
         try:
-            ssid = self.command.get_SSID()
-            pwd = self.command.get_password_access_point()
+            with TRACER.span("render"):
+                self._clear_screen()
+                self._draw_frame()
+                state = self.state.snapshot
+                ssid = state.ssid
+                pwd = state.psk
 
-            self.draw.text((40, 20), "Access Point Information", fill=self.COLOR_WHITE, font=self.FONT)
-            self.draw.text((10, 40), f"SSID: {ssid}", fill=self.COLOR_WHITE, font=self.FONT)
-            self.draw.text((10, 60), f"Password: {pwd}", fill=self.COLOR_WHITE, font=self.FONT)
+                self.draw.text((40, 20), "Access Point Information", fill=self.COLOR_WHITE, font=self.FONT)
+                self.draw.text((10, 40), f"SSID: {ssid}", fill=self.COLOR_WHITE, font=self.FONT)
+                self.draw.text((10, 60), f"Password: {pwd}", fill=self.COLOR_WHITE, font=self.FONT)
 
-            # Generate and show QR
-            self.command.get_qr_access_point()
-            qr = Image.open("wifi_qr.png").resize((150, 150))
-            self.image.paste(qr, (10, 80))
+                # Show the QR, rendered in memory at its native size (cached per network)
+                qr = self.command.get_qr_access_point(ssid, pwd)
+                if qr is not None:
+                    self.image.paste(qr, (10, 80))
 
-            # Back button
-            self.draw.rectangle((10, 250, self.disp.width - 10, 280), fill=self.COLOR_SELECTED_BG)
-            self.draw.text((10, 255), "Back", fill=self.COLOR_WHITE, font=self.FONT)
+                # Back button
+                self.draw.rectangle((10, 250, self.disp.width - 10, 280), fill=self.COLOR_SELECTED_BG)
+                self.draw.text((10, 255), "Back", fill=self.COLOR_WHITE, font=self.FONT)
 
-            self.disp.image(self.image)
+            return [self._screen_frame()]
         except Exception as e:
-            logging.error(f"Error showing network information: {e}", exc_info=True)
\ No newline at end of file
+            logging.error(f"Error showing network information: {e}", exc_info=True)
+            return []
\ No newline at end of file
@@ -0,0 +1,154 @@
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+class JobCancelled(Exception):
+    """
+    Raised inside a job when it has been cancelled or its timeout has expired.
+    """
+
+
+class Job:
+    """
+    A background operation (mount, unmount...) that can be cancelled and has a timeout.
+    The job function receives the Job so it can check it between steps and bound
+    the time of its subprocesses with remaining().
+    """
+
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+    TIMEOUT = "timeout"
+
+    _ids = itertools.count(1)
+
+    def __init__(self, name, key, func, timeout):
+        self.id = next(self._ids)
+        self.name = name
+        self.key = key
+        self.func = func
+        self.timeout = timeout
+        self.status = self.RUNNING
+        self.result = None
+        self.started = time.monotonic()
+        self.deadline = self.started + timeout
+        self._cancelled = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self.status == self.RUNNING
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        """
+        Requests the job to stop at its next check().
+        """
+        self._cancelled.set()
+
+    def remaining(self) -> float:
+        """
+        Returns the seconds left before the timeout.
+        """
+        return max(0.0, self.deadline - time.monotonic())
+
+    def check(self):
+        """
+        Raises JobCancelled if the job was cancelled or has timed out.
+        """
+        if self.cancelled:
+            raise JobCancelled(f"Job '{self.name}' cancelled")
+        if time.monotonic() >= self.deadline:
+            raise JobCancelled(f"Job '{self.name}' timed out")
+
+
+class JobExecutor:
+    """
+    Runs jobs on a thread pool so the interface stays responsive.
+    Jobs with different keys (e.g. different devices) run in parallel; only one
+    job per key runs at a time.
+    """
+
+    def __init__(self, max_workers=4):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._jobs = []
+        self._subscribers = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, callback):
+        """
+        Registers a callback called as callback(job) from the worker thread when a job ends.
+        """
+        self._subscribers.append(callback)
+
+    def submit(self, name, key, func, timeout=120):
+        """
+        Starts a job in the background.
+        Args:
+            name (str): Description shown in the interface.
+            key (str): Resource the job works on; one job per key runs at a time.
+            func (callable): Called as func(job); a falsy result marks the job as failed.
+            timeout (float): Seconds before the job is considered timed out.
+        Returns:
+            Job: The new job, or the job already running for that key.
+        """
+        with self._lock:
+            for job in self._jobs:
+                if job.key == key and job.running:
+                    return job
+            job = Job(name, key, func, timeout)
+            self._jobs.append(job)
+        self._pool.submit(self._run, job)
+        return job
+
+    def jobs(self) -> list:
+        """
+        Returns the running jobs and those finished since the last clear_finished().
+        """
+        with self._lock:
+            return list(self._jobs)
+
+    def running(self) -> list:
+        return [job for job in self.jobs() if job.running]
+
+    def clear_finished(self):
+        """
+        Forgets the finished jobs.
+        """
+        with self._lock:
+            self._jobs = [job for job in self._jobs if job.running]
+
+    def shutdown(self):
+        for job in self.running():
+            job.cancel()
+        self._pool.shutdown(wait=False)
+
+    def _run(self, job):
+        try:
+            job.check()
+            job.result = job.func(job)
+        except JobCancelled as e:
+            logging.warning(str(e))
+        except Exception as e:
+            logging.error(f"Error in job '{job.name}': {e}", exc_info=True)
+
+        if job.cancelled:
+            job.status = Job.CANCELLED
+        elif time.monotonic() >= job.deadline:
+            job.status = Job.TIMEOUT
+        elif job.result:
+            job.status = Job.DONE
+        else:
+            job.status = Job.FAILED
+        logging.info(f"Job '{job.name}' {job.status} in {time.monotonic() - job.started:.1f}s")
+
+        for callback in self._subscribers:
+            try:
+                callback(job)
+            except Exception as e:
+                logging.error(f"Error in job subscriber: {e}", exc_info=True)
@@ -0,0 +1,91 @@
+class ListView:
+    """
+    Scrolling list of menu rows.
+    Only the rows inside the viewport are drawn, so the cost of a frame does not
+    depend on the length of the list. The viewport follows the selection and a
+    scroll indicator is drawn on the right edge when not every row fits.
+    """
+
+    def __init__(self, width, top, bottom, row_height, font, colors):
+        """
+        Args:
+            width (int): Width of the screen.
+            top (int): Y of the first row.
+            bottom (int): Y below which no row is drawn.
+            row_height (int): Distance between rows.
+            font: PIL font of the labels.
+            colors (dict): "text", "selected_text", "selected_bg", "background" and "indicator".
+        """
+        self.width = width
+        self.top = top
+        self.bottom = bottom
+        self.row_height = row_height
+        self.font = font
+        self.colors = colors
+        # A row is 26 pixels high, the rest of row_height is spacing
+        self.rows = max(1, (bottom - top - 26) // row_height + 1)
+        # Index of the first visible row
+        self.offset = 0
+
+    def scroll_to(self, selected_index, count):
+        """
+        Moves the viewport the least needed to show the selected row.
+        Returns:
+            int: The new offset.
+        """
+        if selected_index < self.offset:
+            self.offset = selected_index
+        elif selected_index >= self.offset + self.rows:
+            self.offset = selected_index - self.rows + 1
+        self.offset = max(0, min(self.offset, count - self.rows))
+        return self.offset
+
+    def visible(self, count) -> range:
+        """
+        Returns the indexes of the rows inside the viewport.
+        """
+        return range(self.offset, min(count, self.offset + self.rows))
+
+    def row_box(self, index):
+        """
+        Returns the screen area of a visible row, with exclusive right/bottom edges.
+        """
+        y = self.top + (index - self.offset) * self.row_height
+        return (10, y, self.width - 9, y + 26)
+
+    @property
+    def box(self):
+        """
+        Screen area of the whole list, scroll indicator included, with exclusive right/bottom edges.
+        """
+        return (10, self.top, self.width - 3, self.bottom)
+
+    def render(self, draw, items, selected_index):
+        """
+        Draws the visible rows and the scroll indicator.
+        Args:
+            draw (PIL.ImageDraw): Target.
+            items (sequence): Labels; only the visible ones are read.
+            selected_index (int): Index of the highlighted row.
+        """
+        count = len(items)
+        self.scroll_to(selected_index, count)
+        x0, y0, x1, y1 = self.box
+        draw.rectangle((x0, y0, x1 - 1, y1 - 1), fill=self.colors["background"])
+        for index in self.visible(count):
+            x0, y, x1, _ = self.row_box(index)
+            is_selected = index == selected_index
+            bg_color = self.colors["selected_bg"] if is_selected else self.colors["background"]
+            text_color = self.colors["selected_text"] if is_selected else self.colors["text"]
+            draw.rectangle((x0, y, x1 - 1, y + 25), fill=bg_color)
+            draw.text((x0 + 5, y + 3), items[index], fill=text_color, font=self.font)
+
+        if count > self.rows:
+            # Thumb proportional to the visible part, on a one-pixel track
+            track_top, track_bottom = self.top, self.top + (self.rows - 1) * self.row_height + 25
+            x = self.width - 6
+            draw.line((x, track_top, x, track_bottom), fill=self.colors["selected_bg"])
+            length = track_bottom - track_top
+            thumb = max(6, length * self.rows // count)
+            start = track_top + (length - thumb) * self.offset // (count - self.rows)
+            draw.rectangle((x - 1, start, x + 1, start + thumb), fill=self.colors["indicator"])
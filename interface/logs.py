@@ -0,0 +1,258 @@
+import gzip
+import logging
+import logging.handlers
+import os
+import queue
+import shutil
+import sys
+import threading
+import time
+
+try:
+    from systemd.journal import JournalHandler
+except ImportError:
+    # Without python-systemd, journald mode writes to stderr (captured by the journal)
+    JournalHandler = None
+
+LOG_MODE_ENV = "JELLYBOX_LOG"
+LOG_FILE_ENV = "JELLYBOX_LOG_FILE"
+LOG_FILE = os.path.normpath(os.path.join(os.path.dirname(__file__), "..", "jellybox.log"))
+# RAM-backed location of tmpfs mode: nothing is written to the SD card
+TMPFS_DIR = "/dev/shm"
+FORMAT = "%(asctime)s [%(levelname)s] %(message)s"
+
+MAX_BYTES = 1024 * 1024
+BACKUP_COUNT = 3
+# Records written together; a batch is written when full or after FLUSH_INTERVAL
+BATCH_SIZE = 64
+FLUSH_INTERVAL = 1.0
+# Identical warnings and errors are written once per window, then counted
+DEDUP_WINDOW = 60.0
+
+
+def _gzip_rotator(source: str, dest: str) -> None:
+    with open(source, "rb") as f_in, gzip.open(dest, "wb") as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    os.remove(source)
+
+
+class BatchedRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """
+    Size-rotated log file with gzip-compressed backups (jellybox.log.1.gz...).
+    Records go to the buffered stream; they reach the file when the log writer
+    ends a batch, not once per record. The file size is counted in memory:
+    the inherited size check seeks the stream, which would flush every record.
+    """
+
+    def __init__(self, filename, max_bytes=MAX_BYTES, backup_count=BACKUP_COUNT):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")
+        self.namer = lambda name: name + ".gz"
+        self.rotator = _gzip_rotator
+        try:
+            self._size = os.path.getsize(self.baseFilename)
+        except OSError:
+            self._size = 0
+
+    def _record_size(self, message: str) -> int:
+        return len((message + self.terminator).encode(self.encoding))
+
+    def shouldRollover(self, record) -> bool:
+        if self.maxBytes <= 0:
+            return False
+        return self._size > 0 and self._size + self._record_size(self.format(record)) > self.maxBytes
+
+    def emit(self, record):
+        try:
+            message = self.format(record)
+            size = self._record_size(message)
+            if self.maxBytes > 0 and self._size > 0 and self._size + size > self.maxBytes:
+                self.doRollover()
+            if self.stream is None:
+                self.stream = self._open()
+            self.stream.write(message + self.terminator)
+            self._size += size
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
+
+    def doRollover(self):
+        super().doRollover()
+        self._size = 0
+
+    def flush(self):
+        # Called after every record by StreamHandler.emit; see flush_batch()
+        pass
+
+    def flush_batch(self):
+        super().flush()
+
+
+class DedupFilter(logging.Filter):
+    """
+    Drops the repetitions of a warning or error (same level, location and
+    message) within DEDUP_WINDOW seconds of its first occurrence. The number of
+    dropped repetitions is reported by expired() once the window is over.
+    """
+
+    def __init__(self, window=DEDUP_WINDOW, level=logging.WARNING):
+        super().__init__()
+        self.window = window
+        self.level = level
+        # key -> [first seen, repetitions dropped, name and level of the record]
+        self._seen = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record) -> bool:
+        if record.levelno < self.level or getattr(record, "dedup_summary", False):
+            return True
+        key = (record.levelno, record.pathname, record.lineno, record.getMessage())
+        now = time.monotonic()
+        with self._lock:
+            seen = self._seen.get(key)
+            if seen is not None and now - seen[0] < self.window:
+                seen[1] += 1
+                return False
+            # The record itself is not kept: its traceback would keep frames alive
+            self._seen[key] = [now, 0, (record.name, record.levelname)]
+        return True
+
+    def expired(self) -> list:
+        """
+        Returns summary records of the messages whose window is over and that
+        were repeated, and forgets those messages.
+        """
+        now = time.monotonic()
+        summaries = []
+        with self._lock:
+            for key, (first, count, (name, levelname)) in list(self._seen.items()):
+                if now - first < self.window:
+                    continue
+                del self._seen[key]
+                if count:
+                    levelno, pathname, lineno, message = key
+                    summaries.append(logging.makeLogRecord({
+                        "name": name, "levelno": levelno, "levelname": levelname,
+                        "pathname": pathname, "lineno": lineno,
+                        "msg": f"Last message repeated {count} times in {self.window:.0f} s: {message}",
+                        "dedup_summary": True,
+                    }))
+        return summaries
+
+
+class LogPipeline:
+    """
+    Non-blocking logging: loggers only put records on a queue (after the
+    deduplication filter), and a background writer formats them and writes them
+    in batches. Errors are written at the end of the current batch, without
+    waiting for the flush interval.
+    """
+
+    def __init__(self, handlers, level=logging.INFO, dedup=None):
+        """
+        Args:
+            handlers (list): Handlers the writer sends the records to.
+            level (int): Level of the root logger.
+            dedup (DedupFilter): Filter of repeated messages (optional).
+        """
+        self.handlers = handlers
+        self.level = level
+        self.dedup = dedup or DedupFilter()
+        self._queue = queue.SimpleQueue()
+        self._handler = logging.handlers.QueueHandler(self._queue)
+        self._handler.addFilter(self.dedup)
+        self._thread = None
+
+    def start(self):
+        """
+        Routes the root logger to the queue and starts the writer thread.
+        """
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(self._handler)
+        root.setLevel(self.level)
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Writes the pending records and stops the writer.
+        """
+        if self._thread is None:
+            return
+        logging.getLogger().removeHandler(self._handler)
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+        self._thread = None
+        for handler in self.handlers:
+            handler.close()
+
+    def _run(self):
+        while True:
+            try:
+                record = self._queue.get(timeout=self.dedup.window)
+            except queue.Empty:
+                record = False
+            batch = [] if record is False else [record]
+            deadline = time.monotonic() + FLUSH_INTERVAL
+            # Collects more records until the batch is full, an error arrives or time is up
+            while batch and batch[-1] is not None and len(batch) < BATCH_SIZE \
+                    and batch[-1].levelno < logging.ERROR:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            batch.extend(self.dedup.expired())
+            stop = None in batch
+            self._write([record for record in batch if record is not None])
+            if stop:
+                return
+
+    def _write(self, records):
+        if not records:
+            return
+        for handler in self.handlers:
+            try:
+                for record in records:
+                    if record.levelno >= handler.level:
+                        handler.handle(record)
+                if isinstance(handler, BatchedRotatingFileHandler):
+                    handler.flush_batch()
+                else:
+                    handler.flush()
+            except Exception:
+                handler.handleError(records[-1])
+
+
+def setup_logging(mode=None, path=None, level=logging.INFO) -> LogPipeline:
+    """
+    Configures the JellyBox logging pipeline and starts its writer.
+    Args:
+        mode (str): "file" (rotated jellybox.log next to the code), "tmpfs" (rotated
+                    log in RAM, lost on reboot) or "journald". Defaults to the
+                    JELLYBOX_LOG environment variable or "file".
+        path (str): Log file of file mode (default: JELLYBOX_LOG_FILE or jellybox.log).
+    Returns:
+        LogPipeline: The started pipeline; stop() it on exit to write the pending records.
+    """
+    mode = mode or os.environ.get(LOG_MODE_ENV, "file")
+    if mode == "journald":
+        # The journal adds its own timestamps
+        handler = JournalHandler(SYSLOG_IDENTIFIER="jellybox") if JournalHandler else logging.StreamHandler(sys.stderr)
+        handler.setFormatter(logging.Formatter("[%(levelname)s] %(message)s"))
+    elif mode in ("file", "tmpfs"):
+        if mode == "tmpfs":
+            path = os.path.join(TMPFS_DIR, "jellybox.log")
+        else:
+            path = path or os.environ.get(LOG_FILE_ENV, LOG_FILE)
+        handler = BatchedRotatingFileHandler(path)
+        handler.setFormatter(logging.Formatter(FORMAT))
+    else:
+        raise ValueError(f"Unknown log mode: {mode}")
+    pipeline = LogPipeline([handler], level)
+    pipeline.start()
+    return pipeline
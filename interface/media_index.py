@@ -0,0 +1,585 @@
+import logging
+import os
+import queue
+import sqlite3
+import struct
+import threading
+import time
+from collections import defaultdict
+from typing import NamedTuple
+from .usb_probe import probe_drive
+
+PROBE_ENV = "JELLYBOX_USB_PROBE"
+MEDIA_DB = os.path.normpath(os.path.join(os.path.dirname(__file__), "..", "jellybox-media.db"))
+CATEGORIES = ("video", "audio", "image", "subtitle")
+EXTENSIONS = {
+    "video": (".mkv", ".webm", ".mp4", ".m4v", ".mov", ".avi", ".ts", ".m2ts", ".mpg", ".mpeg", ".wmv", ".flv"),
+    "audio": (".mp3", ".flac", ".m4a", ".m4b", ".aac", ".ogg", ".oga", ".opus", ".wav", ".wma", ".mka"),
+    "image": (".jpg", ".jpeg", ".png", ".gif", ".webp", ".bmp"),
+    "subtitle": (".srt", ".ass", ".ssa", ".vtt", ".sub"),
+}
+CATEGORY_BY_EXTENSION = {ext: category for category, exts in EXTENSIONS.items() for ext in exts}
+# Folders that never hold media (Windows and macOS metadata)
+SKIPPED_DIRS = {"System Volume Information", "$RECYCLE.BIN", "lost+found"}
+HEADER_SIZE = 512
+# Seconds between index commits and summary updates during a scan
+PROGRESS_INTERVAL = 0.5
+# Largest files read by the throughput probe
+PROBE_FILES = 3
+# A drive is slow when it reads slower than this many times the highest video bitrate
+PROBE_HEADROOM = 1.5
+
+# Containers that always hold one kind of media; the others keep the extension's category
+CONTAINER_CATEGORY = {
+    "mp3": "audio", "flac": "audio", "wav": "audio", "aac": "audio",
+    "jpeg": "image", "png": "image", "gif": "image", "webp": "image", "bmp": "image",
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS dirs (
+    uuid TEXT NOT NULL, path TEXT NOT NULL, parent TEXT, mtime INTEGER NOT NULL,
+    PRIMARY KEY (uuid, path)
+);
+CREATE TABLE IF NOT EXISTS files (
+    uuid TEXT NOT NULL, path TEXT NOT NULL, dir TEXT NOT NULL,
+    size INTEGER NOT NULL, mtime INTEGER NOT NULL, category TEXT NOT NULL, duration REAL,
+    PRIMARY KEY (uuid, path)
+);
+CREATE INDEX IF NOT EXISTS files_dir ON files (uuid, dir);
+CREATE TABLE IF NOT EXISTS devices (
+    uuid TEXT PRIMARY KEY, scanned REAL
+);
+CREATE TABLE IF NOT EXISTS probes (
+    uuid TEXT PRIMARY KEY, read_mbps REAL, random_ms REAL, random_p95_ms REAL,
+    direct INTEGER, measured REAL
+);
+"""
+
+
+class MediaSummary(NamedTuple):
+    """
+    What a mounted drive holds: (category, file count, total seconds) per category,
+    and its read performance when it has been probed.
+    """
+    uuid: str
+    categories: tuple
+    scanning: bool
+    read_mbps: float = None
+    random_ms: float = None
+    # Reads slower than the bitrate of its videos need (with some headroom)
+    slow: bool = False
+
+
+def sniff(header: bytes):
+    """
+    Identifies the container of a file from its first bytes.
+    Returns:
+        str: Container name, or None if it is not a known media format.
+    """
+    if header.startswith(b"\x1a\x45\xdf\xa3"):
+        return "matroska"
+    if header[4:8] == b"ftyp":
+        return "m4a" if header[8:11] in (b"M4A", b"M4B") else "mp4"
+    if header.startswith(b"RIFF"):
+        return {b"AVI ": "avi", b"WAVE": "wav", b"WEBP": "webp"}.get(header[8:12])
+    if header.startswith(b"fLaC"):
+        return "flac"
+    if header.startswith(b"OggS"):
+        return "ogg"
+    if header.startswith(b"ID3"):
+        return "mp3"
+    if header.startswith(b"\x30\x26\xb2\x75\x8e\x66\xcf\x11"):
+        return "asf"
+    if header.startswith(b"FLV"):
+        return "flv"
+    if header.startswith(b"\x00\x00\x01\xba"):
+        return "mpeg"
+    if len(header) > 188 and header[0] == 0x47 and header[188] == 0x47:
+        return "mpegts"
+    if header.startswith(b"\x89PNG"):
+        return "png"
+    if header.startswith(b"\xff\xd8\xff"):
+        return "jpeg"
+    if header.startswith(b"GIF8"):
+        return "gif"
+    if header.startswith(b"BM"):
+        return "bmp"
+    if len(header) > 1 and header[0] == 0xFF and header[1] & 0xE0 == 0xE0:
+        # MPEG audio frame sync: layer bits 00 are ADTS AAC
+        return "aac" if header[1] & 0x06 == 0 else "mp3"
+    return None
+
+
+# --- durations -----------------------------------------------------------------
+
+def _mp4_duration(f, size):
+    """
+    Reads the duration from the movie header (moov/mvhd), wherever moov is.
+    """
+    def atoms(start, end):
+        offset = start
+        while offset + 8 <= end:
+            f.seek(offset)
+            head = f.read(16)
+            if len(head) < 8:
+                return
+            length, kind = struct.unpack(">I4s", head[:8])
+            header = 8
+            if length == 1:
+                length, header = struct.unpack(">Q", head[8:16])[0], 16
+            elif length == 0:
+                length = end - offset
+            if length < header:
+                return
+            yield kind, offset + header, offset + length
+            offset += length
+
+    for kind, start, end in atoms(0, size):
+        if kind != b"moov":
+            continue
+        for child, data, _ in atoms(start, end):
+            if child == b"mvhd":
+                f.seek(data)
+                body = f.read(32)
+                if body[0] == 1:
+                    timescale, duration = struct.unpack(">IQ", body[20:32])
+                else:
+                    timescale, duration = struct.unpack(">II", body[12:20])
+                return duration / timescale if timescale else None
+    return None
+
+
+def _ebml_uint(data: bytes, offset: int):
+    """
+    Reads an EBML element size (variable length integer) at offset.
+    Returns:
+        tuple: (value, length).
+    """
+    first = data[offset]
+    length = 1
+    while length <= 8 and not first & (0x80 >> (length - 1)):
+        length += 1
+    value = first & (0xFF >> length)
+    for byte in data[offset + 1:offset + length]:
+        value = value << 8 | byte
+    return value, length
+
+
+def _matroska_duration(f, size):
+    """
+    Reads Segment/Info/Duration, scaled by TimecodeScale. Info comes before the clusters.
+    """
+    f.seek(0)
+    data = f.read(64 * 1024)
+    info = data.find(b"\x15\x49\xa9\x66")
+    if info < 0:
+        return None
+    info_size, length = _ebml_uint(data, info + 4)
+    body = data[info + 4 + length:info + 4 + length + info_size]
+    scale = 1000000
+    position = body.find(b"\x2a\xd7\xb1")
+    if position >= 0:
+        value_size, length = _ebml_uint(body, position + 3)
+        scale = int.from_bytes(body[position + 3 + length:position + 3 + length + value_size], "big")
+    position = body.find(b"\x44\x89")
+    if position < 0:
+        return None
+    value_size, length = _ebml_uint(body, position + 2)
+    value = body[position + 2 + length:position + 2 + length + value_size]
+    if value_size == 4:
+        duration = struct.unpack(">f", value)[0]
+    elif value_size == 8:
+        duration = struct.unpack(">d", value)[0]
+    else:
+        return None
+    return duration * scale / 1e9
+
+
+def _riff_chunks(f, size):
+    offset = 12
+    while offset + 8 <= size:
+        f.seek(offset)
+        kind, length = struct.unpack("<4sI", f.read(8))
+        yield kind, offset + 8, length
+        offset += 8 + length + (length & 1)
+
+
+def _wav_duration(f, size):
+    byte_rate = None
+    for kind, data, length in _riff_chunks(f, size):
+        if kind == b"fmt ":
+            f.seek(data + 8)
+            byte_rate = struct.unpack("<I", f.read(4))[0]
+        elif kind == b"data" and byte_rate:
+            return length / byte_rate
+    return None
+
+
+def _avi_duration(f, size):
+    f.seek(0)
+    header = f.read(HEADER_SIZE)
+    position = header.find(b"avih")
+    if position < 0:
+        return None
+    usec_per_frame = struct.unpack("<I", header[position + 8:position + 12])[0]
+    frames = struct.unpack("<I", header[position + 24:position + 28])[0]
+    return usec_per_frame * frames / 1e6
+
+
+def _flac_duration(f, size):
+    f.seek(8)
+    info = f.read(18)
+    if len(info) < 18:
+        return None
+    sample_rate = int.from_bytes(info[10:13], "big") >> 4
+    samples = int.from_bytes(info[13:18], "big") & 0xFFFFFFFFF
+    return samples / sample_rate if sample_rate else None
+
+
+MP3_BITRATES = {
+    1: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    2: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+MP3_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+
+
+def _mp3_duration(f, size):
+    """
+    Uses the Xing/Info frame count of VBR files, or the bitrate of CBR files.
+    """
+    f.seek(0)
+    head = f.read(10)
+    start = 0
+    if head.startswith(b"ID3"):
+        start = 10 + (head[6] << 21 | head[7] << 14 | head[8] << 7 | head[9])
+    f.seek(start)
+    frame = f.read(64)
+    if len(frame) < 4 or frame[0] != 0xFF or frame[1] & 0xE0 != 0xE0:
+        return None
+    version = (frame[1] >> 3) & 3
+    bitrate_index, rate_index = frame[2] >> 4, (frame[2] >> 2) & 3
+    if version == 1 or rate_index == 3 or bitrate_index in (0, 15):
+        return None
+    sample_rate = MP3_SAMPLE_RATES[version][rate_index]
+    samples_per_frame = 1152 if version == 3 else 576
+    for tag in (b"Xing", b"Info"):
+        position = frame.find(tag)
+        if position > 0 and frame[position + 7] & 1:
+            frames = struct.unpack(">I", frame[position + 8:position + 12])[0]
+            return frames * samples_per_frame / sample_rate
+    bitrate = MP3_BITRATES[1 if version == 3 else 2][bitrate_index] * 1000
+    return (size - start) * 8 / bitrate
+
+
+def _ogg_duration(f, size):
+    """
+    Divides the granule position of the last page by the sample rate of the stream.
+    """
+    f.seek(0)
+    first = f.read(HEADER_SIZE)
+    if b"OpusHead" in first:
+        sample_rate = 48000
+    else:
+        position = first.find(b"\x01vorbis")
+        if position < 0:
+            return None
+        sample_rate = struct.unpack("<I", first[position + 12:position + 16])[0]
+    f.seek(max(0, size - 64 * 1024))
+    tail = f.read()
+    position = tail.rfind(b"OggS")
+    if position < 0 or not sample_rate:
+        return None
+    granule = struct.unpack("<q", tail[position + 6:position + 14])[0]
+    return granule / sample_rate if granule > 0 else None
+
+
+DURATION_PARSERS = {
+    "mp4": _mp4_duration,
+    "m4a": _mp4_duration,
+    "matroska": _matroska_duration,
+    "avi": _avi_duration,
+    "wav": _wav_duration,
+    "flac": _flac_duration,
+    "mp3": _mp3_duration,
+    "ogg": _ogg_duration,
+}
+
+
+def probe(path: str, category: str, size: int):
+    """
+    Classifies a file by its header and reads its duration when the container allows it.
+    Args:
+        path (str): File path.
+        category (str): Category given by the extension.
+        size (int): File size.
+    Returns:
+        tuple: (category, duration in seconds or None); category is None for non-media files.
+    """
+    if category == "subtitle":
+        return category, None
+    try:
+        with open(path, "rb") as f:
+            container = sniff(f.read(HEADER_SIZE))
+            if container is None:
+                return None, None
+            category = "audio" if container == "m4a" else CONTAINER_CATEGORY.get(container, category)
+            parser = DURATION_PARSERS.get(container)
+            duration = parser(f, size) if parser and category in ("video", "audio") else None
+            return category, duration
+    except (OSError, struct.error, IndexError, ValueError, ZeroDivisionError) as e:
+        logging.debug(f"Could not probe {path}: {e}")
+        return category, None
+
+
+def format_duration(seconds: float) -> str:
+    minutes = int(seconds // 60)
+    if minutes >= 60:
+        return f"{minutes // 60}h{minutes % 60:02d}m"
+    return f"{minutes}m{int(seconds % 60):02d}s"
+
+
+class MediaIndexer:
+    """
+    Indexes the media of the mounted USB drives in a background worker.
+    The index is an SQLite database keyed by filesystem UUID, with the path
+    (relative to the mount point), size, mtime, category and duration of each
+    file, and the mtime of each directory. Re-mounting a drive only lists the
+    directories whose mtime changed; the summary of a known drive is available
+    as soon as it is mounted, and is updated while the scan runs.
+
+    After the scan of a newly mounted drive, its read throughput is probed on
+    its largest media files (see usb_probe), unless disabled with
+    JELLYBOX_USB_PROBE=0.
+    """
+
+    def __init__(self, db_path=MEDIA_DB, probe=None):
+        """
+        Args:
+            db_path (str): SQLite database file.
+            probe (bool): Probe the drives after mounting (default: JELLYBOX_USB_PROBE, on).
+        """
+        self.db_path = db_path
+        self.probe = os.environ.get(PROBE_ENV, "1") != "0" if probe is None else probe
+        self._queue = queue.Queue()
+        self._mounted = {}
+        self._summaries = {}
+        self._scanning = set()
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self._thread = None
+        self._db = None
+
+    @property
+    def summaries(self) -> tuple:
+        """
+        Returns the summaries of the mounted drives.
+        """
+        with self._lock:
+            return tuple(self._summaries[uuid] for uuid in self._mounted if uuid in self._summaries)
+
+    def subscribe(self, callback):
+        """
+        Registers a callback called as callback(summaries) when a summary changes.
+        """
+        self._subscribers.append(callback)
+
+    def start(self):
+        """
+        Starts the worker thread.
+        """
+        self._thread = threading.Thread(target=self._run, name="media-indexer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._queue.put(None)
+
+    def on_devices(self, devices):
+        """
+        Device registry subscriber: indexes the drives that have just been mounted.
+        """
+        mounted = {d["UUID"]: d["MOUNTPOINT"] for d in devices if d.get("UUID") and d.get("MOUNTPOINT")}
+        with self._lock:
+            added = [(uuid, path) for uuid, path in mounted.items() if self._mounted.get(uuid) != path]
+            removed = set(self._mounted) - set(mounted)
+            self._mounted = mounted
+        for uuid, path in added:
+            self.index(uuid, path, probe=self.probe)
+        if removed:
+            self._notify()
+
+    def index(self, uuid: str, mountpoint: str, full: bool = False, probe: bool = False):
+        """
+        Queues a scan of a mounted drive.
+        Args:
+            full (bool): Visit every directory, not only the changed ones.
+            probe (bool): Measure the read throughput of the drive after the scan.
+        """
+        with self._lock:
+            self._scanning.add(uuid)
+        self._queue.put((uuid, mountpoint, full, probe))
+
+    def _run(self):
+        try:
+            self._db = sqlite3.connect(self.db_path)
+            self._db.executescript(SCHEMA)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+        except sqlite3.Error as e:
+            logging.error(f"Error opening media index {self.db_path}: {e}", exc_info=True)
+            return
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._db.close()
+                return
+            uuid, mountpoint, full, probe = item
+            try:
+                self._publish(uuid)
+                started = time.monotonic()
+                visited, probed = self._scan(uuid, mountpoint, full)
+                logging.info(f"Media index of {uuid} ({mountpoint}): {visited} directories listed, "
+                             f"{probed} files probed in {time.monotonic() - started:.1f} s")
+                if probe:
+                    self._db.commit()
+                    self._probe(uuid, mountpoint)
+            except Exception as e:
+                logging.error(f"Error indexing {mountpoint}: {e}", exc_info=True)
+            finally:
+                with self._lock:
+                    self._scanning.discard(uuid)
+                self._db.commit()
+                self._publish(uuid)
+
+    def _scan(self, uuid, root, full):
+        """
+        Walks a drive, listing only new and changed directories.
+        Returns:
+            tuple: (directories listed, files probed).
+        """
+        db = self._db
+        known_dirs = {path: mtime for path, mtime in db.execute(
+            "SELECT path, mtime FROM dirs WHERE uuid = ?", (uuid,))}
+        children = defaultdict(list)
+        for path, parent in db.execute("SELECT path, parent FROM dirs WHERE uuid = ?", (uuid,)):
+            if parent is not None:
+                children[parent].append(path)
+
+        seen = set()
+        stack = [""]
+        visited = probed = 0
+        last_progress = time.monotonic()
+        while stack:
+            rel = stack.pop()
+            try:
+                mtime = os.stat(os.path.join(root, rel)).st_mtime_ns
+            except OSError:
+                continue
+            seen.add(rel)
+            if not full and known_dirs.get(rel) == mtime:
+                # Entries unchanged: only its subdirectories need checking
+                stack.extend(children[rel])
+                continue
+
+            visited += 1
+            subdirs, count = self._scan_dir(uuid, root, rel)
+            probed += count
+            db.execute("INSERT OR REPLACE INTO dirs VALUES (?, ?, ?, ?)",
+                       (uuid, rel, os.path.dirname(rel) if rel else None, mtime))
+            stack.extend(subdirs)
+
+            if time.monotonic() - last_progress >= PROGRESS_INTERVAL:
+                db.commit()
+                self._publish(uuid)
+                last_progress = time.monotonic()
+
+        # Directories that disappeared, with their files
+        for rel in set(known_dirs) - seen:
+            db.execute("DELETE FROM dirs WHERE uuid = ? AND path = ?", (uuid, rel))
+            db.execute("DELETE FROM files WHERE uuid = ? AND dir = ?", (uuid, rel))
+        db.execute("INSERT OR REPLACE INTO devices VALUES (?, ?)", (uuid, time.time()))
+        return visited, probed
+
+    def _scan_dir(self, uuid, root, rel):
+        """
+        Lists a directory and updates its files, probing only the new or modified ones.
+        Returns:
+            tuple: (subdirectories, files probed).
+        """
+        db = self._db
+        known = {path: (size, mtime) for path, size, mtime in db.execute(
+            "SELECT path, size, mtime FROM files WHERE uuid = ? AND dir = ?", (uuid, rel))}
+        present = set()
+        subdirs = []
+        probed = 0
+        with os.scandir(os.path.join(root, rel)) as entries:
+            for entry in entries:
+                if entry.name.startswith(".") or entry.name in SKIPPED_DIRS:
+                    continue
+                path = os.path.join(rel, entry.name)
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(path)
+                    continue
+                category = CATEGORY_BY_EXTENSION.get(os.path.splitext(entry.name)[1].lower())
+                if category is None or not entry.is_file(follow_symlinks=False):
+                    continue
+                stat = entry.stat(follow_symlinks=False)
+                present.add(path)
+                if known.get(path) == (stat.st_size, stat.st_mtime_ns):
+                    continue
+                category, duration = probe(entry.path, category, stat.st_size)
+                probed += 1
+                if category is None:
+                    present.discard(path)
+                    continue
+                db.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?)",
+                           (uuid, path, rel, stat.st_size, stat.st_mtime_ns, category, duration))
+        for path in set(known) - present:
+            db.execute("DELETE FROM files WHERE uuid = ? AND path = ?", (uuid, path))
+        return subdirs, probed
+
+    def _probe(self, uuid, root):
+        """
+        Measures the read throughput of a drive on its largest media files and stores it.
+        """
+        files = [(os.path.join(root, path), size) for path, size in self._db.execute(
+            "SELECT path, size FROM files WHERE uuid = ? AND category IN ('video', 'audio') "
+            "ORDER BY size DESC LIMIT ?", (uuid, PROBE_FILES))]
+        result = probe_drive(files)
+        if result is None:
+            return
+        logging.info(f"Read speed of {uuid} ({root}): {result.read_mbps} MB/s sequential, "
+                     f"{result.random_ms} ms random 4K (p95 {result.random_p95_ms} ms), "
+                     f"{'direct' if result.direct else 'cache dropped'}")
+        self._db.execute("INSERT OR REPLACE INTO probes VALUES (?, ?, ?, ?, ?, ?)",
+                         (uuid, result.read_mbps, result.random_ms, result.random_p95_ms,
+                          int(result.direct), time.time()))
+
+    def _publish(self, uuid):
+        """
+        Recomputes the summary of a drive from the index and notifies the subscribers.
+        """
+        rows = {category: (count, total or 0.0) for category, count, total in self._db.execute(
+            "SELECT category, COUNT(*), SUM(duration) FROM files WHERE uuid = ? GROUP BY category", (uuid,))}
+        read_mbps = random_ms = None
+        slow = False
+        probe = self._db.execute("SELECT read_mbps, random_ms FROM probes WHERE uuid = ?", (uuid,)).fetchone()
+        if probe is not None:
+            read_mbps, random_ms = probe
+            # Highest average bitrate of the videos, in MB/s
+            bitrate = self._db.execute(
+                "SELECT MAX(size / duration) FROM files WHERE uuid = ? AND category = 'video' AND duration > 0",
+                (uuid,)).fetchone()[0]
+            slow = bitrate is not None and read_mbps < bitrate / 1e6 * PROBE_HEADROOM
+        with self._lock:
+            categories = tuple((c,) + rows[c] for c in CATEGORIES if c in rows)
+            self._summaries[uuid] = MediaSummary(uuid, categories, uuid in self._scanning,
+                                                 read_mbps, random_ms, slow)
+        self._notify()
+
+    def _notify(self):
+        summaries = self.summaries
+        for callback in self._subscribers:
+            try:
+                callback(summaries)
+            except Exception as e:
+                logging.error(f"Error in media index subscriber: {e}", exc_info=True)
@@ -1,33 +1,167 @@
+import logging
+from .tracing import TRACER
+
+
+class MenuNode:
+    """
+    A screen of the menu tree.
+    Items are either static (label, action) entries or labels returned by a
+    provider, which is only called when the screen is entered or its items
+    have been invalidated.
+    """
+
+    def __init__(self, name, entries=(), provider=None, on_select=None, back=None, on_back=None,
+                 draw=None, on_idle=None, idle_interval=None, invalidate_on=("refresh",)):
+        """
+        Args:
+            name (str): Unique name of the screen.
+            entries (list): Static (label, action) pairs; action takes no arguments.
+            provider (callable): Returns the labels of a dynamic screen.
+            on_select (callable): Called with the index of the selected label of a dynamic screen.
+            back (str): Screen opened by a "Back" entry added at the end (optional).
+            on_back (callable): Called before going back (optional).
+            draw (callable): draw(selected_index, items); a list screen by default.
+            on_idle (callable): Called when no event arrived within idle_interval.
+            idle_interval (callable): Returns the seconds between on_idle calls, or None.
+            invalidate_on (tuple): Events after which the items are computed again.
+        """
+        self.name = name
+        self.entries = tuple(entries)
+        self.provider = provider
+        self.on_select = on_select
+        self.back = back
+        self.on_back = on_back
+        self.draw = draw
+        self.on_idle = on_idle
+        self.idle_interval = idle_interval
+        self.invalidate_on = invalidate_on
+
+    def labels(self) -> tuple:
+        labels = tuple(self.provider()) if self.provider else tuple(label for label, _ in self.entries)
+        return labels + ("Back",) if self.back else labels
+
+
 class Menu:
     """
-    Class that defines the menus and their options for the user interface.
+    Menu tree engine: keeps the current screen and selection, and dispatches
+    navigation to the screen's node in constant time. Screens are registered
+    with add() and entered with open(); the main loop never needs to know them.
     """
 
-    def __init__(self):
-        # Main menu
+    def __init__(self, draw_list=None):
+        """
+        Args:
+            draw_list (callable): draw_list(menu_name, items, selected_index), used by
+                                  the screens without their own draw function.
+        """
+        self.draw_list = draw_list
+        self.nodes = {}
         self.select_menu = ""
-        self.main_menu_items = [
-            "Mount/Unmount USB",
-            "Web Templates",
-            "Network Information",
-            "Restart Server",
-            "Shutdown Server"
-        ]
-        # Web templates submenu
-        self.web_menu_items = [
-            "Terminal",
-            "CyberPunk",
-            "Back"
-        ]
-
-    def get_len_main_menu_items(self) -> int:
-        """
-        Returns the number of options in the main menu.
-        """
-        return len(self.main_menu_items)
-    
-    def get_len_web_menu_items(self) -> int:
-        """
-        Returns the number of options in the web submenu.
-        """
-        return len(self.web_menu_items)
\ No newline at end of file
+        self.selected_index = 0
+        # Items of each screen, computed on entry and kept until invalidated
+        self._items = {}
+
+    def add(self, node):
+        """
+        Registers a screen.
+        """
+        self.nodes[node.name] = node
+        return node
+
+    @property
+    def current(self):
+        return self.nodes.get(self.select_menu)
+
+    def items(self, name=None) -> tuple:
+        """
+        Returns the items of a screen (the current one by default), computing them if needed.
+        """
+        name = name or self.select_menu
+        items = self._items.get(name)
+        if items is None:
+            items = self.nodes[name].labels()
+            self._items[name] = items
+        return items
+
+    def invalidate(self, event="refresh"):
+        """
+        Drops the items of the screens that depend on an event, and redraws the
+        current screen if it is affected.
+        Args:
+            event (str): "refresh" (system state changed) or "job" (a job ended).
+        """
+        for node in self.nodes.values():
+            if event in node.invalidate_on:
+                self._items.pop(node.name, None)
+        node = self.current
+        # The header shows the system state, so a refresh always redraws the screen
+        if node is not None and (event == "refresh" or event in node.invalidate_on):
+            self.selected_index = max(0, min(self.selected_index, len(self.items()) - 1))
+            self.redraw()
+
+    def open(self, name, selected_index=0):
+        """
+        Enters a screen, with fresh items.
+        """
+        self._items.pop(name, None)
+        self.select_menu = name
+        self.selected_index = selected_index
+        self.redraw()
+
+    def redraw(self):
+        """
+        Draws the current screen.
+        """
+        node = self.current
+        items = self.items()
+        if node.draw is not None:
+            node.draw(self.selected_index, items)
+        else:
+            self.draw_list(node.name, items, self.selected_index)
+
+    def move(self, step):
+        """
+        Moves the selection by step rows, wrapping around.
+        """
+        count = len(self.items())
+        if count:
+            self.selected_index = (self.selected_index + step) % count
+            self.redraw()
+
+    def select(self):
+        """
+        Runs the action of the selected item.
+        """
+        node = self.current
+        index = self.selected_index
+        with TRACER.span("dispatch"):
+            try:
+                if node.back and index == len(self.items()) - 1:
+                    if node.on_back is not None:
+                        node.on_back()
+                    self.open(node.back)
+                elif node.provider is not None:
+                    node.on_select(index)
+                elif index < len(node.entries):
+                    node.entries[index][1]()
+                else:
+                    logging.warning(f"Action not defined for index {index} ({node.name})")
+            except Exception as e:
+                logging.error(f"Error executing action {index} in menu '{node.name}': {e}", exc_info=True)
+
+    def idle_timeout(self):
+        """
+        Returns the seconds the main loop may wait for an event before calling idle().
+        """
+        node = self.current
+        if node is None or node.idle_interval is None:
+            return None
+        return node.idle_interval()
+
+    def idle(self):
+        """
+        Called when no event arrived within idle_timeout() (e.g. to animate the screen).
+        """
+        node = self.current
+        if node is not None and node.on_idle is not None:
+            node.on_idle()
@@ -0,0 +1,93 @@
+import json
+import logging
+import os
+import pwd
+from typing import NamedTuple
+
+PROFILES_FILE = os.path.normpath(os.path.join(os.path.dirname(__file__), "..", "jellybox-mount-profiles.json"))
+# User the media files are owned by, so Jellyfin reads them without permission fallbacks
+MEDIA_USER = os.environ.get("JELLYBOX_MEDIA_USER", "jellyfin")
+
+
+class MountProfile(NamedTuple):
+    """
+    Mount options of a filesystem type and the readahead of its block device.
+    Options may contain {uid} and {gid}, replaced by those of the media user
+    (and dropped when that user does not exist).
+    """
+    options: tuple
+    readahead_kb: int = 4096
+
+
+# Read-optimized defaults: no atime writes to the stick, files owned by Jellyfin,
+# UTF-8 file names, and a large readahead for sequential streaming
+DEFAULT_PROFILES = {
+    "vfat": MountProfile(("noatime", "uid={uid}", "gid={gid}", "umask=0022", "iocharset=utf8", "shortname=mixed")),
+    "exfat": MountProfile(("noatime", "uid={uid}", "gid={gid}", "umask=0022", "iocharset=utf8")),
+}
+FALLBACK_PROFILE = MountProfile(("noatime",))
+# Added to the options of every drive (and forced by the root helper): files on a
+# stick never grant privileges through setuid bits or device nodes
+SAFE_OPTIONS = ("nosuid", "nodev")
+
+
+class MountProfiles:
+    """
+    Mount profiles by FSTYPE (as reported by Command.get_device_usb()).
+    The defaults can be overridden per filesystem in jellybox-mount-profiles.json, e.g.
+    {"exfat": {"options": ["noatime", "uid={uid}", "gid={gid}", "umask=0002"], "readahead_kb": 8192}}.
+    """
+
+    def __init__(self, path=PROFILES_FILE, user=MEDIA_USER):
+        """
+        Args:
+            path (str): JSON file with the profile overrides (optional file).
+            user (str): Owner of the mounted files.
+        """
+        self.user = user
+        self.profiles = dict(DEFAULT_PROFILES)
+        self.profiles.update(self._load(path))
+
+    def _load(self, path) -> dict:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            profiles = {}
+            for fstype, profile in data.items():
+                options = profile.get("options", FALLBACK_PROFILE.options)
+                if isinstance(options, str):
+                    options = options.split(",")
+                readahead_kb = int(profile.get("readahead_kb", FALLBACK_PROFILE.readahead_kb))
+                profiles[fstype] = MountProfile(tuple(options), readahead_kb)
+            return profiles
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError, TypeError, AttributeError) as e:
+            logging.error(f"Error reading mount profiles {path}: {e}", exc_info=True)
+            return {}
+
+    def profile(self, fstype: str) -> MountProfile:
+        return self.profiles.get(fstype or "", FALLBACK_PROFILE)
+
+    def options(self, fstype: str) -> str:
+        """
+        Returns the mount options of a filesystem type, as a comma-separated string.
+        """
+        try:
+            user = pwd.getpwnam(self.user)
+            ids = {"uid": user.pw_uid, "gid": user.pw_gid}
+        except KeyError:
+            logging.warning(f"Media user '{self.user}' not found, mounting without uid/gid")
+            ids = None
+        options = []
+        for option in self.profile(fstype).options:
+            if "{" in option:
+                if ids is None:
+                    continue
+                option = option.format(**ids)
+            options.append(option)
+        options += [option for option in SAFE_OPTIONS if option not in options]
+        return ",".join(options)
+
+    def readahead_kb(self, fstype: str) -> int:
+        return self.profile(fstype).readahead_kb
@@ -0,0 +1,243 @@
+import json
+import logging
+import os
+import re
+import socket
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+BASE_DIR = os.path.normpath(os.path.join(os.path.dirname(__file__), ".."))
+REGISTRY_FILE = os.path.join(BASE_DIR, "jellybox-mounts.json")
+READY_FILE = os.environ.get("JELLYBOX_READY_FILE", os.path.join(BASE_DIR, "jellybox-mounts.ready"))
+MOUNT_ROOT = "/mnt"
+# Characters kept from a filesystem label in its mount point
+UNSAFE_NAME = re.compile(r"[^A-Za-z0-9_-]+")
+
+
+def sd_notify(state: str) -> bool:
+    """
+    Sends a notification to systemd (e.g. "READY=1") when running as a Type=notify service.
+    Returns:
+        bool: True if it was sent.
+    """
+    address = os.environ.get("NOTIFY_SOCKET")
+    if not address:
+        return False
+    if address.startswith("@"):
+        address = "\0" + address[1:]
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+            sock.sendto(state.encode("utf-8"), address)
+        return True
+    except OSError as e:
+        logging.error(f"Error notifying systemd: {e}", exc_info=True)
+        return False
+
+
+class MountRegistry:
+    """
+    Persistent map of the known drives: filesystem UUID -> label, mount point and
+    whether it is mounted automatically. A drive keeps its mount point across
+    reboots and re-plugs, whatever its position in the device list, so paths in
+    Jellyfin libraries and fstab stay valid.
+    """
+
+    def __init__(self, path=REGISTRY_FILE):
+        """
+        Args:
+            path (str): JSON file of the registry.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._drives = self._load()
+        # Mount points handed out to new drives that are not remembered yet
+        # (UUID, or device name without one -> mount point)
+        self._reserved = {}
+
+    def _load(self) -> dict:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f).get("drives", {})
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logging.error(f"Error reading mount registry {self.path}: {e}", exc_info=True)
+            return {}
+
+    def _save(self):
+        """
+        Writes the registry atomically (called with the lock held).
+        """
+        directory = os.path.dirname(self.path)
+        fd, tmp = tempfile.mkstemp(prefix=".jellybox-mounts.", dir=directory)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"drives": self._drives}, f, indent=2, sort_keys=True)
+            os.replace(tmp, self.path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+
+    def known(self, uuid) -> bool:
+        """
+        Tells whether a drive is mounted automatically when present.
+        """
+        return bool(uuid) and self._drives.get(uuid, {}).get("automount", False)
+
+    def mountpoint(self, device: dict, current: str = None) -> str:
+        """
+        Returns the stable mount point of a device.
+        Known drives keep theirs. New drives adopt their current mount point (e.g.
+        an fstab entry written by an older version) or get one named after their
+        label, or their UUID. The mount point of a new drive is reserved until
+        remember() or release(), so two drives mounted at the same time never get
+        the same one.
+        Args:
+            device (dict): Device as listed by Command.get_device_usb().
+            current (str): Mount point already used by the drive (optional).
+        """
+        uuid = device.get('UUID')
+        key = uuid or device['NAME']
+        with self._lock:
+            if uuid in self._drives:
+                return self._drives[uuid]["mountpoint"]
+            if key in self._reserved:
+                return self._reserved[key]
+            used = {drive["mountpoint"] for drive in self._drives.values()} | set(self._reserved.values())
+            if current and current.startswith(MOUNT_ROOT + "/") and current not in used:
+                path = current
+            else:
+                name = UNSAFE_NAME.sub("_", device.get('LABEL') or "").strip("_") or uuid or device['NAME']
+                path = f"{MOUNT_ROOT}/usb-{name}"
+                suffix = 2
+                while path in used:
+                    path = f"{MOUNT_ROOT}/usb-{name}-{suffix}"
+                    suffix += 1
+            self._reserved[key] = path
+            return path
+
+    def release(self, device: dict):
+        """
+        Drops the mount point reserved for a new drive (its mount failed, or it was unmounted).
+        """
+        with self._lock:
+            self._reserved.pop(device.get('UUID') or device['NAME'], None)
+
+    def remember(self, device: dict, mountpoint: str):
+        """
+        Records a mounted drive, to be mounted again automatically at that mount point.
+        """
+        uuid = device.get('UUID')
+        if not uuid:
+            return
+        with self._lock:
+            self._drives[uuid] = {"label": device.get('LABEL'), "mountpoint": mountpoint, "automount": True}
+            self._reserved.pop(uuid, None)
+            self._save()
+
+    def forget(self, uuid):
+        """
+        Stops mounting a drive automatically (it was unmounted by the user). Its mount point is kept.
+        """
+        with self._lock:
+            if uuid in self._drives and self._drives[uuid]["automount"]:
+                self._drives[uuid]["automount"] = False
+                self._save()
+
+
+class Automounter:
+    """
+    Mounts the known drives when they are present: at startup, all of them
+    concurrently, and afterwards each one as soon as it is plugged in.
+    Once the startup mounts are done it publishes a ready signal (a file listing
+    the mount points, and READY=1 to systemd) so Jellyfin can start scanning.
+    """
+
+    def __init__(self, command, registry, workers=4, ready_file=READY_FILE):
+        """
+        Args:
+            command (Command): Mounts the drives.
+            registry (MountRegistry): Known drives.
+            workers (int): Drives mounted at the same time.
+            ready_file (str): File written once the startup mounts are done.
+        """
+        self.command = command
+        self.registry = registry
+        self.ready_file = ready_file
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="automount")
+        self._pending = set()
+        # Drives whose mount failed are not retried until they are plugged in again
+        self._failed = set()
+        self._lock = threading.Lock()
+        self._started = False
+
+    def start(self, devices):
+        """
+        Mounts the known drives among devices in the background, then signals readiness.
+        """
+        if os.path.exists(self.ready_file):
+            os.unlink(self.ready_file)
+        futures = self._mount_known(devices)
+        self._started = True
+        threading.Thread(target=self._signal_ready, args=(futures,), name="automount-ready", daemon=True).start()
+
+    def on_devices(self, devices):
+        """
+        Device registry subscriber: mounts the known drives that have just been plugged in.
+        """
+        if self._started:
+            self._mount_known(devices)
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def _mount_known(self, devices) -> list:
+        futures = []
+        with self._lock:
+            self._failed &= {device.get('UUID') for device in devices}
+            for device in devices:
+                uuid = device.get('UUID')
+                if uuid in self._pending or uuid in self._failed or not self.registry.known(uuid):
+                    continue
+                if device['MOUNTPOINT']:
+                    if not self._started:
+                        # Mounted from fstab at boot: only the readahead is missing
+                        self._pool.submit(self.command.set_readahead, device)
+                    continue
+                self._pending.add(uuid)
+                futures.append(self._pool.submit(self._mount, device))
+        return futures
+
+    def _mount(self, device):
+        start = time.monotonic()
+        mounted = False
+        try:
+            mounted = self.command.mount(device, update_fstab=False)
+        finally:
+            with self._lock:
+                self._pending.discard(device.get('UUID'))
+                if not mounted:
+                    self._failed.add(device.get('UUID'))
+        logging.info(f"Automount of {device['NAME']} ({device.get('UUID')}) "
+                     f"{'done' if mounted else 'failed'} in {time.monotonic() - start:.1f} s")
+        return device, mounted
+
+    def _signal_ready(self, futures):
+        start = time.monotonic()
+        wait(futures)
+        results = [future.result() for future in futures if not future.exception()]
+        mountpoints = [self.registry.mountpoint(device) for device, mounted in results if mounted]
+        failed = [device['NAME'] for device, mounted in results if not mounted]
+        try:
+            # Written under another name first: the file is complete as soon as it exists
+            with open(self.ready_file + ".tmp", "w", encoding="utf-8") as f:
+                json.dump({"mounted": mountpoints, "failed": failed, "time": time.time()}, f)
+            os.replace(self.ready_file + ".tmp", self.ready_file)
+        except OSError as e:
+            logging.error(f"Error writing ready file {self.ready_file}: {e}", exc_info=True)
+        sd_notify(f"READY=1\nSTATUS={len(mountpoints)} drives mounted")
+        logging.info(f"Drives ready in {time.monotonic() - start:.1f} s: {mountpoints}"
+                     + (f", failed: {failed}" if failed else ""))
@@ -0,0 +1,269 @@
+import configparser
+import errno
+import fcntl
+import logging
+import os
+import re
+import socket
+import struct
+from .command import Command, is_eligible_device
+
+SIOCGIFADDR = 0x8915
+SYS_BLOCK = "/sys/block"
+MOUNTINFO = "/proc/self/mountinfo"
+UDEV_DATA = "/run/udev/data"
+NM_DEVICES = "/run/NetworkManager/devices"
+NM_CONNECTIONS = "/etc/NetworkManager/system-connections"
+
+
+def human_size(size: int) -> str:
+    """
+    Formats a size in bytes exactly like lsblk does (e.g. "512B", "16G", "14.9G").
+    """
+    exp = 0
+    while exp < 60 and size >= 1 << (exp + 10):
+        exp += 10
+    letter = "BKMGTPE"[exp // 10]
+    if not exp:
+        return f"{size}{letter}"
+    dec, frac = divmod(size, 1 << exp)
+    if frac:
+        # Keeps one decimal digit, rounded like util-linux (4.44 -> 4.4, 4.96 -> 5)
+        frac = (frac * 1000 // (1 << exp) + 50) // 100
+        if frac == 10:
+            dec += 1
+            frac = 0
+    return f"{dec}.{frac}{letter}" if frac else f"{dec}{letter}"
+
+
+def _unescape(value: str) -> str:
+    """
+    Decodes the octal escapes (\\040 for a space...) used in /proc mount tables.
+    """
+    return re.sub(r"\\([0-7]{3})", lambda m: chr(int(m.group(1), 8)), value)
+
+
+def _decode_udev(value: str) -> str:
+    """
+    Decodes the \\xNN escapes of the udev *_ENC properties (bytes of the UTF-8 value).
+    """
+    data = re.sub(rb"\\x([0-9A-Fa-f]{2})", lambda m: bytes([int(m.group(1), 16)]),
+                  value.encode("utf-8", "surrogateescape"))
+    return data.decode("utf-8", "replace")
+
+
+def _read_keyfile(path: str) -> configparser.ConfigParser:
+    """
+    Parses a NetworkManager .nmconnection keyfile.
+    """
+    keyfile = configparser.ConfigParser(interpolation=None, strict=False)
+    with open(path, "r", encoding="utf-8") as f:
+        keyfile.read_file(f)
+    return keyfile
+
+
+class NativeCommand(Command):
+    """
+    Command backend that reads the system information directly from the kernel
+    (ioctl, /sys/block, /proc/self/mountinfo) and from the NetworkManager keyfiles,
+    without forking any process. Whenever that information is not readable
+    (e.g. keyfiles owned by root) it falls back to the shell commands of Command.
+    """
+
+    INTERFACE = "wlan0"
+
+    def get_name_access_point(self) -> str:
+        """
+        Gets the name of the connection active on wlan0.
+        """
+        try:
+            uuid = self._active_connection_uuid()
+            if uuid is None:
+                return ""
+            for path in self._keyfiles():
+                keyfile = _read_keyfile(path)
+                if keyfile.get("connection", "uuid", fallback=None) == uuid:
+                    return keyfile.get("connection", "id", fallback="")
+            return ""
+        except (OSError, configparser.Error) as e:
+            logging.debug(f"Native access point name not available, using nmcli: {e}")
+            return super().get_name_access_point()
+
+    def get_SSID(self, ap: str = None) -> str:
+        """
+        Reads the SSID of the access point from its keyfile.
+        """
+        ap = ap or self.get_name_access_point()
+        try:
+            return self._keyfile(ap).get("wifi", "ssid", fallback="")
+        except (OSError, configparser.Error) as e:
+            logging.debug(f"Native SSID not available, using nmcli: {e}")
+            return super().get_SSID(ap)
+
+    def get_password_access_point(self, ap: str = None) -> str:
+        """
+        Reads the PSK password of the access point from its keyfile.
+        """
+        ap = ap or self.get_name_access_point()
+        try:
+            path = os.path.join(NM_CONNECTIONS, f"{ap}.nmconnection")
+            return _read_keyfile(path)["wifi-security"]["psk"]
+        except KeyError as e:
+            logging.error(f"Error getting access point password: {e}", exc_info=True)
+            return "Not available"
+        except (OSError, configparser.Error) as e:
+            logging.debug(f"Native password not available, using sudo grep: {e}")
+            return super().get_password_access_point(ap)
+
+    def get_ip_access_point(self) -> str:
+        """
+        Returns the IPv4 address of wlan0, read with the SIOCGIFADDR ioctl.
+        """
+        try:
+            with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+                request = struct.pack("256s", self.INTERFACE.encode()[:15])
+                result = fcntl.ioctl(sock.fileno(), SIOCGIFADDR, request)
+            return socket.inet_ntoa(result[20:24])
+        except OSError as e:
+            if e.errno in (errno.EADDRNOTAVAIL, errno.ENODEV):
+                # Expected while wlan0 is down or has no address yet
+                logging.debug(f"Access point IP not available: {e}")
+                return "Not available"
+            logging.error(f"Error getting access point IP, using ip: {e}", exc_info=True)
+            return super().get_ip_access_point()
+
+    def get_device_usb(self) -> list[dict]:
+        """
+        Lists FAT/ExFAT formatted USB devices larger than 1GB, from /sys/block.
+        """
+        try:
+            mounts = self._mountpoints()
+            devices = []
+            for name, path in self._block_devices():
+                size = int(self._read_sys(path, "size")) * 512
+                devno = self._read_sys(path, "dev")
+                human = human_size(size)
+                if not human.endswith(("G", "T")):
+                    continue
+                fstype, uuid, label = self._filesystem(name, devno)
+                if not is_eligible_device(human, fstype):
+                    continue
+                devices.append({
+                    "NAME": name,
+                    "SIZE": human,
+                    "FSTYPE": fstype,
+                    "MOUNTPOINT": mounts.get(devno),
+                    "UUID": uuid,
+                    "LABEL": label
+                })
+            return devices
+        except OSError as e:
+            logging.debug(f"Native device list not available, using lsblk: {e}")
+            return super().get_device_usb()
+
+    def _active_connection_uuid(self):
+        """
+        Returns the UUID of the connection NetworkManager has active on wlan0, or None.
+        """
+        index = socket.if_nametoindex(self.INTERFACE)
+        with open(os.path.join(NM_DEVICES, str(index)), "r", encoding="utf-8") as f:
+            for line in f:
+                key, _, value = line.partition("=")
+                if key.strip() == "connection-uuid":
+                    return value.strip()
+        return None
+
+    def _keyfiles(self):
+        return [
+            os.path.join(NM_CONNECTIONS, name)
+            for name in sorted(os.listdir(NM_CONNECTIONS))
+            if name.endswith(".nmconnection")
+        ]
+
+    def _keyfile(self, ap: str) -> configparser.ConfigParser:
+        """
+        Returns the keyfile of a connection, looked up by file name first and by id otherwise.
+        """
+        try:
+            return _read_keyfile(os.path.join(NM_CONNECTIONS, f"{ap}.nmconnection"))
+        except FileNotFoundError:
+            for path in self._keyfiles():
+                keyfile = _read_keyfile(path)
+                if keyfile.get("connection", "id", fallback=None) == ap:
+                    return keyfile
+            raise
+
+    def _read_sys(self, path: str, name: str) -> str:
+        with open(os.path.join(path, name), "r") as f:
+            return f.read().strip()
+
+    def _block_devices(self):
+        """
+        Yields (name, sysfs path) of every disk followed by its partitions.
+        """
+        for disk in sorted(os.listdir(SYS_BLOCK)):
+            disk_path = os.path.join(SYS_BLOCK, disk)
+            yield disk, disk_path
+            partitions = []
+            for name in os.listdir(disk_path):
+                path = os.path.join(disk_path, name)
+                if os.path.exists(os.path.join(path, "partition")):
+                    partitions.append((int(self._read_sys(path, "partition")), name, path))
+            for _, name, path in sorted(partitions):
+                yield name, path
+
+    def _mountpoints(self) -> dict:
+        """
+        Maps "major:minor" to the first mount point of each mounted block device.
+        """
+        mounts = {}
+        with open(MOUNTINFO, "r") as f:
+            for line in f:
+                fields = line.split()
+                mounts.setdefault(fields[2], _unescape(fields[4]))
+        return mounts
+
+    def _filesystem(self, name: str, devno: str):
+        """
+        Returns (fstype, uuid, label) from the udev database, probing the superblock
+        like blkid when udev has no record of the device.
+        """
+        try:
+            properties = {}
+            with open(os.path.join(UDEV_DATA, f"b{devno}"), "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.startswith("E:"):
+                        key, _, value = line[2:].rstrip("\n").partition("=")
+                        properties[key] = value
+            # ID_FS_LABEL has spaces and non-ASCII characters replaced; the encoded
+            # label keeps them (as lsblk reports it)
+            label = properties.get("ID_FS_LABEL_ENC")
+            label = _decode_udev(label) if label is not None else properties.get("ID_FS_LABEL")
+            return (properties.get("ID_FS_TYPE") or None, properties.get("ID_FS_UUID") or None,
+                    label or None)
+        except FileNotFoundError:
+            return self._probe_filesystem(name)
+
+    def _probe_filesystem(self, name: str):
+        """
+        Detects FAT and exFAT superblocks and reads their volume serial number,
+        formatted as blkid does (e.g. "1A2B-3C4D"), and the FAT boot sector label.
+        """
+        with open(f"/dev/{name}", "rb") as f:
+            boot = f.read(512)
+        label = b""
+        if boot[3:11] == b"EXFAT   ":
+            # The exFAT label is stored in the root directory, not in the boot sector
+            serial = boot[100:104]
+            fstype = "exfat"
+        elif boot[510:512] == b"\x55\xaa" and boot[82:87] == b"FAT32":
+            serial, label = boot[67:71], boot[71:82]
+            fstype = "vfat"
+        elif boot[510:512] == b"\x55\xaa" and boot[54:59] in (b"FAT12", b"FAT16"):
+            serial, label = boot[39:43], boot[43:54]
+            fstype = "vfat"
+        else:
+            return None, None, None
+        value = int.from_bytes(serial, "little")
+        label = label.decode("ascii", "replace").strip()
+        return fstype, f"{value >> 16:04X}-{value & 0xFFFF:04X}", label if label and label != "NO NAME" else None
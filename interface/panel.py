@@ -0,0 +1,107 @@
+import board
+import busio
+import digitalio
+import adafruit_rgb_display.st7789 as st7789
+import logging
+import time
+
+try:
+    import pwmio
+except ImportError:
+    # Without PWM the backlight can only be turned on or off
+    pwmio = None
+
+# ST7789 commands to enter and leave sleep mode (the frame memory is kept)
+SLPIN = 0x10
+SLPOUT = 0x11
+BACKLIGHT_PWM_HZ = 1000
+
+
+class Panel:
+    """
+    ST7789 panel hardware: SPI bus, controller and backlight.
+    It does not need PIL, so it can be opened (and a splash frame pushed)
+    before the rest of the interface is imported.
+    """
+
+    def __init__(self):
+        try:
+            # Pin configuration
+            self.cs_pin = digitalio.DigitalInOut(board.CE0)
+            self.dc_pin = digitalio.DigitalInOut(board.D24)
+            self.reset_pin = digitalio.DigitalInOut(board.D25)
+
+            # Display properties
+            self.baudrate = 32000000
+            self.width = 170
+            self.height = 320
+
+            # SPI interface initialization
+            self.spi = busio.SPI(clock=board.SCK, MOSI=board.MOSI, MISO=board.MISO)
+
+            # Create display object
+            self.disp = st7789.ST7789(
+                self.spi,
+                cs=self.cs_pin,
+                dc=self.dc_pin,
+                rst=self.reset_pin,
+                baudrate=self.baudrate,
+                width=self.width,
+                height=self.height,
+                x_offset=35,
+                y_offset=0,
+                rotation=180
+            )
+
+            # Backlight (BLK) configuration
+            self.backlight = digitalio.DigitalInOut(board.D18)
+            self.backlight.direction = digitalio.Direction.OUTPUT
+            self.backlight.value = True  # Turn on backlight
+            # Created by set_backlight() for the first intermediate level
+            self._pwm = None
+            self._pwm_failed = False
+
+        except Exception as e:
+            logging.error(f"Error initializing panel: {e}", exc_info=True)
+            raise
+
+    def push(self, frame):
+        """
+        Sends a full panel buffer (RGB565, big endian, panel orientation).
+        """
+        self.disp._block(0, 0, self.disp.width - 1, self.disp.height - 1, memoryview(frame))
+
+    def set_backlight(self, level: float):
+        """
+        Sets the backlight brightness.
+        Args:
+            level (float): From 0 (off) to 1 (full). Intermediate levels use PWM on
+                           the backlight pin; where it is not available they mean full.
+        """
+        if 0 < level < 1 and self._pwm is None and pwmio is not None and not self._pwm_failed:
+            try:
+                self.backlight.deinit()
+                self._pwm = pwmio.PWMOut(board.D18, frequency=BACKLIGHT_PWM_HZ, duty_cycle=0xFFFF)
+            except Exception as e:
+                logging.warning(f"Backlight PWM not available, it can only be turned on or off: {e}")
+                self._pwm_failed = True
+                self.backlight = digitalio.DigitalInOut(board.D18)
+                self.backlight.direction = digitalio.Direction.OUTPUT
+        if self._pwm is not None:
+            self._pwm.duty_cycle = int(0xFFFF * min(max(level, 0.0), 1.0))
+        else:
+            self.backlight.value = level > 0
+
+    def sleep(self):
+        """
+        Puts the controller in sleep mode: the panel stops driving the pixels.
+        """
+        self.disp.write(SLPIN)
+
+    def wake(self):
+        """
+        Takes the controller out of sleep mode.
+        """
+        self.disp.write(SLPOUT)
+        # The controller needs 5 ms before the next command
+        time.sleep(0.005)
@@ -0,0 +1,201 @@
+import logging
+import os
+import time
+from .tracing import TRACER
+
+# Seconds without presses before the screen is dimmed and turned off (0 disables the step)
+IDLE_DIM_ENV = "JELLYBOX_IDLE_DIM"
+IDLE_OFF_ENV = "JELLYBOX_IDLE_OFF"
+IDLE_DIM = 60
+IDLE_OFF = 300
+# Backlight brightness while dimmed, in percent
+DIM_LEVEL_ENV = "JELLYBOX_DIM_LEVEL"
+DIM_LEVEL = 20
+
+
+def _env_number(name: str, default: float) -> float:
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        logging.warning(f"Ignoring {name}={value!r}: not a number")
+        return default
+
+
+class PowerManager:
+    """
+    Saves power while nobody uses the box: the backlight is dimmed after
+    IDLE_DIM seconds without presses, and the screen is turned off after
+    IDLE_OFF. While it is off the panel sleeps and nothing is rendered or
+    polled: the status refreshes are paused and the events that would redraw
+    the screen are held back.
+
+    The first press wakes the screen and is not handled as a menu action. The
+    last frame is pushed again from the display's copy of the panel contents
+    (no rendering), then the held events are replayed.
+    """
+
+    ON = "on"
+    DIM = "dim"
+    OFF = "off"
+
+    def __init__(self, interface, post, dim_after=None, off_after=None, dim_level=None):
+        """
+        Args:
+            interface (Interface): Provides the display, renderer, state service and menu.
+            post (callable): Queues an event for the main loop (ButtonEvents.post).
+            dim_after (float): Idle seconds before dimming (default: JELLYBOX_IDLE_DIM or 60).
+            off_after (float): Idle seconds before turning the screen off (default: JELLYBOX_IDLE_OFF or 300).
+            dim_level (float): Brightness while dimmed, from 0 to 1 (default: JELLYBOX_DIM_LEVEL / 100).
+        """
+        self.display = interface.display
+        self.panel = interface.display.panel
+        self.renderer = interface.renderer
+        self.state_service = interface.state
+        self.menu = interface.menu
+        self.post = post
+        self.dim_after = dim_after if dim_after is not None else _env_number(IDLE_DIM_ENV, IDLE_DIM)
+        self.off_after = off_after if off_after is not None else _env_number(IDLE_OFF_ENV, IDLE_OFF)
+        if dim_level is None:
+            dim_level = min(_env_number(DIM_LEVEL_ENV, DIM_LEVEL), 100) / 100
+        self.dim_level = dim_level
+        self.state = self.ON
+        self._last_press = time.monotonic()
+        self._off_since = None
+        # Events received while the screen was off, replayed in order on wake
+        self._held = {}
+        # Totals reported in the log
+        self.wakes = 0
+        self.off_seconds = 0.0
+
+    @property
+    def awake(self) -> bool:
+        return self.state != self.OFF
+
+    def timeout(self, menu_timeout):
+        """
+        Returns the seconds the main loop may wait for an event: until the next
+        power step, or the menu's own idle timeout if it is sooner.
+        Args:
+            menu_timeout (float): Menu.idle_timeout(), None if the screen is static.
+        """
+        if self.state == self.OFF:
+            return None
+        if menu_timeout is not None:
+            # Animated screens (job progress) keep the screen on
+            self._last_press = time.monotonic()
+            return menu_timeout
+        step, due = self._next_step()
+        if step is None:
+            return None
+        return max(0.0, due - time.monotonic())
+
+    def tick(self) -> bool:
+        """
+        Called when no event arrived within timeout(): takes the next power step if it is due.
+        Returns:
+            bool: True if the screen is still on, so the menu's idle() should run.
+        """
+        step, due = self._next_step()
+        if step is not None and time.monotonic() >= due:
+            if step == self.DIM:
+                self.dim()
+            else:
+                self.sleep()
+        return self.awake
+
+    def press(self) -> bool:
+        """
+        Records a button press, waking or brightening the screen.
+        Returns:
+            bool: True if the press should be handled; False if it only woke the screen.
+        """
+        now = time.monotonic()
+        self._last_press = now
+        if self.state == self.OFF:
+            self.wake(now)
+            return False
+        if self.state == self.DIM:
+            self.panel.set_backlight(1.0)
+            self.state = self.ON
+        return True
+
+    def hold(self, event) -> bool:
+        """
+        Holds back an event that would redraw the screen while it is off.
+        Returns:
+            bool: True if the event was held and must not be handled now.
+        """
+        if self.state != self.OFF:
+            return False
+        self._held[event] = None
+        return True
+
+    def dim(self):
+        try:
+            self.panel.set_backlight(self.dim_level)
+        except Exception as e:
+            logging.error(f"Error dimming backlight: {e}", exc_info=True)
+        self.state = self.DIM
+        logging.info(f"Screen dimmed after {time.monotonic() - self._last_press:.0f} s idle")
+
+    def sleep(self):
+        """
+        Turns the screen off: waits for the last frame to reach the panel, pauses
+        the status refreshes, turns the backlight off and puts the panel to sleep.
+        """
+        self.renderer.flush(timeout=2)
+        self.state_service.pause()
+        try:
+            self.panel.set_backlight(0.0)
+            self.panel.sleep()
+        except Exception as e:
+            logging.error(f"Error turning screen off: {e}", exc_info=True)
+        self.state = self.OFF
+        self._off_since = time.monotonic()
+        logging.info(f"Screen off after {self._off_since - self._last_press:.0f} s idle")
+
+    def wake(self, start=None):
+        """
+        Turns the screen on with the frame it showed, then resumes the refreshes
+        and replays the held events.
+        Args:
+            start (float): time.monotonic() of the press, to measure the wake latency.
+        """
+        start = start if start is not None else time.monotonic()
+        try:
+            self.panel.wake()
+            restored = self.display.restore()
+            self.panel.set_backlight(1.0)
+        except Exception as e:
+            logging.error(f"Error waking screen: {e}", exc_info=True)
+            restored = False
+        if not restored:
+            # No copy of the panel contents (without NumPy): the screen is drawn again
+            self.menu.redraw()
+        now = time.monotonic()
+        latency = (now - start) * 1000
+        off = now - self._off_since
+        self.state = self.ON
+        self.wakes += 1
+        self.off_seconds += off
+        if TRACER.enabled:
+            TRACER.record("wake", latency)
+        logging.info(f"Screen woken in {latency:.1f} ms after {off:.0f} s off "
+                     f"({self.wakes} wakes, {self.off_seconds / 3600:.1f} h off in total)")
+        self.state_service.resume()
+        held, self._held = self._held, {}
+        for event in held:
+            self.post(event)
+
+    def _next_step(self):
+        """
+        Returns the next power step and the time.monotonic() it is due at, or (None, None).
+        """
+        if self.state == self.ON and self.dim_after and (not self.off_after or self.dim_after < self.off_after):
+            return self.DIM, self._last_press + self.dim_after
+        if self.state != self.OFF and self.off_after:
+            return self.OFF, self._last_press + self.off_after
+        return None, None
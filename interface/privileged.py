@@ -0,0 +1,280 @@
+import base64
+import json
+import os
+import shutil
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+from .tracing import TRACER
+
+HELPER_SOCKET = os.environ.get("JELLYBOX_HELPER_SOCKET", "/run/jellybox/helper.sock")
+
+# Replaces each destination atomically: copy next to it, fsync, rename, fsync the directory.
+# Arguments: staging directory, mode, destinations (staged as 0, 1, 2...).
+_INSTALL_SCRIPT = """
+src=$1; mode=$2; shift 2; i=0
+for dst do
+    mkdir -p "$(dirname "$dst")" || exit 1
+    tmp="$(dirname "$dst")/.$(basename "$dst").jellybox.tmp"
+    cp "$src/$i" "$tmp" && chmod "$mode" "$tmp" && sync "$tmp" && mv -f "$tmp" "$dst" || exit 1
+    sync "$(dirname "$dst")"
+    i=$((i + 1))
+done
+"""
+
+
+class HelperUnavailable(OSError):
+    """
+    The root helper is not running (or not reachable); callers fall back to sudo.
+    """
+
+
+class HelperError(RuntimeError):
+    """
+    An operation of a batch failed in the root helper.
+    """
+
+    def __init__(self, message, index=None, results=()):
+        super().__init__(message)
+        # Index of the failed operation and results of the ones before it
+        self.index = index
+        self.results = list(results)
+
+
+class HelperClient:
+    """
+    Client of the root helper (see root_helper). Each thread has its own
+    connection, opened on first use and kept for the next calls (reopened when
+    the helper restarts), so batches of different threads (e.g. the automount
+    workers and the state service) run concurrently.
+    """
+
+    def __init__(self, path=HELPER_SOCKET):
+        self.path = path
+        # Per-thread connection: sock and file attributes
+        self._local = threading.local()
+
+    def call(self, ops: list, timeout: float = None) -> list:
+        """
+        Runs a batch of operations in a single round trip.
+        Args:
+            ops (list): Operations, e.g. [{"op": "mkdir", "path": "/mnt/usb0"}].
+            timeout (float): Seconds to wait for the whole batch (optional).
+        Returns:
+            list: The result of each operation.
+        Raises:
+            HelperUnavailable: If the helper is not running; nothing was run.
+            HelperError: If an operation failed; the ones before it were run. Also
+                         when the helper went away before replying: the batch
+                         may have run partly, so it is not sent again.
+        """
+        request = json.dumps({"ops": ops}).encode("utf-8") + b"\n"
+        start = time.perf_counter()
+        reused = getattr(self._local, "sock", None) is not None
+        try:
+            try:
+                self._send(request, timeout)
+            except BrokenPipeError:
+                self._close()
+                if not reused:
+                    raise HelperUnavailable("root helper closed the connection")
+                # The helper restarted since the last call: the request never reached it
+                self._send(request, timeout)
+            # From here the batch may have run (partly): errors are not retried
+            response = self._receive()
+        except EOFError:
+            self._close()
+            raise HelperError("root helper closed the connection before replying")
+        except (OSError, ValueError):
+            self._close()
+            raise
+        if TRACER.enabled:
+            TRACER.command(["helper"] + [op["op"] for op in ops],
+                           (time.perf_counter() - start) * 1000, 0 if response.get("ok") else 1)
+        if not response.get("ok"):
+            raise HelperError(response.get("error", "unknown error"), response.get("index"),
+                              response.get("results", ()))
+        return response["results"]
+
+    def _send(self, request: bytes, timeout: float):
+        if getattr(self._local, "sock", None) is None:
+            self._connect()
+        self._local.sock.settimeout(timeout)
+        self._local.sock.sendall(request)
+
+    def _receive(self) -> dict:
+        line = self._local.file.readline()
+        if not line:
+            raise EOFError
+        return json.loads(line)
+
+    def _connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(self.path)
+        except OSError as e:
+            sock.close()
+            raise HelperUnavailable(f"root helper not available at {self.path}: {e}")
+        self._local.sock = sock
+        self._local.file = sock.makefile("rb")
+
+    def _close(self):
+        if getattr(self._local, "sock", None) is not None:
+            self._local.file.close()
+            self._local.sock.close()
+        self._local.sock = self._local.file = None
+
+
+HELPER = HelperClient()
+# Serializes the fstab updates of the sudo fallback (the helper has its own lock)
+_FSTAB_LOCK = threading.Lock()
+
+
+def install_op(dst: str, content: bytes, mode: int = 0o644) -> dict:
+    """
+    Builds the operation replacing a root-owned file, to batch it with others.
+    """
+    return {"op": "install", "path": dst, "content": base64.b64encode(content).decode("ascii"), "mode": mode}
+
+
+def run_privileged(ops: list, runner=subprocess.run, timeout: float = None) -> list:
+    """
+    Runs privileged operations through the root helper in a single round trip,
+    or with one sudo command each when the helper is not running.
+    Args:
+        ops (list): Operations (see root_helper.SCHEMA).
+        runner (callable): Runs the sudo commands of the fallback, like subprocess.run.
+        timeout (float): Seconds to wait for the helper (optional).
+    Returns:
+        list: The result of each operation.
+    Raises:
+        HelperError, subprocess.CalledProcessError: If an operation fails.
+    """
+    try:
+        return HELPER.call(ops, timeout)
+    except HelperUnavailable:
+        return [_run_with_sudo(op, runner) for op in ops]
+
+
+def _run_with_sudo(op: dict, runner):
+    """
+    Runs one operation as a sudo command (fallback of run_privileged).
+    """
+    name = op["op"]
+    if name == "mkdir":
+        runner(["sudo", "mkdir", "-p", op["path"]], check=True)
+    elif name == "rmdir":
+        return runner(["sudo", "rmdir", op["path"]]).returncode == 0
+    elif name == "mount":
+        command = ["sudo", "mount"]
+        if op.get("fstype"):
+            command += ["-t", op["fstype"]]
+        if op.get("options"):
+            command += ["-o", op["options"]]
+        runner(command + [f"/dev/{op['device']}", op["target"]], check=True)
+    elif name == "umount":
+        runner(["sudo", "umount", op["target"]], check=True)
+    elif name == "readahead":
+        # blockdev counts 512-byte sectors
+        return runner(["sudo", "blockdev", "--setra", str(op["kb"] * 2), f"/dev/{op['device']}"]).returncode == 0
+    elif name in ("fstab_add", "fstab_remove"):
+        # fstab imports this module
+        from .fstab import Fstab, apply_op
+        # Concurrent mounts must not interleave their read-modify-write of fstab
+        with _FSTAB_LOCK:
+            fstab = Fstab.load()
+            apply_op(fstab, op)
+            if not fstab.changed:
+                return False
+            _install_with_sudo({fstab.path: fstab.render().encode("utf-8")}, 0o644, runner)
+        return True
+    elif name == "install":
+        _install_with_sudo({op["path"]: base64.b64decode(op["content"])}, op.get("mode", 0o644), runner)
+    elif name == "read_psk":
+        path = f"/etc/NetworkManager/system-connections/{op['connection']}.nmconnection"
+        content = runner(["sudo", "grep", "psk=", path], stdout=subprocess.PIPE, text=True, check=True).stdout
+        return content.split("=", 1)[1].strip()
+    elif name == "shutdown":
+        runner(["sudo", "shutdown", "now"])
+    elif name == "reboot":
+        runner(["sudo", "reboot"])
+    else:
+        raise ValueError(f"Unknown privileged operation: {name}")
+    return None
+
+
+def _atomic_write(dst: str, content: bytes, mode: int) -> None:
+    """
+    Writes a file atomically in-process: temp file in the same directory, fsync, rename.
+    """
+    directory = os.path.dirname(dst)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=f".{os.path.basename(dst)}.", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp, mode)
+        os.replace(tmp, dst)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+    dir_fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
+
+
+def _install_with_sudo(files: dict, mode: int, runner=subprocess.run) -> None:
+    staging = tempfile.mkdtemp(prefix="jellybox-")
+    try:
+        for i, content in enumerate(files.values()):
+            with open(os.path.join(staging, str(i)), "wb") as f:
+                f.write(content)
+        runner(
+            ["sudo", "sh", "-c", _INSTALL_SCRIPT, "sh", staging, f"{mode:o}", *files],
+            check=True
+        )
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+
+def install_files(files: dict, mode: int = 0o644, helper: bool = True,
+                  runner=subprocess.run, timeout: float = None) -> None:
+    """
+    Atomically replaces root-owned files (e.g. /var/www/html/index.html).
+    Runs in-process when already root, otherwise in a single request to the root
+    helper, or as a single sudo call for all files when the helper is not running.
+    Args:
+        files (dict): Maps destination paths to their content (bytes).
+        mode (int): Permissions of the installed files.
+        helper (bool): False for files the helper does not install (e.g. /etc/fstab, which
+                       it only changes through fstab_add and fstab_remove): sudo is used.
+        runner (callable): Runs the sudo command of the fallback, like subprocess.run.
+        timeout (float): Seconds to wait for the helper (optional).
+    Raises:
+        HelperError, subprocess.CalledProcessError: If the privileged copy fails.
+    """
+    if os.geteuid() == 0:
+        for dst, content in files.items():
+            _atomic_write(dst, content, mode)
+        return
+    if not helper:
+        _install_with_sudo(files, mode, runner)
+        return
+    try:
+        HELPER.call([install_op(dst, content, mode) for dst, content in files.items()], timeout)
+    except HelperUnavailable:
+        _install_with_sudo(files, mode, runner)
+
+
+def install_file(dst: str, content: bytes, mode: int = 0o644, helper: bool = True) -> None:
+    """
+    Atomically replaces a single root-owned file. See install_files().
+    """
+    install_files({dst: content}, mode, helper)
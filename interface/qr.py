@@ -0,0 +1,48 @@
+import functools
+
+# Modules of blank margin (quiet zone) kept at least around the code
+QUIET_ZONE = 2
+
+
+def _escape(value: str) -> str:
+    """
+    Escapes the characters with a meaning in the WIFI: QR payload.
+    """
+    for char in '\\;,:"':
+        value = value.replace(char, "\\" + char)
+    return value
+
+
+@functools.lru_cache(maxsize=8)
+def wifi_qr(ssid: str, password: str, encryption: str = "WPA", size: int = 150):
+    """
+    Renders the Wi-Fi access QR code in memory, as a 1-bit image of size x size pixels.
+    Each module is drawn as a whole number of pixels, so the code is sharp at the
+    panel's native resolution. Results are cached by (ssid, password, encryption).
+    Args:
+        ssid (str): Network name.
+        password (str): Network password.
+        encryption (str): "WPA", "WEP" or "nopass".
+        size (int): Side of the image in pixels.
+    Returns:
+        PIL.Image: The QR code, black modules on white.
+    """
+    # Only needed by the network information screen: not imported at startup
+    import qrcode
+    from PIL import Image
+
+    qr = qrcode.QRCode(border=0)
+    qr.add_data(f"WIFI:S:{_escape(ssid)};T:{encryption};P:{_escape(password)};;")
+    qr.make(fit=True)
+    matrix = qr.get_matrix()
+    modules = len(matrix)
+
+    code = Image.new("1", (modules, modules))
+    code.putdata([0 if dark else 1 for row in matrix for dark in row])
+    scale = max(1, size // (modules + 2 * QUIET_ZONE))
+    code = code.resize((modules * scale, modules * scale), Image.NEAREST)
+
+    image = Image.new("1", (size, size), 1)
+    offset = (size - modules * scale) // 2
+    image.paste(code, (offset, offset))
+    return image
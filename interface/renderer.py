@@ -0,0 +1,194 @@
+import logging
+import queue
+import threading
+import time
+from PIL import Image, ImageDraw
+from .tracing import TRACER
+
+
+class Renderer:
+    """
+    Render thread with two frame buffers.
+    The input side only posts the screen it wants to see; pending screens are
+    coalesced so only the latest one is drawn (intermediate states are never
+    rasterized). Frames are handed to a separate push thread, so the SPI
+    transfer of one frame overlaps the rasterization of the next one.
+
+    A render function runs on the render thread, draws into `image`/`draw`
+    (the back buffer) and returns the pushes to make, as a list of
+    (frame, regions) pairs where frame is a panel buffer (bytes, see
+    Display.push_frame) or a PIL image (see Display.show).
+    """
+
+    def __init__(self, display):
+        """
+        Args:
+            display (Display): Display the frames are pushed to. Its image is the first buffer.
+        """
+        self.display = display
+        self.buffers = [display.image, Image.new(display.image.mode, display.image.size)]
+        self.draws = [display.draw, ImageDraw.Draw(self.buffers[1])]
+        self._back = 0
+        # Set while a buffer is not referenced by a frame waiting to be pushed
+        self._free = [threading.Event(), threading.Event()]
+        for free in self._free:
+            free.set()
+        self._cond = threading.Condition()
+        # Pending screens: (render, hold, presses). Only the last one can be coalesced.
+        self._screens = []
+        self._overlay = None
+        self._in_flight = 0
+        self._pushes = queue.Queue(maxsize=1)
+        self._running = False
+        self._threads = []
+
+    @property
+    def image(self):
+        """
+        Back buffer, only drawn by the render thread (or the caller when not started).
+        """
+        return self.buffers[self._back]
+
+    @property
+    def draw(self):
+        return self.draws[self._back]
+
+    def start(self):
+        """
+        Starts the render and push threads. Until then, submit() draws synchronously.
+        """
+        self._running = True
+        self._threads = [
+            threading.Thread(target=self._render_loop, name="renderer", daemon=True),
+            threading.Thread(target=self._push_loop, name="renderer-push", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        """
+        Stops the threads once the frame being drawn has been pushed.
+        """
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        self._pushes.put(None)
+
+    def submit(self, render, hold=0.0):
+        """
+        Posts the screen to show, replacing any pending one that was not drawn yet.
+        Args:
+            render (callable): Render function, see the class description.
+            hold (float): Seconds the screen stays on the panel before the next one
+                          is drawn; such screens are never coalesced away.
+        """
+        press = TRACER.detach()
+        if not self._running:
+            self._run(render, [press] if press else [])
+            if hold:
+                time.sleep(hold)
+            return
+        with self._cond:
+            presses = [press] if press else []
+            if self._screens and not self._screens[-1][1]:
+                presses = self._screens.pop()[2] + presses
+            self._screens.append((render, hold, presses))
+            # The new screen redraws everything, a pending overlay would be stale
+            self._overlay = None
+            self._cond.notify_all()
+
+    def overlay(self, render):
+        """
+        Posts a partial update of the current screen (e.g. an animation frame).
+        Only the latest overlay is drawn, after any pending screen.
+        """
+        if not self._running:
+            self._run(render, [])
+            return
+        with self._cond:
+            self._overlay = render
+            self._cond.notify_all()
+
+    def flush(self, timeout=None) -> bool:
+        """
+        Waits until every posted screen has been pushed to the panel.
+        Returns:
+            bool: False if the timeout expired first.
+        """
+        with self._cond:
+            return self._cond.wait_for(
+                lambda: not self._screens and self._overlay is None and not self._in_flight, timeout)
+
+    def _run(self, render, presses):
+        """
+        Draws a screen in the calling thread and pushes it.
+        """
+        for frame, regions in self._render(render, presses):
+            self._push(frame, regions)
+        for press in presses:
+            TRACER.end_press(press)
+
+    def _render(self, render, presses):
+        TRACER.attach(presses[-1] if presses else None)
+        try:
+            return render() or []
+        except Exception as e:
+            logging.error(f"Error rendering screen: {e}", exc_info=True)
+            return []
+        finally:
+            TRACER.detach()
+
+    def _push(self, frame, regions):
+        try:
+            if isinstance(frame, (bytes, bytearray, memoryview)):
+                self.display.push_frame(frame, regions)
+            else:
+                self.display.show(frame, regions)
+        except Exception as e:
+            logging.error(f"Error pushing frame: {e}", exc_info=True)
+
+    def _render_loop(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: not self._running or self._screens or self._overlay)
+                if not self._running:
+                    return
+                if self._screens:
+                    render, hold, presses = self._screens.pop(0)
+                else:
+                    render, hold, presses = self._overlay, 0.0, []
+                    self._overlay = None
+                self._in_flight += 1
+
+            # The back buffer may still be referenced by the frame being pushed
+            back = self._back
+            self._free[back].wait()
+            pushes = self._render(render, presses)
+            uses_buffer = any(frame is self.buffers[back] for frame, _ in pushes)
+            if uses_buffer:
+                self._free[back].clear()
+                self._back ^= 1
+            self._pushes.put((pushes, back if uses_buffer else None, presses))
+
+            if hold:
+                with self._cond:
+                    self._cond.wait_for(lambda: not self._running, hold)
+
+    def _push_loop(self):
+        while True:
+            item = self._pushes.get()
+            if item is None:
+                return
+            pushes, buffer, presses = item
+            TRACER.attach(presses[-1] if presses else None)
+            for frame, regions in pushes:
+                self._push(frame, regions)
+            TRACER.detach()
+            if buffer is not None:
+                self._free[buffer].set()
+            # Pixels are on the panel: the presses that led to this screen are complete
+            for press in presses:
+                TRACER.end_press(press)
+            with self._cond:
+                self._in_flight -= 1
+                self._cond.notify_all()
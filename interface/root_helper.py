@@ -0,0 +1,382 @@
+import argparse
+import base64
+import binascii
+import contextlib
+import json
+import logging
+import os
+import pwd
+import re
+import socket
+import socketserver
+import struct
+import subprocess
+import threading
+from .fstab import Fstab, apply_op
+from .mount_profiles import SAFE_OPTIONS
+from .privileged import HELPER_SOCKET, _atomic_write
+
+# Largest request accepted (a published page with its bundled assets, base64-encoded)
+MAX_REQUEST = 16 * 1024 * 1024
+MOUNT_ROOT = "/mnt"
+WEB_ROOT = "/var/www/html"
+NM_CONNECTIONS = "/etc/NetworkManager/system-connections"
+DEVICE_NAME = re.compile(r"[a-z][a-z0-9]*")
+FSTYPE = re.compile(r"[a-z0-9]+")
+UUID = re.compile(r"[A-Fa-f0-9][A-Fa-f0-9\-]*")
+# Mount options accepted: flags, and options whose value must match a pattern.
+# Anything else (suid, dev, exec, bind, remount...) is rejected, and SAFE_OPTIONS are always added.
+MOUNT_FLAGS = {"ro", "rw", "noatime", "relatime", "nodiratime", "noexec", "nosuid", "nodev",
+               "nofail", "sync", "async", "flush", "utf8"}
+MOUNT_VALUES = {
+    "uid": re.compile(r"[0-9]+"),
+    "gid": re.compile(r"[0-9]+"),
+    "umask": re.compile(r"[0-7]{1,4}"),
+    "dmask": re.compile(r"[0-7]{1,4}"),
+    "fmask": re.compile(r"[0-7]{1,4}"),
+    "iocharset": re.compile(r"[a-z0-9\-]+"),
+    "codepage": re.compile(r"[0-9]+"),
+    "shortname": re.compile(r"lower|win95|winnt|mixed"),
+    "errors": re.compile(r"continue|remount-ro"),
+}
+
+
+def _path_under(root: str, path: str) -> str:
+    """
+    Accepts a normalized absolute path strictly below root that does not escape it through symlinks.
+    """
+    if not isinstance(path, str) or os.path.normpath(path) != path or not path.startswith(root + "/"):
+        raise ValueError(f"path not allowed: {path!r}")
+    parent = os.path.realpath(os.path.dirname(path))
+    if parent != root and not parent.startswith(root + "/"):
+        raise ValueError(f"path escapes {root}: {path!r}")
+    return path
+
+
+def _mount_path(value):
+    return _path_under(MOUNT_ROOT, value)
+
+
+def _install_path(value):
+    return _path_under(WEB_ROOT, value)
+
+
+def _device(value):
+    if not isinstance(value, str) or not DEVICE_NAME.fullmatch(value):
+        raise ValueError(f"invalid device: {value!r}")
+    return value
+
+
+def _fstype(value):
+    if not isinstance(value, str) or not FSTYPE.fullmatch(value):
+        raise ValueError(f"invalid filesystem type: {value!r}")
+    return value
+
+
+def _uuid(value):
+    if not isinstance(value, str) or not UUID.fullmatch(value):
+        raise ValueError(f"invalid UUID: {value!r}")
+    return value
+
+
+def _mount_options(value):
+    """
+    Accepts the allow-listed mount options and returns them with SAFE_OPTIONS added.
+    """
+    if not isinstance(value, str):
+        raise ValueError(f"invalid mount options: {value!r}")
+    options = [option for option in value.split(",") if option]
+    for option in options:
+        key, separator, option_value = option.partition("=")
+        if separator:
+            pattern = MOUNT_VALUES.get(key)
+            allowed = pattern is not None and pattern.fullmatch(option_value)
+        else:
+            allowed = option in MOUNT_FLAGS
+        if not allowed:
+            raise ValueError(f"mount option not allowed: {option!r}")
+    return ",".join(options + [option for option in SAFE_OPTIONS if option not in options])
+
+
+def _content(value):
+    try:
+        return base64.b64decode(value, validate=True)
+    except (TypeError, binascii.Error):
+        raise ValueError("content is not base64")
+
+
+def _mode(value):
+    if not isinstance(value, int) or value & ~0o644:
+        raise ValueError(f"mode not allowed: {value!r}")
+    return value
+
+
+def _readahead_kb(value):
+    if not isinstance(value, int) or isinstance(value, bool) or not 0 < value <= 65536:
+        raise ValueError(f"invalid readahead: {value!r}")
+    return value
+
+
+def _connection(value):
+    if not isinstance(value, str) or not value or "/" in value or value.startswith("."):
+        raise ValueError(f"invalid connection name: {value!r}")
+    return value
+
+
+# Allowed operations: argument name -> (validator, required)
+SCHEMA = {
+    "mkdir": {"path": (_mount_path, True)},
+    "rmdir": {"path": (_mount_path, True)},
+    "mount": {"device": (_device, True), "target": (_mount_path, True),
+              "fstype": (_fstype, False), "options": (_mount_options, False)},
+    "umount": {"target": (_mount_path, True)},
+    "readahead": {"device": (_device, True), "kb": (_readahead_kb, True)},
+    # fstab is never written as raw content: the helper renders the JellyBox entry itself
+    "fstab_add": {"device": (_device, True), "uuid": (_uuid, False), "target": (_mount_path, True),
+                  "fstype": (_fstype, True), "options": (_mount_options, False)},
+    "fstab_remove": {"uuid": (_uuid, False), "target": (_mount_path, True)},
+    "install": {"path": (_install_path, True), "content": (_content, True), "mode": (_mode, False)},
+    "read_psk": {"connection": (_connection, True)},
+    "shutdown": {},
+    "reboot": {},
+}
+
+
+def validate(op) -> tuple:
+    """
+    Checks an operation against the schema.
+    Returns:
+        tuple: (name, validated arguments).
+    Raises:
+        ValueError: If the operation or any of its arguments is not allowed.
+    """
+    if not isinstance(op, dict) or op.get("op") not in SCHEMA:
+        raise ValueError(f"unknown operation: {op!r}")
+    name = op["op"]
+    fields = SCHEMA[name]
+    unknown = set(op) - set(fields) - {"op"}
+    if unknown:
+        raise ValueError(f"unknown arguments of {name}: {sorted(unknown)}")
+    args = {}
+    for field, (check, required) in fields.items():
+        if field in op:
+            args[field] = check(op[field])
+        elif required:
+            raise ValueError(f"missing argument of {name}: {field}")
+    return name, args
+
+
+def _check(args):
+    result = subprocess.run(args, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"{' '.join(args)} exited {result.returncode}: {result.stderr.strip()}")
+
+
+def _queue_path(device: str, name: str) -> str:
+    """
+    Returns a request queue attribute of a block device; partitions use the queue of their disk.
+    """
+    path = os.path.realpath(f"/sys/class/block/{device}")
+    if os.path.exists(os.path.join(path, "partition")):
+        path = os.path.dirname(path)
+    return os.path.join(path, "queue", name)
+
+
+def execute(name: str, args: dict):
+    """
+    Runs a validated operation as root.
+    Returns:
+        The result of the operation (the password of read_psk, whether rmdir and
+        readahead succeeded, whether fstab_add and fstab_remove changed fstab).
+    """
+    if name == "mkdir":
+        os.makedirs(args["path"], exist_ok=True)
+    elif name == "rmdir":
+        # Best effort, like the rm after an unmount: a missing or busy directory is not an error
+        try:
+            os.rmdir(args["path"])
+        except OSError as e:
+            logging.warning(f"Could not remove {args['path']}: {e}")
+            return False
+        return True
+    elif name == "mount":
+        command = ["mount"]
+        if "fstype" in args:
+            command += ["-t", args["fstype"]]
+        command += ["-o", args.get("options", ",".join(SAFE_OPTIONS))]
+        _check(command + [f"/dev/{args['device']}", args["target"]])
+    elif name == "umount":
+        _check(["umount", args["target"]])
+    elif name == "readahead":
+        # Best effort: a mounted drive with the default readahead is still usable
+        try:
+            with open(_queue_path(args["device"], "read_ahead_kb"), "w") as f:
+                f.write(str(args["kb"]))
+        except OSError as e:
+            logging.warning(f"Could not set the readahead of {args['device']}: {e}")
+            return False
+        return True
+    elif name in FSTAB_OPS:
+        fstab = Fstab.load()
+        apply_op(fstab, dict(args, op=name))
+        if fstab.changed:
+            _atomic_write(fstab.path, fstab.render().encode("utf-8"), 0o644)
+            return True
+        return False
+    elif name == "install":
+        _atomic_write(args["path"], args["content"], args.get("mode", 0o644))
+    elif name == "read_psk":
+        path = os.path.join(NM_CONNECTIONS, f"{args['connection']}.nmconnection")
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("psk="):
+                    return line.split("=", 1)[1].strip()
+        raise KeyError("psk")
+    elif name == "shutdown":
+        _check(["shutdown", "now"])
+    elif name == "reboot":
+        _check(["reboot"])
+    return None
+
+
+# Operations that read, change and write back /etc/fstab
+FSTAB_OPS = ("fstab_add", "fstab_remove")
+
+
+def resources(name: str, args: dict) -> set:
+    """
+    Returns the resources a batch holds while it runs: the mount points, block
+    devices and installed files of its operations. Batches on different resources
+    run concurrently. fstab is locked separately, only around each fstab operation.
+    """
+    keys = set()
+    for field in ("path", "target"):
+        if field in args:
+            keys.add(f"path:{args[field]}")
+    if "device" in args:
+        keys.add(f"device:{args['device']}")
+    return keys
+
+
+def peer_uid(connection: socket.socket) -> int:
+    """
+    Returns the user id of the process at the other end of a UNIX socket (SO_PEERCRED).
+    """
+    creds = connection.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i"))
+    return struct.unpack("3i", creds)[1]
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    """
+    Serves the requests of one client connection, one JSON line each, until it disconnects.
+    """
+
+    def handle(self):
+        uid = peer_uid(self.connection)
+        if uid not in self.server.allowed_uids:
+            logging.warning(f"Rejected connection from uid {uid}")
+            return
+        while True:
+            line = self.rfile.readline(MAX_REQUEST + 1)
+            if not line:
+                return
+            if len(line) > MAX_REQUEST:
+                self._reply({"ok": False, "error": "request too large", "results": []})
+                return
+            self._reply(self.server.handle_request_line(line))
+
+    def _reply(self, response):
+        self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+        self.wfile.flush()
+
+
+class RootHelper(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Root helper of the unprivileged UI: runs the allow-listed operations of
+    SCHEMA received over a UNIX socket, so each privileged action costs a socket
+    round trip instead of a sudo fork. A request is a JSON line
+    {"ops": [{"op": "mkdir", "path": "/mnt/usb0"}, ...]}; the whole batch is
+    validated first, then run in order, stopping at the first failure.
+    Batches run concurrently, except those sharing a resource (a mount point or
+    a block device, see resources()), which run one at a time. fstab operations
+    only wait for each other, not for the mounts of other batches.
+    Only the allowed users (checked with SO_PEERCRED) and root may connect.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, path=HELPER_SOCKET, allowed_uids=()):
+        """
+        Args:
+            path (str): Socket path.
+            allowed_uids (iterable): Users allowed besides root.
+        """
+        self.allowed_uids = {0, *allowed_uids}
+        # Lock of each resource, created on first use
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+        # Held for the read-modify-write of a single fstab operation
+        self._fstab_lock = threading.Lock()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if os.path.exists(path):
+            os.unlink(path)
+        super().__init__(path, _Handler)
+        os.chmod(path, 0o666)
+
+    def handle_request_line(self, line: bytes) -> dict:
+        """
+        Validates and runs a batch of operations.
+        Returns:
+            dict: {"ok": bool, "results": [...]}, plus "error" and the "index" of the failed operation.
+        """
+        try:
+            request = json.loads(line)
+            ops = [validate(op) for op in request["ops"]]
+        except (ValueError, KeyError, TypeError) as e:
+            logging.warning(f"Invalid request: {e}")
+            return {"ok": False, "error": f"invalid request: {e}", "results": []}
+        results = []
+        with contextlib.ExitStack() as stack:
+            # Acquired in a fixed order, so two batches never wait for each other's locks
+            for lock in self._resource_locks(ops):
+                stack.enter_context(lock)
+            for index, (name, args) in enumerate(ops):
+                try:
+                    if name in FSTAB_OPS:
+                        with self._fstab_lock:
+                            results.append(execute(name, args))
+                    else:
+                        results.append(execute(name, args))
+                except Exception as e:
+                    logging.error(f"Error in {name}: {e}", exc_info=True)
+                    return {"ok": False, "error": f"{name}: {e}", "index": index, "results": results}
+        return {"ok": True, "results": results}
+
+    def _resource_locks(self, ops) -> list:
+        keys = sorted(set().union(*(resources(name, args) for name, args in ops)))
+        with self._locks_lock:
+            return [self._locks.setdefault(key, threading.Lock()) for key in keys]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Privileged helper of the JellyBox interface.")
+    parser.add_argument("--socket", default=HELPER_SOCKET, help="socket path (default: %(default)s)")
+    parser.add_argument("--user", action="append", default=[], help="user allowed to connect (repeatable)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+
+    if os.geteuid() != 0:
+        parser.error("must run as root")
+    uids = [pwd.getpwnam(user).pw_uid for user in args.user]
+    with RootHelper(args.socket, uids) as server:
+        logging.info(f"Listening on {args.socket}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.unlink(args.socket)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+import logging
+import os
+
+# Prebuilt splash frame in panel format, written on the first start
+SPLASH_FILE = os.path.normpath(os.path.join(os.path.dirname(__file__), "..", "jellybox-splash.rgb565"))
+
+
+def show_splash(panel, path=SPLASH_FILE) -> bool:
+    """
+    Pushes the prebuilt splash frame as is: no PIL, no conversion.
+    Args:
+        panel (Panel): Opened panel.
+        path (str): Splash frame file.
+    Returns:
+        bool: True if it was shown (False before the first start has built it).
+    """
+    try:
+        with open(path, "rb") as f:
+            frame = f.read()
+        if len(frame) != panel.width * panel.height * 2:
+            logging.warning(f"Ignoring splash frame {path}: wrong size for the panel")
+            return False
+        panel.push(frame)
+        return True
+    except FileNotFoundError:
+        return False
+    except Exception as e:
+        logging.error(f"Error showing splash frame: {e}", exc_info=True)
+        return False
+
+
+def save_splash(interface, path=SPLASH_FILE) -> bool:
+    """
+    Renders the splash screen and stores it in panel format for the next starts.
+    Nothing is done when it already exists.
+    Args:
+        interface (Interface): Provides the display, colors and font.
+        path (str): Splash frame file.
+    Returns:
+        bool: True if it was written.
+    """
+    if os.path.exists(path):
+        return False
+    try:
+        from PIL import Image, ImageDraw
+        display = interface.display
+        image = Image.new("RGB", display.image.size)
+        draw = ImageDraw.Draw(image)
+        draw.rectangle((2, 2, image.width - 2, image.height - 2), outline=interface.COLOR_GREEN)
+        draw.text((50, 140), "JellyBox", fill=interface.COLOR_WHITE, font=interface.FONT)
+        draw.text((50, 160), "Starting...", fill=interface.COLOR_GREEN, font=interface.FONT)
+        # Converted with this thread's own scratch buffers into a new panel buffer,
+        # so the frames converted meanwhile by the renderer cannot tear it
+        frame = bytes(display.to_panel(image))
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(frame)
+        os.replace(tmp, path)
+        return True
+    except Exception as e:
+        logging.error(f"Error saving splash frame: {e}", exc_info=True)
+        return False
@@ -0,0 +1,104 @@
+import json
+import logging
+import os
+import threading
+import time
+
+STARTUP_FILE = os.path.normpath(os.path.join(os.path.dirname(__file__), "..", "jellybox-startup.jsonl"))
+
+
+def _process_age() -> float:
+    """
+    Returns the seconds since this process was started (exec), including the
+    interpreter startup, from /proc. Zero where /proc is not available.
+    """
+    try:
+        with open("/proc/self/stat", "r") as f:
+            # Fields after the command name; starttime is field 22 of the file
+            fields = f.read().rsplit(")", 1)[1].split()
+        with open("/proc/uptime", "r") as f:
+            uptime = float(f.read().split()[0])
+        return max(0.0, uptime - int(fields[19]) / os.sysconf("SC_CLK_TCK"))
+    except (OSError, ValueError, IndexError):
+        return 0.0
+
+
+def _uptime():
+    try:
+        with open("/proc/uptime", "r") as f:
+            return float(f.read().split()[0])
+    except (OSError, ValueError):
+        return None
+
+
+class StartupTimer:
+    """
+    Records when each startup stage ends, in seconds since the process was
+    started. report() logs the breakdown once the interface is interactive and
+    appends it to jellybox-startup.jsonl, to track start times across releases.
+    Background stages (warm-up thread) are kept apart from the critical-path
+    breakdown, as the time they end at, and are logged as they end once reported.
+    """
+
+    def __init__(self, path=STARTUP_FILE):
+        self.path = path
+        self._origin = time.perf_counter() - _process_age()
+        self._marks = []
+        self._background = []
+        self._reported = False
+        self._lock = threading.Lock()
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self._origin
+
+    def mark(self, stage: str, background: bool = False):
+        """
+        Records the end of a stage.
+        Args:
+            stage (str): Stage name.
+            background (bool): True for stages that run off the critical path.
+        """
+        elapsed = self.elapsed()
+        with self._lock:
+            (self._background if background else self._marks).append((stage, elapsed))
+            reported = self._reported
+        if reported:
+            logging.info(f"Startup: {stage} ready at {elapsed:.3f} s")
+
+    def breakdown(self) -> dict:
+        """
+        Returns the duration of each critical-path stage (from the end of the
+        previous one), in seconds.
+        """
+        with self._lock:
+            marks = list(self._marks)
+        durations, previous = {}, 0.0
+        for stage, elapsed in marks:
+            durations[stage] = round(elapsed - previous, 3)
+            previous = elapsed
+        return durations
+
+    def report(self):
+        """
+        Logs the time to interactive and its breakdown, and appends them to the startup file.
+        """
+        with self._lock:
+            self._reported = True
+            # Background stages that end from now on are logged by mark()
+            background = {stage: round(elapsed, 3) for stage, elapsed in self._background}
+        total = self.elapsed()
+        durations = self.breakdown()
+        stages = ", ".join(f"{stage} {seconds * 1000:.0f} ms" for stage, seconds in durations.items())
+        logging.info(f"Interactive {total:.3f} s after start: {stages}")
+        for stage, elapsed in background.items():
+            logging.info(f"Startup: {stage} ready at {elapsed:.3f} s")
+        record = {"time": time.time(), "interactive": round(total, 3), "uptime": _uptime(),
+                  "stages": durations, "background": background}
+        try:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+        except OSError as e:
+            logging.error(f"Error writing startup times {self.path}: {e}", exc_info=True)
+
+
+STARTUP = StartupTimer()
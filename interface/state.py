@@ -0,0 +1,194 @@
+import logging
+import threading
+import time
+from types import MappingProxyType
+from typing import NamedTuple
+
+class SystemState(NamedTuple):
+    """
+    Immutable snapshot of the system information shown by the interface.
+    """
+    ip: str = "Not available"
+    ap_name: str = "Not available"
+    ssid: str = "Not available"
+    psk: str = "Not available"
+    devices: tuple = ()
+    # MediaSummary of each mounted drive, pushed by the media indexer
+    media: tuple = ()
+
+
+class StateService:
+    """
+    Keeps a SystemState snapshot up to date from a background thread.
+    Every field is refreshed when its TTL expires or when it is invalidated,
+    so draw paths can read the snapshot without running any subprocess.
+    """
+
+    # Seconds each field is considered fresh (None: refreshed only on invalidation)
+    TTL = {
+        "ip": 10,
+        "ap_name": 60,
+        "ssid": 60,
+        "psk": 60,
+        "devices": 5,
+    }
+
+    def __init__(self, command, ttl=None):
+        """
+        Args:
+            command (Command): Command object used to read the system information.
+            ttl (dict): Overrides of the per-field TTLs (optional).
+        """
+        self.command = command
+        self.ttl = dict(self.TTL, **(ttl or {}))
+        self._snapshot = SystemState()
+        self._due = {
+            field: 0.0 if self.ttl.get(field) is not None else float("inf")
+            for field in SystemState._fields
+        }
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._refresh_lock = threading.Lock()
+        self._running = False
+        self._paused = False
+        self._thread = None
+
+    @property
+    def snapshot(self) -> SystemState:
+        """
+        Returns the latest snapshot. Reading it never blocks.
+        """
+        return self._snapshot
+
+    def start(self):
+        """
+        Starts the background refresh thread. Fields with a TTL are due at once,
+        so they are read right away, without delaying the caller.
+        """
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="state-service", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stops the background refresh thread.
+        """
+        with self._wakeup:
+            self._running = False
+            self._wakeup.notify()
+
+    def pause(self):
+        """
+        Stops refreshing the fields until resume() (e.g. while the screen is off).
+        refresh() and update() still work.
+        """
+        with self._wakeup:
+            self._paused = True
+
+    def resume(self):
+        """
+        Resumes the refreshes; the fields that expired meanwhile are read right away.
+        """
+        with self._wakeup:
+            self._paused = False
+            self._wakeup.notify()
+
+    def subscribe(self, callback):
+        """
+        Registers a callback called as callback(snapshot, changed_fields) from the
+        refresh thread whenever the snapshot changes.
+        """
+        self._subscribers.append(callback)
+
+    def invalidate(self, *fields):
+        """
+        Marks fields as stale so the background thread refreshes them right away.
+        Without arguments every field is invalidated.
+        """
+        with self._wakeup:
+            for field in fields or SystemState._fields:
+                self._due[field] = 0.0
+            self._wakeup.notify()
+
+    def refresh(self, *fields):
+        """
+        Refreshes fields synchronously, e.g. right after a mutating action.
+        Without arguments every field is refreshed.
+        """
+        fields = fields or SystemState._fields
+        with self._refresh_lock:
+            current = self._snapshot
+            values = {}
+            for field in SystemState._fields:
+                if field in fields:
+                    values[field] = self._read(field, values.get("ap_name", current.ap_name))
+            now = time.monotonic()
+            with self._lock:
+                for field in values:
+                    ttl = self.ttl.get(field)
+                    self._due[field] = now + ttl if ttl is not None else float("inf")
+            changed = [field for field, value in values.items() if getattr(current, field) != value]
+            if changed:
+                self._snapshot = current._replace(**{field: values[field] for field in changed})
+        if changed:
+            self._notify(changed)
+
+    def update(self, **values):
+        """
+        Publishes field values obtained elsewhere (e.g. from the device registry).
+        """
+        with self._refresh_lock:
+            current = self._snapshot
+            changed = [field for field, value in values.items() if getattr(current, field) != value]
+            if changed:
+                self._snapshot = current._replace(**{field: values[field] for field in changed})
+        if changed:
+            self._notify(changed)
+
+    def _read(self, field, ap_name):
+        """
+        Reads a single field through the Command object.
+        """
+        if field == "ip":
+            return self.command.get_ip_access_point()
+        if field == "ap_name":
+            return self.command.get_name_access_point()
+        if field == "ssid":
+            return self.command.get_SSID(ap_name)
+        if field == "psk":
+            return self.command.get_password_access_point(ap_name)
+        if field == "devices":
+            return tuple(MappingProxyType(dict(d)) for d in self.command.get_device_usb())
+        if field == "media":
+            # Only published through update()
+            return self._snapshot.media
+        raise ValueError(f"Unknown state field: {field}")
+
+    def _notify(self, changed):
+        snapshot = self._snapshot
+        for callback in self._subscribers:
+            try:
+                callback(snapshot, changed)
+            except Exception as e:
+                logging.error(f"Error in state subscriber: {e}", exc_info=True)
+
+    def _run(self):
+        while True:
+            with self._wakeup:
+                while self._running:
+                    if self._paused:
+                        self._wakeup.wait()
+                        continue
+                    now = time.monotonic()
+                    due = [field for field, when in self._due.items() if when <= now]
+                    if due:
+                        break
+                    timeout = min(self._due.values()) - now
+                    self._wakeup.wait(timeout if timeout != float("inf") else None)
+                if not self._running:
+                    return
+            try:
+                self.refresh(*due)
+            except Exception as e:
+                logging.error(f"Error refreshing system state: {e}", exc_info=True)
@@ -0,0 +1,260 @@
+import bisect
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+# Tracing is opt-in: JELLYBOX_TRACE=1 enables it
+TRACE_ENV = "JELLYBOX_TRACE"
+STATS_FILE_ENV = "JELLYBOX_TRACE_FILE"
+STATS_FILE = os.path.normpath(os.path.join(os.path.dirname(__file__), "..", "jellybox-latency.json"))
+# Seconds between summary lines (and stats file updates)
+SUMMARY_INTERVAL = 60
+# Upper bounds of the histogram buckets, in milliseconds
+BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+# Stages in the order they happen during a press
+STAGES = ("gpio", "queue", "dispatch", "command", "render", "convert", "spi", "press")
+
+
+class Histogram:
+    """
+    Fixed-bucket latency histogram, in milliseconds.
+    """
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, ms: float):
+        self.counts[bisect.bisect_left(BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.total += ms
+        self.max = max(self.max, ms)
+
+    def percentile(self, percent: float) -> float:
+        """
+        Returns the upper bound of the bucket holding the percentile (capped at the max).
+        """
+        rank = percent / 100 * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= rank:
+                return min(BUCKETS_MS[i], self.max) if i < len(BUCKETS_MS) else self.max
+        return self.max
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total / self.count, 3) if self.count else 0.0,
+            "p50_ms": round(self.percentile(50), 3),
+            "p95_ms": round(self.percentile(95), 3),
+            "max_ms": round(self.max, 3),
+            "buckets_ms": {str(bound): count for bound, count in zip(BUCKETS_MS + ("inf",), self.counts)},
+        }
+
+
+class _Span:
+    """
+    Times a stage of the current press.
+    """
+    __slots__ = ("tracer", "stage", "start")
+
+    def __init__(self, tracer, stage):
+        self.tracer = tracer
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer.record(self.stage, (time.perf_counter() - self.start) * 1000)
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Tracer:
+    """
+    Opt-in latency tracing of button presses, from the GPIO edge to the pixels
+    sent to the panel. Each press gets an ID; its stages (GPIO read, queueing,
+    action dispatch, subprocesses, rasterization, RGB565 conversion and SPI push)
+    are logged per press and aggregated into per-stage histograms, summarized in
+    the log every SUMMARY_INTERVAL seconds and written to a JSON stats file.
+    When disabled, span() returns a shared no-op context manager.
+    """
+
+    def __init__(self, enabled=None, stats_file=None):
+        """
+        Args:
+            enabled (bool): Defaults to the JELLYBOX_TRACE environment variable.
+            stats_file (str): Defaults to JELLYBOX_TRACE_FILE or jellybox-latency.json.
+        """
+        if enabled is None:
+            enabled = os.environ.get(TRACE_ENV, "").lower() in ("1", "true", "yes", "on")
+        self.enabled = enabled
+        self.stats_file = stats_file or os.environ.get(STATS_FILE_ENV, STATS_FILE)
+        self.histograms = {stage: Histogram() for stage in STAGES}
+        self._ids = itertools.count(1)
+        self._pending = deque()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._last_summary = time.monotonic()
+
+    @property
+    def press_id(self):
+        """
+        ID of the press handled by the current thread, or None.
+        """
+        press = getattr(self._local, "press", None)
+        return press["id"] if press else None
+
+    def span(self, stage: str):
+        """
+        Context manager timing a stage: `with TRACER.span("render"): ...`
+        """
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, stage)
+
+    def edge(self, event: str):
+        """
+        Records a button edge, from the GPIO callback or the polling thread.
+        The press starts here and is picked up by begin_press() in the main loop.
+        """
+        if not self.enabled:
+            return
+        self._pending.append((event, next(self._ids), time.perf_counter()))
+
+    def begin_press(self, event: str):
+        """
+        Starts handling a press in the main loop (current thread).
+        Events that did not come from an edge (e.g. posted ones) get a new ID.
+        """
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        press = None
+        while self._pending:
+            pending_event, press_id, start = self._pending.popleft()
+            if pending_event == event:
+                press = {"id": press_id, "event": event, "start": start, "stages": {}}
+                break
+        if press is None:
+            press = {"id": next(self._ids), "event": event, "start": now, "stages": {}}
+        self._local.press = press
+        self.record("queue", (now - press["start"]) * 1000)
+
+    def detach(self):
+        """
+        Removes the press from the current thread and returns it, so the thread
+        that completes it (e.g. the renderer) can attach() it.
+        """
+        if not self.enabled:
+            return None
+        press = getattr(self._local, "press", None)
+        self._local.press = None
+        return press
+
+    def attach(self, press):
+        """
+        Makes a detached press (or None) the current one of this thread.
+        """
+        if self.enabled:
+            self._local.press = press
+
+    def end_press(self, press=None):
+        """
+        Finishes a press (by default the one of the current thread), logging its stage breakdown.
+        """
+        if not self.enabled:
+            return
+        if press is None:
+            press = getattr(self._local, "press", None)
+            if press is None:
+                return
+            self._local.press = None
+        total = (time.perf_counter() - press["start"]) * 1000
+        with self._lock:
+            self.histograms["press"].add(total)
+        stages = " | ".join(f"{stage} {ms:.1f}" for stage, ms in press["stages"].items())
+        logging.info(f"Press {press['id']} ({press['event']}): {total:.1f} ms | {stages}")
+        self._maybe_summarize()
+
+    def record(self, stage: str, ms: float):
+        """
+        Adds a stage duration to its histogram and to the current press.
+        """
+        with self._lock:
+            self.histograms.setdefault(stage, Histogram()).add(ms)
+        press = getattr(self._local, "press", None)
+        if press is not None:
+            press["stages"][stage] = press["stages"].get(stage, 0.0) + ms
+
+    def command(self, args, ms: float, returncode):
+        """
+        Records a subprocess run by Command: argv, wall time and exit code.
+        """
+        self.record("command", ms)
+        argv = args if isinstance(args, str) else " ".join(map(str, args))
+        logging.info(f"Press {self.press_id or '-'}: '{argv}' exited {returncode} in {ms:.1f} ms")
+
+    def summary(self) -> str:
+        with self._lock:
+            parts = [
+                f"{stage} p50={h.percentile(50):.1f} p95={h.percentile(95):.1f} max={h.max:.1f} n={h.count}"
+                for stage, h in self.histograms.items() if h.count
+            ]
+        return "Latency (ms): " + ("; ".join(parts) or "no samples")
+
+    def write_stats(self):
+        """
+        Writes the histograms to the stats file (atomically).
+        """
+        with self._lock:
+            stats = {
+                "updated": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "stages": {stage: h.to_dict() for stage, h in self.histograms.items()},
+            }
+        tmp = self.stats_file + ".tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(stats, f, indent=2)
+            os.replace(tmp, self.stats_file)
+        except OSError as e:
+            logging.error(f"Error writing latency stats to {self.stats_file}: {e}")
+
+    def flush(self):
+        """
+        Logs the summary line and updates the stats file.
+        """
+        if not self.enabled:
+            return
+        self._last_summary = time.monotonic()
+        logging.info(self.summary())
+        self.write_stats()
+
+    def _maybe_summarize(self):
+        if time.monotonic() - self._last_summary >= SUMMARY_INTERVAL:
+            self.flush()
+
+
+# Process-wide tracer used by the instrumented code paths
+TRACER = Tracer()
@@ -0,0 +1,123 @@
+import logging
+import mmap
+import os
+import random
+import time
+from typing import NamedTuple
+
+# Seconds spent on each part of the probe
+SEQUENTIAL_SECONDS = 3.0
+RANDOM_SECONDS = 1.0
+# Sequential reads are 1 MiB, random reads 4 KiB, both aligned for O_DIRECT
+CHUNK_SIZE = 1024 * 1024
+BLOCK_SIZE = 4096
+# Files smaller than this are not worth reading (too short to reach full speed)
+MIN_FILE_SIZE = 16 * 1024 * 1024
+
+
+class ProbeResult(NamedTuple):
+    """
+    Read performance of a drive.
+    """
+    read_mbps: float
+    random_ms: float
+    random_p95_ms: float
+    # False when the filesystem refused O_DIRECT and the page cache was dropped instead
+    direct: bool
+
+
+def _open(path: str):
+    """
+    Opens a file for reads that bypass the page cache.
+    Returns:
+        tuple: (fd, direct). Without O_DIRECT support, the cached pages of the file are dropped.
+    """
+    flag = getattr(os, "O_DIRECT", 0)
+    if flag:
+        try:
+            return os.open(path, os.O_RDONLY | flag), True
+        except OSError:
+            # vfat/exFAT through FUSE and some kernels reject O_DIRECT
+            pass
+    fd = os.open(path, os.O_RDONLY)
+    if hasattr(os, "posix_fadvise"):
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+    return fd, False
+
+
+def _sequential(paths, seconds):
+    """
+    Reads the files one after another in large aligned chunks until the time is up.
+    Returns:
+        tuple: (MB/s, direct).
+    """
+    buffer = mmap.mmap(-1, CHUNK_SIZE)
+    total = 0
+    direct = True
+    start = time.perf_counter()
+    deadline = start + seconds
+    try:
+        for path in paths:
+            fd, file_direct = _open(path)
+            direct = direct and file_direct
+            try:
+                while time.perf_counter() < deadline:
+                    count = os.readv(fd, [buffer])
+                    total += count
+                    if count < CHUNK_SIZE:
+                        break
+            finally:
+                os.close(fd)
+            if time.perf_counter() >= deadline:
+                break
+    finally:
+        buffer.close()
+    elapsed = time.perf_counter() - start
+    return total / elapsed / 1e6 if elapsed else 0.0, direct
+
+
+def _random(path, size, seconds):
+    """
+    Reads 4 KiB blocks at random aligned offsets of a file until the time is up.
+    Returns:
+        tuple: (median ms, p95 ms).
+    """
+    buffer = mmap.mmap(-1, BLOCK_SIZE)
+    fd, _ = _open(path)
+    latencies = []
+    blocks = size // BLOCK_SIZE
+    deadline = time.perf_counter() + seconds
+    try:
+        while time.perf_counter() < deadline:
+            offset = random.randrange(blocks) * BLOCK_SIZE
+            start = time.perf_counter()
+            os.preadv(fd, [buffer], offset)
+            latencies.append((time.perf_counter() - start) * 1000)
+    finally:
+        os.close(fd)
+        buffer.close()
+    latencies.sort()
+    return latencies[len(latencies) // 2], latencies[min(len(latencies) - 1, len(latencies) * 95 // 100)]
+
+
+def probe_drive(files, sequential_seconds=SEQUENTIAL_SECONDS, random_seconds=RANDOM_SECONDS):
+    """
+    Measures the read performance of a drive on a sample of its files. The probe
+    is time-boxed: it takes at most sequential_seconds + random_seconds.
+    Args:
+        files (list): (path, size) of the files to read, largest first.
+        sequential_seconds (float): Time spent on sequential reads.
+        random_seconds (float): Time spent on random 4 KiB reads.
+    Returns:
+        ProbeResult: The measurements, or None if no file is large enough.
+    """
+    files = [(path, size) for path, size in files if size >= MIN_FILE_SIZE]
+    if not files:
+        return None
+    try:
+        read_mbps, direct = _sequential([path for path, _ in files], sequential_seconds)
+        random_ms, random_p95_ms = _random(files[0][0], files[0][1], random_seconds)
+        return ProbeResult(round(read_mbps, 1), round(random_ms, 2), round(random_p95_ms, 2), direct)
+    except OSError as e:
+        logging.error(f"Error probing read speed of {files[0][0]}: {e}", exc_info=True)
+        return None
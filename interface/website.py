@@ -0,0 +1,149 @@
+import gzip
+import hashlib
+import logging
+import os
+import re
+import threading
+from types import MappingProxyType
+from typing import NamedTuple
+from .bundler import Bundler
+from .privileged import install_files
+
+try:
+    import brotli
+except ImportError:
+    # Brotli variants are only written when the module is installed
+    brotli = None
+
+WEB_TEMPLATES = os.path.normpath(os.path.join(os.path.dirname(__file__), "..", "web_templates"))
+WEB_ROOT = "/var/www/html"
+PLACEHOLDER = re.compile(r"\{\{(\w+)\}\}")
+
+
+class CompiledTemplate(NamedTuple):
+    """
+    A template split into literal text and variable names, so rendering is a join.
+    Even positions of parts are literal text, odd positions are variable names.
+    Assets are the files the bundled page references (path relative to the web root -> bytes).
+    """
+    name: str
+    parts: tuple
+    # Read-only, so the default is not a dict shared by every instance
+    assets: MappingProxyType = MappingProxyType({})
+
+    @classmethod
+    def compile(cls, name: str, source: str, assets: dict = None):
+        return cls(name, tuple(PLACEHOLDER.split(source)), MappingProxyType(dict(assets or {})))
+
+    @property
+    def variables(self) -> set:
+        return set(self.parts[1::2])
+
+    def render(self, variables: dict) -> str:
+        return "".join(
+            part if i % 2 == 0 else str(variables.get(part, "{{" + part + "}}"))
+            for i, part in enumerate(self.parts)
+        )
+
+
+class WebsitePublisher:
+    """
+    Publishes the landing page served by the local web server.
+    Templates are bundled for offline use and compiled once; a page is only written
+    when its content differs from the live one, together with precompressed .gz
+    (and .br) variants.
+    """
+
+    PAGE = "index.html"
+
+    def __init__(self, templates_dir=WEB_TEMPLATES, web_root=WEB_ROOT):
+        """
+        Args:
+            templates_dir (str): Directory with the <name>.html templates.
+            web_root (str): Directory served by the web server.
+        """
+        self.templates_dir = templates_dir
+        self.web_root = web_root
+        # Compiled on first use (or by the startup warm-up), not at construction
+        self._templates = None
+        self._lock = threading.Lock()
+
+    @property
+    def templates(self) -> dict:
+        """
+        Compiled templates by name.
+        """
+        with self._lock:
+            if self._templates is None:
+                self.compile_templates()
+            return self._templates
+
+    def compile_templates(self):
+        """
+        Reads, bundles and compiles every template of the templates directory.
+        """
+        bundler = Bundler(self.templates_dir)
+        templates = {}
+        for filename in sorted(os.listdir(self.templates_dir)):
+            name, ext = os.path.splitext(filename)
+            if ext != ".html":
+                continue
+            with open(os.path.join(self.templates_dir, filename), "r", encoding="utf-8") as f:
+                bundle = bundler.bundle(f.read())
+            logging.info(f"Template '{name}' bundled: {bundle.summary()}")
+            for url in bundle.remaining:
+                logging.warning(f"Template '{name}' still references {url}")
+            templates[name] = CompiledTemplate.compile(name, bundle.html, bundle.files)
+        self._templates = templates
+
+    def render(self, template_name: str, variables: dict) -> bytes:
+        """
+        Renders a compiled template.
+        Raises:
+            KeyError: If the template does not exist.
+        """
+        return self.templates[template_name].render(variables).encode("utf-8")
+
+    def publish(self, template_name: str, variables: dict, **install) -> bool:
+        """
+        Renders a template and publishes it, unless the live page is already identical.
+        Args:
+            template_name (str): Name of the template, without extension.
+            variables (dict): Values of the {{VARIABLES}} of the template.
+            **install: runner and timeout of the privileged copy (see install_files).
+        Returns:
+            bool: True if the page was written, False if it was already up to date.
+        """
+        content = self.render(template_name, variables)
+        assets = self.templates[template_name].assets
+        digest = hashlib.sha256(content).hexdigest()
+        if self._is_live(digest, assets):
+            logging.info(f"Website '{template_name}' already published, skipping")
+            return False
+
+        page = os.path.join(self.web_root, self.PAGE)
+        files = {
+            page: content,
+            page + ".gz": gzip.compress(content, compresslevel=9, mtime=0),
+        }
+        if brotli is not None:
+            files[page + ".br"] = brotli.compress(content, mode=brotli.MODE_TEXT)
+        for path, asset in assets.items():
+            files[os.path.join(self.web_root, path)] = asset
+        install_files(files, **install)
+        logging.info(f"Website '{template_name}' published ({len(content)} bytes, sha256 {digest[:12]})")
+        return True
+
+    def _is_live(self, digest: str, assets: dict) -> bool:
+        """
+        Tells whether the live page has the given hash and its variants and assets exist.
+        """
+        page = os.path.join(self.web_root, self.PAGE)
+        try:
+            with open(page, "rb") as f:
+                live = hashlib.sha256(f.read()).hexdigest()
+        except OSError:
+            return False
+        variants = [page + ".gz"] + ([page + ".br"] if brotli is not None else [])
+        variants += [os.path.join(self.web_root, path) for path in assets]
+        return live == digest and all(os.path.exists(path) for path in variants)
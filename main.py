@@ -1,89 +1,142 @@
 import logging
-import os
+import threading
 import time
-from interface.interface import Interface
+# First import: startup times are measured from here
+from interface.startup import STARTUP
 from input.button_action import ButtonAction
-from input.button_controller import ButtonController
+from input.button_events import ButtonEvent, ButtonEvents
+from interface.logs import setup_logging
+from interface.power import PowerManager
+from interface.tracing import TRACER
 
-# Determines the path of the directory where this file is located
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-LOG_PATH = os.path.join(BASE_DIR, "jellybox.log")
+# Longest pause after consecutive errors in the main loop, in seconds
+MAX_ERROR_BACKOFF = 30
 
-# Logging configuration
-logging.basicConfig(
-    filename=LOG_PATH,
-    level=logging.INFO,
-    format='%(asctime)s [%(levelname)s] %(message)s'
-)
+def event_handlers(menu):
+    """
+    Maps each input event to its menu operation, so dispatch is a dict lookup.
+    """
+    return {
+        ButtonEvent.UP: lambda: menu.move(-1),
+        ButtonEvent.DOWN: lambda: menu.move(1),
+        ButtonEvent.SELECT: menu.select,
+        ButtonEvent.REFRESH: lambda: menu.invalidate("refresh"),
+        ButtonEvent.JOB: lambda: menu.invalidate("job"),
+        # No event within the idle timeout (e.g. spinner animation)
+        None: menu.idle,
+    }
 
-def handle_menu(menu_name, get_len_func, draw_func, execute_func, interface, buttons, selected_index):
+def open_splash():
     """
-    Handles menu navigation and selection.
+    Opens the panel and shows the prebuilt splash frame, before PIL and the
+    rest of the interface are imported.
+    Returns:
+        Panel: The opened panel, or None if it failed (the Interface opens it again).
     """
-    selected_index = buttons.handle_navigation(get_len_func(), selected_index, draw_func)
-    if buttons.is_select_pressed():
-        try:
-            execute_func(selected_index)
-        except Exception as e:
-            logging.error(f"Error executing action in menu '{menu_name}': {e}")
-        # Reset the index if the menu is changed
-        if interface.menu.select_menu != menu_name:
-            selected_index = 0
-        time.sleep(0.2)
-    return selected_index
+    try:
+        from interface.panel import Panel
+        from interface.splash import show_splash
+        panel = Panel()
+        STARTUP.mark("panel")
+        if show_splash(panel):
+            STARTUP.mark("splash")
+        return panel
+    except Exception as e:
+        logging.error(f"Error showing splash: {e}", exc_info=True)
+        return None
+
+def warm_up(interface):
+    """
+    Background part of the startup: device discovery, automount and the caches
+    that are not needed to show the main menu.
+    """
+    from interface.splash import save_splash
+    try:
+        interface.devices.start()
+        STARTUP.mark("devices", background=True)
+        # Mounts the known drives concurrently, then signals that they are ready
+        interface.automount.start(interface.devices.devices)
+        interface.command.website.templates
+        STARTUP.mark("web_templates", background=True)
+        save_splash(interface)
+    except Exception as e:
+        logging.error(f"Error in startup warm-up: {e}", exc_info=True)
 
 def main():
-    interface = Interface()
-    action = ButtonAction(interface)
-    buttons = ButtonController()
+    # Records are written by a background thread (JELLYBOX_LOG selects file, tmpfs or journald)
+    logs = setup_logging()
+    STARTUP.mark("python")
+    panel = open_splash()
+    # Heavy imports (PIL, NumPy) once the splash is on the panel
+    from interface.interface import Interface
+    STARTUP.mark("imports")
+    interface = Interface(panel)
+    # Registers the menu screens and their actions on interface.menu
+    ButtonAction(interface)
+    STARTUP.mark("interface")
+    buttons = ButtonEvents()
+    buttons.start()
+    # Frames are drawn and sent to the panel off the input loop
+    interface.renderer.start()
 
-    selected_index = 0
-    interface.draw_main_menu(selected_index)
+    # Redraws the current screen when the system information changes.
+    # Network information and devices are read in the background.
+    interface.state.subscribe(lambda snapshot, changed: buttons.post(ButtonEvent.REFRESH))
+    interface.state.start()
+    interface.media.start()
+    threading.Thread(target=warm_up, args=(interface,), name="warm-up", daemon=True).start()
+    # Job results come back to the menu as events
+    interface.jobs.subscribe(lambda job: buttons.post(ButtonEvent.JOB))
+
+    handlers = event_handlers(interface.menu)
+    # Dims and then turns off the screen when the buttons are not used
+    power = PowerManager(interface, buttons.post)
+    interface.menu.open("main")
+    interface.renderer.flush()
+    STARTUP.mark("first_frame")
+    STARTUP.report()
 
     logging.info("JellyBox started successfully.")
+    errors = 0
 
     while True:
         try:
-            menu_name = interface.menu.select_menu
-
-            if menu_name == "main":
-                selected_index = handle_menu(
-                    "main",
-                    interface.menu.get_len_main_menu_items,
-                    interface.draw_main_menu,
-                    action.execute_action_main,
-                    interface, buttons, selected_index
-                )
-            elif menu_name == "web":
-                selected_index = handle_menu(
-                    "web",
-                    interface.menu.get_len_web_menu_items,
-                    interface.draw_web_menu,
-                    action.execute_action_web,
-                    interface, buttons, selected_index
-                )
-            elif menu_name == "device":
-                selected_index = handle_menu(
-                    "device",
-                    lambda: interface.command.get_devices_len() + 1,
-                    interface.draw_device_menu,
-                    action.execute_action_device,
-                    interface, buttons, selected_index
-                )
-            elif menu_name == "red":
-                if buttons.is_select_pressed():
-                    try:
-                        action.execute_action_back()
-                    except Exception as e:
-                        logging.error(f"Error executing action in 'network' menu: {e}")
-                    selected_index = 0
-                    time.sleep(0.2)
+            # Blocks until a button is pressed, so the loop is idle between presses.
+            # Screens with an animation (progress spinner) wake it up periodically.
+            # While the screen is off it only wakes up on events.
+            event = buttons.wait(power.timeout(interface.menu.idle_timeout()))
+            if event in (ButtonEvent.UP, ButtonEvent.DOWN, ButtonEvent.SELECT):
+                TRACER.begin_press(event)
+                if not power.press():
+                    # The press only woke the screen up
+                    TRACER.end_press()
+                    continue
+            elif event is None:
+                if not power.tick():
+                    continue
+            elif power.hold(event):
+                continue
+            handlers[event]()
+            TRACER.end_press()
+            errors = 0
         except KeyboardInterrupt:
             logging.info("JellyBox detenido por el usuario.")
+            TRACER.flush()
+            buttons.stop()
+            interface.renderer.stop()
+            interface.state.stop()
+            interface.devices.stop()
+            interface.automount.shutdown()
+            interface.media.stop()
+            interface.jobs.shutdown()
+            logs.stop()
             break
         except Exception as e:
             logging.critical(f"Unexpected error in the main loop: {e}", exc_info=True)
-            time.sleep(1)  # Prevents fast loops in case of error
+            TRACER.end_press()
+            # Prevents fast loops in case of error; the pause doubles while the error repeats
+            time.sleep(min(2 ** errors, MAX_ERROR_BACKOFF))
+            errors += 1
 
 if __name__ == '__main__':
     main()
\ No newline at end of file